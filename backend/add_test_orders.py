@@ -237,6 +237,7 @@ async def add_test_orders():
         print(f"   - Consistent ~$30 increase per day for smooth slope")
         print(f"   - NO ZERO DAYS - every day (including Tue & Wed) has sales data!")
         print(f"   - Better slope with gradual, consistent upward trend")
+        print(f"\n👉 These were inserted directly: run python backfill_rollups.py to refresh the dashboard rollups")
         
     except Exception as e:
         print(f"❌ Error: {e}")
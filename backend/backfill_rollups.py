@@ -0,0 +1,34 @@
+"""
+Rebuild the daily dashboard rollups from order and booking history
+
+Recomputes seller_daily_rollups and service_daily_rollups from scratch
+(and gives older checkout bookings the price of their service). Increments
+recorded while it runs are overwritten, so run it while traffic is low.
+
+Usage:
+    python backfill_rollups.py
+"""
+import asyncio
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from config import settings
+from database import database
+from services import rollup_service
+
+
+async def main():
+    client = AsyncIOMotorClient(settings.MONGO_URL)
+    database.client = client
+    database.db = client[settings.DB_NAME]
+
+    try:
+        counts = await rollup_service.rebuild_rollups()
+        print(f"✅ Seller days: {counts[rollup_service.SELLER_ROLLUPS]}")
+        print(f"✅ Service days: {counts[rollup_service.SERVICE_ROLLUPS]}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,153 @@
+"""
+Benchmark: MongoDB queries per page for proposal and booking listings
+
+Seeds a service request with N proposals (each from a different freelancer
+with a profile), calls the listing endpoints directly and counts the
+commands sent to MongoDB. With batch joins the count stays constant as N
+grows; with per-item lookups it grew by one or two queries per row.
+
+Usage:
+    python bench_listing_queries.py [sizes...]    (default: 10 50 100)
+"""
+import asyncio
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from config import settings
+from database import database
+from models import User
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts commands by name while enabled"""
+
+    def __init__(self):
+        self.enabled = False
+        self.commands = Counter()
+
+    def started(self, event):
+        if self.enabled:
+            self.commands[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+counter = CommandCounter()
+
+
+async def measure(label, coro_factory):
+    counter.commands.clear()
+    counter.enabled = True
+    started = time.perf_counter()
+    try:
+        await coro_factory()
+    finally:
+        counter.enabled = False
+    elapsed = (time.perf_counter() - started) * 1000
+    total = sum(counter.commands.values())
+    print(f"   {label:<40} {total:>4} queries  {elapsed:>8.1f} ms  {dict(counter.commands)}")
+
+
+async def seed(db, size: int, tag: str):
+    buyer_id = f"bench-buyer-{tag}"
+    request_id = f"bench-request-{tag}"
+    legacy_request_oid = ObjectId()
+    now = datetime.now(timezone.utc).isoformat()
+
+    await db.service_requests.insert_many([
+        {"id": request_id, "client_id": buyer_id, "client_name": "Bench Buyer", "title": "Bench request",
+         "status": "open", "budget": 1000, "created_at": now, "bench": tag},
+        {"_id": legacy_request_oid, "buyer_id": buyer_id, "title": "Bench legacy request",
+         "status": "open", "budget": 1000, "created_at": now, "bench": tag},
+    ])
+
+    freelancer_ids = [f"bench-freelancer-{tag}-{i}" for i in range(size)]
+    await db.users.insert_many([
+        {"id": fid, "name": f"Freelancer {i}", "email": f"{fid}@bench.local", "role": "seller", "bench": tag}
+        for i, fid in enumerate(freelancer_ids)
+    ])
+    await db.freelancer_profiles.insert_many([
+        {"user_id": fid, "title": "Developer", "skills": ["python"], "hourly_rate": 50, "bench": tag}
+        for fid in freelancer_ids
+    ])
+    await db.proposals.insert_many([
+        {"id": str(uuid.uuid4()), "service_request_id": request_id, "request_id": str(legacy_request_oid),
+         "freelancer_id": fid, "status": "pending", "ai_match_score": 50, "created_at": now, "bench": tag}
+        for fid in freelancer_ids
+    ])
+
+    # One freelancer with proposals on many legacy requests, for get_my_proposals
+    legacy_ids = [ObjectId() for _ in range(size)]
+    await db.service_requests.insert_many([
+        {"_id": oid, "title": f"Legacy {i}", "budget": 100, "status": "open", "bench": tag}
+        for i, oid in enumerate(legacy_ids)
+    ])
+    await db.proposals.insert_many([
+        {"request_id": str(oid), "freelancer_id": freelancer_ids[0], "created_at": now, "bench": tag}
+        for oid in legacy_ids
+    ])
+
+    services = [{"id": f"bench-service-{tag}-{i}", "seller_id": "bench-seller", "seller_name": "Bench",
+                 "title": f"Service {i}", "description": "", "category": "dev", "price": 10,
+                 "delivery_days": 1, "timestamp": now, "bench": tag} for i in range(size)]
+    await db.services.insert_many(services)
+    await db.bookings.insert_many([
+        {"id": str(uuid.uuid4()), "buyer_id": buyer_id, "seller_id": "bench-seller",
+         "service_id": svc["id"], "status": "pending", "timestamp": now, "bench": tag}
+        for svc in services
+    ])
+
+    return buyer_id, request_id, str(legacy_request_oid), freelancer_ids[0]
+
+
+async def cleanup(db, tag: str):
+    for name in ("service_requests", "users", "freelancer_profiles", "proposals", "services", "bookings"):
+        await db[name].delete_many({"bench": tag})
+
+
+async def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10, 50, 100]
+
+    client = AsyncIOMotorClient(settings.MONGO_URL, event_listeners=[counter])
+    database.client = client
+    database.db = client[settings.DB_NAME]
+    db = database.db
+
+    from routes import service_request_routes, freelancer_routes, services as services_routes
+    freelancer_routes.db = db
+
+    try:
+        for size in sizes:
+            tag = uuid.uuid4().hex[:8]
+            buyer_id, request_id, legacy_request_id, freelancer_id = await seed(db, size, tag)
+            buyer = User(id=buyer_id, email=f"{buyer_id}@bench.local", name="Bench Buyer", role="buyer")
+            try:
+                print(f"\n📊 Page of {size} rows")
+                await measure("service-requests/{id}/proposals",
+                              lambda: service_request_routes.get_proposals(request_id, buyer))
+                await measure("proposals/request/{id}",
+                              lambda: freelancer_routes.get_request_proposals(legacy_request_id, {"id": buyer_id}))
+                await measure("my-proposals",
+                              lambda: freelancer_routes.get_my_proposals({"id": freelancer_id}))
+                await measure("services/bookings/my-bookings",
+                              lambda: services_routes.get_my_bookings(buyer))
+            finally:
+                await cleanup(db, tag)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+    print("\n✅ Done!")
@@ -0,0 +1,105 @@
+"""
+Benchmark: notification inserts/sec under fan-out load
+
+Simulates events that each notify many users (e.g. a new service request
+sent to every matching freelancer, with repeats for the same link) and
+stores them two ways:
+- sequential: one insert_one per notification plus a count_documents per
+  recipient for the unread badge (what the API used to do)
+- writer: NotificationWriter (coalescing, insert_many batches, one bulk
+  update of the unread counters per batch)
+
+Usage:
+    python bench_notification_writer.py [recipients] [events]    (default: 200 50)
+"""
+import asyncio
+import sys
+import time
+import uuid
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from config import settings
+from database import database
+from services import unread_service
+from services.notification_service import NotificationWriter, _build_notification
+from utils.websocket_manager import connection_manager
+
+
+def make_events(tag: str, recipients: int, events: int):
+    """events x recipients notifications; consecutive pairs of events share a link"""
+    users = [f"bench-{tag}-{i}" for i in range(recipients)]
+    docs = []
+    for e in range(events):
+        link = f"/bench/{tag}/{e // 2}"
+        for user_id in users:
+            doc = _build_notification(user_id, "new_service_request", f"Event {e}", "Benchmark", link, {"bench": tag})
+            docs.append(doc)
+    return users, docs
+
+
+async def run_sequential(db, docs):
+    start = time.perf_counter()
+    for doc in docs:
+        await db.notifications.insert_one(doc.copy())
+        await db.notifications.count_documents({"user_id": doc["user_id"], "read": False})
+    return time.perf_counter() - start
+
+
+async def run_writer(docs):
+    writer = NotificationWriter()
+    start = time.perf_counter()
+    writer.start()
+    for doc in docs:
+        writer.enqueue(doc.copy())
+        # Let the flush loop run as it would between requests
+        if writer.stats()["pending"] >= settings.NOTIFICATION_BATCH_SIZE:
+            await asyncio.sleep(0)
+    await writer.stop()
+    return time.perf_counter() - start, writer.stats()
+
+
+async def cleanup(db, tag: str, users):
+    await db.notifications.delete_many({"data.bench": tag})
+    await db.unread_counters.delete_many({"user_id": {"$in": users}})
+    for user_id in users:
+        await unread_service.counter_cache.delete(user_id)
+
+
+async def main():
+    recipients = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    events = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    client = AsyncIOMotorClient(settings.MONGO_URL)
+    database.client = client
+    database.db = client[settings.DB_NAME]
+    db = database.db
+    await connection_manager.start()
+
+    try:
+        print(f"\n📊 {events} events x {recipients} recipients = {events * recipients} notifications")
+
+        tag = uuid.uuid4().hex[:8]
+        users, docs = make_events(tag, recipients, events)
+        try:
+            elapsed = await run_sequential(db, docs)
+            print(f"   sequential: {len(docs) / elapsed:10.0f} notifications/s ({elapsed:.2f}s)")
+        finally:
+            await cleanup(db, tag, users)
+
+        tag = uuid.uuid4().hex[:8]
+        users, docs = make_events(tag, recipients, events)
+        try:
+            elapsed, stats = await run_writer(docs)
+            print(f"   writer:     {len(docs) / elapsed:10.0f} notifications/s ({elapsed:.2f}s)")
+            print(f"               stored {stats['written']} in {stats['batches']} batches, "
+                  f"coalesced {stats['coalesced']}, pushed {stats['pushed']}")
+        finally:
+            await cleanup(db, tag, users)
+    finally:
+        await connection_manager.stop()
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+"""
+Benchmark: concurrent checkout of a single hot product
+
+Compares the old read-check-then-$inc flow with guarded reservations.
+Creates a throwaway product, fires BUYERS concurrent checkouts at it and
+reports throughput, accepted orders and whether stock was oversold.
+
+Usage:
+    python bench_stock_reservation.py [buyers] [stock]
+"""
+import asyncio
+import sys
+import time
+import uuid
+
+from database import get_db
+from services import stock_reservation_service
+
+
+async def legacy_checkout(db, product_id: str, quantity: int) -> bool:
+    """Old flow: read stock, check it, then decrement unconditionally"""
+    product = await db.products.find_one({"id": product_id}, {"_id": 0, "stock": 1})
+    if not product or product.get("stock", 0) < quantity:
+        return False
+    await db.products.update_one({"id": product_id}, {"$inc": {"stock": -quantity}})
+    return True
+
+
+async def reserved_checkout(product_id: str, quantity: int) -> bool:
+    """New flow: guarded decrement plus a reservation record"""
+    try:
+        await stock_reservation_service.reserve(f"bench-{uuid.uuid4()}", {product_id: quantity})
+        return True
+    except stock_reservation_service.InsufficientStock:
+        return False
+
+
+async def run(name: str, checkout, db, buyers: int, stock: int):
+    product_id = f"bench-{uuid.uuid4()}"
+    await db.products.insert_one({"id": product_id, "title": "Benchmark hot product", "stock": stock, "price": 1})
+
+    try:
+        started = time.perf_counter()
+        results = await asyncio.gather(*(checkout(product_id, 1) for _ in range(buyers)))
+        elapsed = time.perf_counter() - started
+
+        accepted = sum(1 for ok in results if ok)
+        final = (await db.products.find_one({"id": product_id}, {"_id": 0, "stock": 1}))["stock"]
+        oversold = max(0, accepted - stock)
+
+        print(f"\n📊 {name}")
+        print(f"   {buyers} checkouts in {elapsed:.3f}s ({buyers / elapsed:.0f}/s)")
+        print(f"   Accepted: {accepted}  Rejected: {buyers - accepted}")
+        print(f"   Final stock: {final}  Oversold: {oversold} {'❌' if oversold or final < 0 else '✅'}")
+    finally:
+        await db.products.delete_one({"id": product_id})
+        await db.stock_reservations.delete_many({"items.product_id": product_id})
+
+
+async def main():
+    buyers = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    stock = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    db = get_db()
+
+    print(f"🚀 {buyers} concurrent buyers, {stock} units in stock")
+    await run("Legacy read-check-$inc", lambda pid, q: legacy_checkout(db, pid, q), db, buyers, stock)
+    await run("Guarded reservation", reserved_checkout, db, buyers, stock)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+    print("\n✅ Done!")
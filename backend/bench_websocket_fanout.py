@@ -0,0 +1,185 @@
+"""
+Load test: chat fan-out across multiple uvicorn workers
+
+Starts the API with several worker processes (or targets a running one),
+opens CLIENTS sockets from several client processes, then every client
+sends MESSAGES chat messages to random other clients. Receivers are
+spread over all workers, so delivery only works through the backplane.
+Reports connect time, delivery ratio and end-to-end latency.
+
+Needs Redis for more than one worker (WS_BACKPLANE=auto/redis).
+
+Usage:
+    python bench_websocket_fanout.py [--clients 2000] [--workers 4] [--procs 4]
+                                     [--messages 5] [--url ws://host:port]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+import websockets
+
+USER_PREFIX = "loadtest-"
+
+
+async def run_clients(url, user_ids, all_ids, messages, barrier, results, drain_seconds):
+    latencies = []
+    received = 0
+    connected = {}
+
+    async def reader(user_id, ws):
+        nonlocal received
+        try:
+            async for raw in ws:
+                data = json.loads(raw)
+                if data.get("type") != "chat":
+                    continue
+                msg = data["data"]
+                if msg.get("sender_id") == user_id:
+                    continue  # echo of our own message
+                received += 1
+                latencies.append(time.time() - float(msg["message"]))
+        except websockets.ConnectionClosed:
+            pass
+
+    started = time.perf_counter()
+    for user_id in user_ids:
+        ws = await websockets.connect(f"{url}/ws/chat/{user_id}", max_queue=None, open_timeout=60)
+        connected[user_id] = (ws, asyncio.create_task(reader(user_id, ws)))
+    connect_seconds = time.perf_counter() - started
+
+    # Everyone connected on every client process before anyone sends
+    await asyncio.get_running_loop().run_in_executor(None, barrier.wait)
+
+    sent = 0
+    for _ in range(messages):
+        for user_id, (ws, _) in connected.items():
+            receiver = random.choice(all_ids)
+            while receiver == user_id:
+                receiver = random.choice(all_ids)
+            await ws.send(json.dumps({"receiver_id": receiver, "message": repr(time.time())}))
+            sent += 1
+        await asyncio.sleep(0)
+
+    await asyncio.get_running_loop().run_in_executor(None, barrier.wait)
+    await asyncio.sleep(drain_seconds)
+
+    for ws, task in connected.values():
+        await ws.close()
+        task.cancel()
+
+    results.put({"sent": sent, "received": received, "latencies": latencies, "connect_seconds": connect_seconds})
+
+
+def client_process(url, user_ids, all_ids, messages, barrier, results, drain_seconds):
+    asyncio.run(run_clients(url, user_ids, all_ids, messages, barrier, results, drain_seconds))
+
+
+def wait_for_server(http_url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{http_url}/health", timeout=2):
+                return True
+        except Exception:
+            time.sleep(0.5)
+    return False
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def cleanup_messages():
+    from database import get_db
+    db = get_db()
+    load_users = {"$regex": f"^{USER_PREFIX}"}
+    result = await db.messages.delete_many({"sender_id": load_users})
+    print(f"🧹 Removed {result.deleted_count} load test messages")
+    # Summaries, notifications and unread counters the chat writers created
+    result = await db.conversations.delete_many({"participants": load_users})
+    print(f"🧹 Removed {result.deleted_count} load test conversations")
+    result = await db.notifications.delete_many({"user_id": load_users})
+    print(f"🧹 Removed {result.deleted_count} load test notifications")
+    result = await db.unread_counters.delete_many({"user_id": load_users})
+    print(f"🧹 Removed {result.deleted_count} load test unread counters")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--procs", type=int, default=4)
+    parser.add_argument("--messages", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--url", help="ws:// base URL of a running server (skips starting one)")
+    parser.add_argument("--drain", type=float, default=5.0, help="seconds to wait for deliveries")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if not url:
+        url = f"ws://127.0.0.1:{args.port}"
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1",
+             "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning"],
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        if not wait_for_server(url.replace("ws://", "http://")):
+            server.terminate()
+            sys.exit("❌ Server did not start")
+
+    all_ids = [f"{USER_PREFIX}{i}" for i in range(args.clients)]
+    slices = [all_ids[i::args.procs] for i in range(args.procs)]
+    barrier = mp.Barrier(args.procs)
+    results = mp.Queue()
+
+    print(f"🚀 {args.clients} sockets from {args.procs} client processes, "
+          f"{args.workers if server else '?'} server workers, {args.messages} messages each")
+
+    started = time.perf_counter()
+    procs = [
+        mp.Process(target=client_process, args=(url, ids, all_ids, args.messages, barrier, results, args.drain))
+        for ids in slices
+    ]
+    for p in procs:
+        p.start()
+    reports = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - started
+
+    sent = sum(r["sent"] for r in reports)
+    received = sum(r["received"] for r in reports)
+    latencies = [l for r in reports for l in r["latencies"]]
+
+    print(f"\n📊 Results ({elapsed:.1f}s total)")
+    print(f"   Connect: slowest process {max(r['connect_seconds'] for r in reports):.1f}s")
+    print(f"   Sent: {sent}  Delivered: {received} ({received / sent * 100 if sent else 0:.1f}%) "
+          f"{'✅' if received == sent else '❌'}")
+    if latencies:
+        print(f"   Latency ms: p50 {percentile(latencies, 50) * 1000:.1f}  "
+              f"p95 {percentile(latencies, 95) * 1000:.1f}  p99 {percentile(latencies, 99) * 1000:.1f}  "
+              f"mean {statistics.mean(latencies) * 1000:.1f}")
+
+    if server:
+        server.terminate()
+        server.wait()
+
+    asyncio.run(cleanup_messages())
+
+
+if __name__ == "__main__":
+    main()
+    print("\n✅ Done!")
@@ -23,15 +23,81 @@ class Settings:
     # Try multiple database name options to match actual MongoDB database
     DB_NAME = os.environ.get('DB_NAME') or os.environ.get('MONGODB_DB_NAME') or 'MarketPlace'  # Default to MarketPlace to match MongoDB Compass
     
+    # Redis
+    REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379')
+    REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', '50'))
+    
+    # Booking
+    SLOT_LOCK_TTL_SECONDS = int(os.getenv('SLOT_LOCK_TTL_SECONDS', '300'))
+    
+    # WebSockets (backplane: auto = Redis when connected, else in-process; or redis / memory)
+    WS_BACKPLANE = os.getenv('WS_BACKPLANE', 'auto').lower()
+    WS_HEARTBEAT_SECONDS = int(os.getenv('WS_HEARTBEAT_SECONDS', '20'))
+    WS_PRESENCE_TTL_SECONDS = int(os.getenv('WS_PRESENCE_TTL_SECONDS', '60'))
+    WS_CLIENT_TIMEOUT_SECONDS = int(os.getenv('WS_CLIENT_TIMEOUT_SECONDS', '90'))
+    WS_PRESENCE_BATCH_MS = int(os.getenv('WS_PRESENCE_BATCH_MS', '250'))
+    WS_PRESENCE_MAX_WATCH = int(os.getenv('WS_PRESENCE_MAX_WATCH', '1000'))
+    WS_SEND_QUEUE_SIZE = int(os.getenv('WS_SEND_QUEUE_SIZE', '256'))
+    WS_MAX_SEND_LAG_SECONDS = float(os.getenv('WS_MAX_SEND_LAG_SECONDS', '10'))
+    
+    # Chat write-behind
+    CHAT_WRITE_QUEUE_SIZE = int(os.getenv('CHAT_WRITE_QUEUE_SIZE', '10000'))
+    CHAT_WRITE_BATCH_SIZE = int(os.getenv('CHAT_WRITE_BATCH_SIZE', '200'))
+    CHAT_WRITE_FLUSH_MS = int(os.getenv('CHAT_WRITE_FLUSH_MS', '50'))
+    CHAT_NOTIFY_WINDOW_SECONDS = float(os.getenv('CHAT_NOTIFY_WINDOW_SECONDS', '5'))
+    
+    # Notifications (batched writer) and unread counters
+    NOTIFICATION_BATCH_SIZE = int(os.getenv('NOTIFICATION_BATCH_SIZE', '500'))
+    NOTIFICATION_FLUSH_MS = int(os.getenv('NOTIFICATION_FLUSH_MS', '200'))
+    UNREAD_CACHE_TTL_SECONDS = int(os.getenv('UNREAD_CACHE_TTL_SECONDS', '3600'))
+    
+    # Notification retention (0 days keeps read notifications until archived)
+    NOTIFICATION_READ_RETENTION_DAYS = int(os.getenv('NOTIFICATION_READ_RETENTION_DAYS', '30'))
+    NOTIFICATION_ARCHIVE_ENABLED = os.getenv('NOTIFICATION_ARCHIVE_ENABLED', 'False') == 'True'
+    NOTIFICATION_ARCHIVE_AFTER_DAYS = int(os.getenv('NOTIFICATION_ARCHIVE_AFTER_DAYS', '90'))
+    NOTIFICATION_ARCHIVE_INTERVAL_SECONDS = int(os.getenv('NOTIFICATION_ARCHIVE_INTERVAL_SECONDS', '3600'))
+    
+    # Materialized views (mode: auto = change streams, polling on standalone MongoDB; or stream / poll)
+    MATERIALIZER_ENABLED = os.getenv('MATERIALIZER_ENABLED', 'True') == 'True'
+    MATERIALIZER_MODE = os.getenv('MATERIALIZER_MODE', 'auto').lower()
+    MATERIALIZER_POLL_SECONDS = float(os.getenv('MATERIALIZER_POLL_SECONDS', '5'))
+    MATERIALIZER_CHECKPOINT_SECONDS = float(os.getenv('MATERIALIZER_CHECKPOINT_SECONDS', '1'))
+    MATERIALIZER_RESYNC_SECONDS = int(os.getenv('MATERIALIZER_RESYNC_SECONDS', '3600'))
+    MATERIALIZER_LEASE_SECONDS = int(os.getenv('MATERIALIZER_LEASE_SECONDS', '30'))
+    
+    # Cache
+    CALENDAR_CACHE_TTL_SECONDS = int(os.getenv('CALENDAR_CACHE_TTL_SECONDS', '600'))
+    CALENDAR_CACHE_MAX_ENTRIES = int(os.getenv('CALENDAR_CACHE_MAX_ENTRIES', '5000'))
+    SERVICE_REQUEST_STATS_TTL_SECONDS = int(os.getenv('SERVICE_REQUEST_STATS_TTL_SECONDS', '60'))
+    PLATFORM_STATS_REFRESH_SECONDS = int(os.getenv('PLATFORM_STATS_REFRESH_SECONDS', '60'))
+    HEALTH_CHECK_INTERVAL_SECONDS = int(os.getenv('HEALTH_CHECK_INTERVAL_SECONDS', '10'))
+    
     # Security
     JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
     JWT_ALGORITHM = os.environ.get('JWT_ALGORITHM', 'HS256')
-    JWT_EXPIRATION_DAYS = int(os.getenv('JWT_EXPIRATION_DAYS', '7'))
+    JWT_EXPIRATION_DAYS = int(os.getenv('JWT_EXPIRATION_DAYS', '7'))  # refresh token lifetime
+    ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv('ACCESS_TOKEN_EXPIRE_MINUTES', '30'))
+    USER_CACHE_TTL_SECONDS = int(os.getenv('USER_CACHE_TTL_SECONDS', '300'))
+    USER_CACHE_MAX_ENTRIES = int(os.getenv('USER_CACHE_MAX_ENTRIES', '10000'))
+    
+    # Password hashing
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '4'))
+    PASSWORD_HASH_MAX_QUEUE = int(os.getenv('PASSWORD_HASH_MAX_QUEUE', '200'))
     
     # Stripe
     STRIPE_API_KEY = os.environ.get('STRIPE_API_KEY')
     STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET')
     
+    # Stock reservations (also the Stripe session lifetime, which Stripe requires to be 30 min - 24 h)
+    STOCK_RESERVATION_TTL_MINUTES = int(os.getenv('STOCK_RESERVATION_TTL_MINUTES', '35'))
+    STOCK_RESERVATION_GRACE_SECONDS = int(os.getenv('STOCK_RESERVATION_GRACE_SECONDS', '300'))
+    STOCK_RESERVATION_SWEEP_SECONDS = int(os.getenv('STOCK_RESERVATION_SWEEP_SECONDS', '60'))
+    STOCK_RESERVATION_RETENTION_DAYS = int(os.getenv('STOCK_RESERVATION_RETENTION_DAYS', '7'))
+    
+    # Ratings (aggregates are incremental; this rebuilds them from the reviews)
+    RATING_RECONCILE_INTERVAL_SECONDS = int(os.getenv('RATING_RECONCILE_INTERVAL_SECONDS', '21600'))
+    
     # Email (Optional)
     SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
     SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
@@ -85,7 +85,8 @@ Complete Database Module with Connection Management
 
 from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo.errors import ConnectionFailure
-import redis
+import redis.asyncio as aioredis
+import asyncio
 import os
 from pathlib import Path
 from typing import Optional
@@ -152,31 +153,63 @@ def get_db():
 
 # ============ REDIS CONNECTION ============
 
-def connect_redis() -> Optional[redis.Redis]:
+# Async Redis client (redis.asyncio) backed by a shared connection pool.
+# Set by connect_redis() on startup; stays None when Redis is unreachable.
+redis_client: Optional[aioredis.Redis] = None
+
+
+async def connect_redis() -> Optional[aioredis.Redis]:
     """Connect to Redis for caching and slot locking"""
+    global redis_client
+    
+    pool = aioredis.ConnectionPool.from_url(
+        settings.REDIS_URL,
+        decode_responses=True,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        socket_connect_timeout=2
+    )
+    client = aioredis.Redis(connection_pool=pool)
+    
     try:
-        redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379')
-        client = redis.from_url(
-            redis_url,
-            decode_responses=True,
-            socket_connect_timeout=2
-        )
         # Test connection
-        client.ping()
-        logger.info("✅ Connected to Redis")
-        return client
+        await client.ping()
+        redis_client = client
+        logger.info(f"✅ Connected to Redis (pool size: {settings.REDIS_MAX_CONNECTIONS})")
     except Exception as e:
         logger.warning(f"⚠️  Redis connection failed: {e}")
-        logger.warning("📝 Slot locking will be disabled without Redis")
-        return None
+        logger.warning("📝 Falling back to in-process slot locks (single worker only)")
+        await pool.disconnect()
+        redis_client = None
+    
+    return redis_client
+
+
+def get_redis() -> Optional[aioredis.Redis]:
+    """Get the async Redis client, or None when Redis is not available"""
+    return redis_client
 
 
-# Create global Redis instance
-redis_client = connect_redis()
+async def close_redis():
+    """Close the Redis client and its connection pool"""
+    global redis_client
+    if redis_client:
+        await redis_client.aclose()
+        await redis_client.connection_pool.disconnect()
+        redis_client = None
+        logger.info("✅ Redis connection closed")
 
 
 # ============ DATABASE INDEXES ============
 
+async def _drop_indexes(collection, names):
+    """Drop indexes superseded by newer ones (ignores names that do not exist)"""
+    existing = await collection.index_information()
+    for name in names:
+        if name in existing:
+            await collection.drop_index(name)
+            logger.info(f"🗑️ Dropped index {collection.name}.{name}")
+
+
 async def init_indexes():
     """
     Initialize database indexes for optimal performance
@@ -189,6 +222,7 @@ async def init_indexes():
         await db.users.create_index("email", unique=True)
         await db.users.create_index("id", unique=True)
         await db.users.create_index("role")
+        await db.users.create_index([("timestamp", -1), ("id", -1)])
         logger.info("✅ Users indexes created")
         
         # Listings indexes
@@ -201,6 +235,38 @@ async def init_indexes():
         await db.listings.create_index("timestamp")
         logger.info("✅ Listings indexes created")
         
+        # Products indexes
+        await db.products.create_index("id", unique=True)
+        await db.products.create_index("seller_id")
+        await db.products.create_index("category")
+        await db.products.create_index([("timestamp", -1), ("id", -1)])
+        await db.products.create_index([("category", 1), ("timestamp", -1), ("id", -1)])
+        await db.products.create_index(
+            [("title", "text"), ("description", "text")],
+            weights={"title": 5, "description": 1},
+            name="products_text"
+        )
+        logger.info("✅ Products indexes created")
+        
+        # Services indexes
+        await db.services.create_index("id", unique=True)
+        await db.services.create_index("seller_id")
+        await db.services.create_index("category")
+        await db.services.create_index([("timestamp", -1), ("id", -1)])
+        await db.services.create_index([("category", 1), ("timestamp", -1), ("id", -1)])
+        await db.services.create_index(
+            [("title", "text"), ("skills", "text"), ("description", "text")],
+            weights={"title": 5, "skills": 3, "description": 1},
+            name="services_text"
+        )
+        logger.info("✅ Services indexes created")
+        
+        # Search autocomplete (edge n-gram) indexes
+        await db.search_autocomplete.create_index("id", unique=True)
+        await db.search_autocomplete.create_index("grams")
+        await db.search_autocomplete.create_index([("catalog", 1), ("grams", 1)])
+        logger.info("✅ Search autocomplete indexes created")
+        
         # Bookings indexes
         await db.bookings.create_index("id", unique=True)
         await db.bookings.create_index("service_id")
@@ -210,6 +276,11 @@ async def init_indexes():
         await db.bookings.create_index("start_time")
         await db.bookings.create_index([("service_id", 1), ("start_time", 1)])
         await db.bookings.create_index("timestamp")
+        await db.bookings.create_index([("client_id", 1), ("start_time", -1), ("id", -1)])
+        await db.bookings.create_index([("provider_id", 1), ("start_time", -1), ("id", -1)])
+        # Analytics windows (provider's bookings by creation time)
+        await db.bookings.create_index([("provider_id", 1), ("timestamp", -1)])
+        await db.bookings.create_index([("seller_id", 1), ("timestamp", -1)])
         logger.info("✅ Bookings indexes created")
         
         # Availability indexes
@@ -230,6 +301,8 @@ async def init_indexes():
         await db.reviews.create_index("listing_id")
         await db.reviews.create_index("user_id")
         await db.reviews.create_index("timestamp")
+        await db.reviews.create_index([("listing_id", 1), ("timestamp", -1), ("id", -1)])
+        await db.reviews.create_index([("item_id", 1), ("item_type", 1), ("timestamp", -1), ("id", -1)])
         logger.info("✅ Reviews indexes created")
         
         # Orders indexes
@@ -239,27 +312,83 @@ async def init_indexes():
         await db.orders.create_index("listing_id")
         await db.orders.create_index("status")
         await db.orders.create_index("timestamp")
+        await db.orders.create_index([("buyer_id", 1), ("timestamp", -1), ("id", -1)])
+        await db.orders.create_index([("seller_id", 1), ("timestamp", -1), ("id", -1)])
         logger.info("✅ Orders indexes created")
         
         # Messages indexes
         await db.messages.create_index("id", unique=True)
-        await db.messages.create_index([("sender_id", 1), ("receiver_id", 1)])
+        await db.messages.create_index([("sender_id", 1), ("receiver_id", 1), ("timestamp", -1), ("id", -1)])
         await db.messages.create_index("timestamp")
         await db.messages.create_index("read")
+        await db.messages.create_index([("conversation_id", 1), ("timestamp", -1), ("id", -1)])
         logger.info("✅ Messages indexes created")
         
+        # Unread counters
+        await db.unread_counters.create_index("user_id", unique=True)
+        logger.info("✅ Unread counter indexes created")
+        
+        # Conversation summaries
+        await db.conversations.create_index("id", unique=True)
+        await db.conversations.create_index([("participants", 1), ("updated_at", -1), ("id", -1)])
+        logger.info("✅ Conversations indexes created")
+        
+        # Daily dashboard rollups
+        await db.seller_daily_rollups.create_index([("seller_id", 1), ("day", 1)], unique=True)
+        await db.service_daily_rollups.create_index([("service_id", 1), ("day", 1)], unique=True)
+        logger.info("✅ Rollup indexes created")
+        
+        # Materialized views (utils/change_streams.py)
+        await db.provider_stats.create_index("seller_id", unique=True)
+        await db.mv_contributions.create_index("view")
+        logger.info("✅ Materialized view indexes created")
+        
         # Notifications indexes
+        # (user_id, timestamp) serves the list sort; unread lookups use a partial index
+        await _drop_indexes(db.notifications, ["user_id_1", "read_1", "user_id_1_read_1"])
         await db.notifications.create_index("id", unique=True)
-        await db.notifications.create_index("user_id")
-        await db.notifications.create_index("read")
+        await db.notifications.create_index([("user_id", 1), ("timestamp", -1)])
+        await db.notifications.create_index(
+            [("user_id", 1), ("read", 1), ("timestamp", -1)],
+            partialFilterExpression={"read": False},
+            name="user_id_1_read_1_timestamp_-1_unread"
+        )
         await db.notifications.create_index("timestamp")
+        # Read notifications are purged once purge_at passes (unread ones have no purge_at)
+        await db.notifications.create_index("purge_at", expireAfterSeconds=0)
+        # Notifications claimed by an archive batch (only set while archiving)
+        await db.notifications.create_index("archive_batch", sparse=True)
+        await db.notification_archive.create_index([("user_id", 1), ("month", -1)], unique=True)
         logger.info("✅ Notifications indexes created")
         
         # Wishlist indexes
         await db.wishlist.create_index("id", unique=True)
         await db.wishlist.create_index([("user_id", 1), ("listing_id", 1)], unique=True)
+        await db.wishlist.create_index([("user_id", 1), ("timestamp", -1), ("id", -1)])
         logger.info("✅ Wishlist indexes created")
         
+        # Service requests indexes
+        await db.service_requests.create_index("id")
+        await db.service_requests.create_index([("client_id", 1), ("created_at", -1), ("id", -1)])
+        await db.service_requests.create_index([("status", 1), ("created_at", -1), ("id", -1)])
+        await db.service_requests.create_index([("created_at", -1), ("id", -1)])
+        await db.proposals.create_index([("service_request_id", 1), ("freelancer_id", 1)])
+        logger.info("✅ Service requests indexes created")
+        
+        # Freelancer skill/category inverted index
+        await db.freelancer_profiles.create_index("user_id")
+        await db.freelancer_terms.create_index([("term", 1), ("user_id", 1)], unique=True)
+        await db.freelancer_terms.create_index("user_id")
+        logger.info("✅ Freelancer index indexes created")
+        
+        # Stock reservations indexes
+        await db.stock_reservations.create_index("id", unique=True)
+        await db.stock_reservations.create_index("session_id")
+        await db.stock_reservations.create_index([("status", 1), ("expires_at", 1)])
+        # Closed reservations are purged once purge_at passes (active ones have no purge_at)
+        await db.stock_reservations.create_index("purge_at", expireAfterSeconds=0)
+        logger.info("✅ Stock reservations indexes created")
+        
         # Payment transactions indexes
         await db.payment_transactions.create_index("id", unique=True)
         await db.payment_transactions.create_index("session_id", unique=True)
@@ -292,24 +421,32 @@ async def clear_expired_locks():
         logger.error(f"❌ Failed to clear expired locks: {e}")
 
 
+STATS_COLLECTIONS = (
+    "users", "listings", "bookings", "orders", "reviews",
+    "messages", "notifications", "service_requests", "proposals",
+)
+
+
 async def get_collection_stats() -> dict:
-    """Get statistics about database collections"""
+    """
+    Approximate document counts of the main collections
+    
+    Uses collection metadata (estimated_document_count), all counts at once,
+    so this never scans a collection. Collections that fail are left out.
+    """
     db = get_db()
     
-    try:
-        stats = {
-            "users": await db.users.count_documents({}),
-            "listings": await db.listings.count_documents({}),
-            "bookings": await db.bookings.count_documents({}),
-            "orders": await db.orders.count_documents({}),
-            "reviews": await db.reviews.count_documents({}),
-            "messages": await db.messages.count_documents({}),
-            "notifications": await db.notifications.count_documents({}),
-        }
-        return stats
-    except Exception as e:
-        logger.error(f"❌ Failed to get collection stats: {e}")
-        return {}
+    results = await asyncio.gather(
+        *(db[name].estimated_document_count() for name in STATS_COLLECTIONS),
+        return_exceptions=True
+    )
+    stats = {}
+    for name, result in zip(STATS_COLLECTIONS, results):
+        if isinstance(result, Exception):
+            logger.error(f"❌ Failed to count {name}: {result}")
+        else:
+            stats[name] = result
+    return stats
 
 
 async def reset_database():
@@ -364,7 +501,7 @@ async def check_database_health() -> dict:
     # Check Redis
     try:
         if redis_client:
-            redis_client.ping()
+            await redis_client.ping()
             health["redis"] = {
                 "status": "healthy",
                 "message": "Connected"
@@ -104,6 +104,7 @@ class Listing(BaseModel):
     verified: bool = False
     rating: float = 0.0
     reviews_count: int = 0
+    rating_histogram: Dict[str, int] = {}
     type: str = "product"
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -242,6 +243,7 @@ class Message(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     sender_id: str
     receiver_id: str
+    conversation_id: Optional[str] = None
     listing_id: Optional[str] = None
     message: str
     file_url: Optional[str] = None
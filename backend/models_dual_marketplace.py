@@ -26,6 +26,7 @@ class Product(BaseModel):
     images: List[str] = []
     rating: float = 0.0
     reviews_count: int = 0
+    rating_histogram: Dict[str, int] = {}
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
@@ -99,6 +100,7 @@ class Service(BaseModel):
     experience_level: str = "intermediate"  # beginner, intermediate, expert
     rating: float = 0.0
     reviews_count: int = 0
+    rating_histogram: Dict[str, int] = {}
     completed_count: int = 0
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
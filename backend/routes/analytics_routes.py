@@ -0,0 +1,82 @@
+# backend/routes/analytics_routes.py
+"""
+Analytics Routes for NovoMarket
+Provider dashboards (computed by MongoDB aggregation in analytics_service)
+and daily seller/service graphs (read from rollup_service's daily rollups)
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from database import get_db
+from utils.auth_utils import get_current_user
+from models import User, AnalyticsData, DashboardStats
+from services import analytics_service, rollup_service
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+
+def _require_provider(current_user: User):
+    if current_user.role == "buyer":
+        raise HTTPException(status_code=403, detail="Analytics are available to providers only")
+
+
+@router.get("/provider", response_model=AnalyticsData)
+async def get_provider_analytics(
+    days: int = Query(30, ge=1, le=365),
+    current_user: User = Depends(get_current_user)
+):
+    """Revenue, bookings, orders, rating, popular services and revenue trend"""
+    _require_provider(current_user)
+    return await analytics_service.get_analytics_data(current_user.id, days)
+
+
+@router.get("/provider/dashboard", response_model=DashboardStats)
+async def get_provider_dashboard(current_user: User = Depends(get_current_user)):
+    """Headline numbers for the provider dashboard"""
+    _require_provider(current_user)
+    return await analytics_service.get_dashboard_stats(current_user.id)
+
+
+@router.get("/provider/details")
+async def get_provider_analytics_details(
+    days: int = Query(30, ge=1, le=365),
+    current_user: User = Depends(get_current_user)
+):
+    """Summary with growth, daily breakdown, per-service revenue, peak hours and value distribution"""
+    _require_provider(current_user)
+    return await analytics_service.get_provider_analytics(current_user.id, days)
+
+
+@router.get("/provider/clients")
+async def get_provider_clients(
+    top: int = Query(10, ge=1, le=50),
+    current_user: User = Depends(get_current_user)
+):
+    """Client counts, retention rate and top clients"""
+    _require_provider(current_user)
+    return await analytics_service.get_client_insights(current_user.id, top)
+
+
+@router.get("/seller/daily")
+async def get_seller_daily(
+    days: int = Query(7, ge=1, le=31),
+    current_user: User = Depends(get_current_user)
+):
+    """Orders, bookings, revenue, cancellations and hourly activity per day (oldest first)"""
+    _require_provider(current_user)
+    return {"days": await rollup_service.get_seller_daily(current_user.id, days)}
+
+
+@router.get("/services/{service_id}/daily")
+async def get_service_daily(
+    service_id: str,
+    days: int = Query(7, ge=1, le=31),
+    current_user: User = Depends(get_current_user)
+):
+    """Bookings, revenue, cancellations and hourly activity per day for one of the seller's services"""
+    db = get_db()
+    service = await db.services.find_one({"id": service_id}, {"_id": 0, "seller_id": 1})
+    if not service:
+        raise HTTPException(status_code=404, detail="Service not found")
+    if service.get("seller_id") != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return {"days": await rollup_service.get_service_daily(service_id, days)}
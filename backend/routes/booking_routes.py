@@ -3,12 +3,15 @@
 Booking Routes with Notifications Integration
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
-from typing import Optional, Dict
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
 from datetime import datetime, timezone
 from database import get_db
 from utils.auth_utils import get_current_user
+from utils.pagination import paginate
 from models import User
+from services.booking_service import invalidate_calendar_cache
+from services import rollup_service
 from services.notification_service import (
     create_notification,
     send_booking_notifications,
@@ -21,9 +24,11 @@ router = APIRouter(prefix="/bookings", tags=["Bookings"])
 @router.get("/my-bookings")
 async def get_my_bookings(
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
     current_user: User = Depends(get_current_user)
 ):
-    """Get all bookings for current user (as client or provider)"""
+    """Get bookings for current user (as client or provider), latest start first"""
     db = get_db()
     
     # Build query based on user role
@@ -35,14 +40,16 @@ async def get_my_bookings(
     if status:
         query["status"] = status
     
-    bookings = await db.bookings.find(query, {"_id": 0}).sort("start_time", -1).to_list(100)
+    bookings, next_cursor = await paginate(
+        db.bookings, query, limit=limit, cursor=cursor, sort_field="start_time"
+    )
     
     # Convert timestamps
     for booking in bookings:
         if "timestamp" in booking:
             booking["created_at"] = booking.pop("timestamp")
     
-    return {"bookings": bookings}
+    return {"bookings": bookings, "next_cursor": next_cursor}
 
 
 @router.post("/{booking_id}/complete")
@@ -102,11 +109,15 @@ async def cancel_booking(
     if booking["status"] != "confirmed":
         raise HTTPException(status_code=400, detail="Can only cancel confirmed bookings")
     
-    # Update booking status
-    await db.bookings.update_one(
-        {"id": booking_id},
+    # Update booking status (guarded so a concurrent cancel is only counted once)
+    result = await db.bookings.update_one(
+        {"id": booking_id, "status": "confirmed"},
         {"$set": {"status": "cancelled"}}
     )
+    if result.modified_count == 0:
+        raise HTTPException(status_code=400, detail="Can only cancel confirmed bookings")
+    await invalidate_calendar_cache(booking["service_id"])
+    await rollup_service.record_booking_cancelled(booking)
     
     # Notify the other party
     other_user_id = (
@@ -123,38 +134,8 @@ async def cancel_booking(
     return {"message": "Booking cancelled successfully"}
 
 
-# Keep your existing routes below
-@router.get("/available-slots/{service_id}")
-async def get_available_slots(
-    service_id: str,
-    date: str = Query(...),
-    current_user: User = Depends(get_current_user)
-):
-    """Get available time slots for a service on a specific date"""
-    # Your existing implementation
-    pass
-
-
-@router.post("/lock-slot")
-async def lock_time_slot(
-    payload: Dict = Body(...),
-    current_user: User = Depends(get_current_user)
-):
-    """Lock a time slot temporarily"""
-    # Your existing implementation
-    pass
-
-
-@router.post("/create")
-async def create_booking(
-    booking_data: Dict = Body(...),
-    current_user: User = Depends(get_current_user)
-):
-    """Create a new booking"""
-    # Your existing implementation + add notification
-    # After creating booking, add:
-    # await send_booking_notifications(booking_dict)
-    pass
+# NOTE: /available-slots, /lock-slot, /unlock-slot and /create are served by server.py.
+# This router is included first, so placeholder routes here would shadow them.
 
 
 print("✅ Booking routes loaded successfully!")
\ No newline at end of file
@@ -12,11 +12,11 @@ from models_dual_marketplace import (
     ProductOrder, ServiceBooking
 )
 from config import settings
+from services import catalog_service, stock_reservation_service, rollup_service
 import stripe
 from datetime import datetime, timezone
 import logging
 from typing import Dict, Any
-import re
 
 # Initialize Stripe
 if settings.STRIPE_API_KEY:
@@ -28,6 +28,14 @@ else:
 router = APIRouter(prefix="/checkout", tags=["Checkout"])
 logger = logging.getLogger(__name__)
 
+
+def _sum_quantities(lines) -> Dict[str, int]:
+    """Total requested quantity per product id (a product may appear on several lines)"""
+    totals: Dict[str, int] = {}
+    for product_id, quantity in lines:
+        totals[product_id] = totals.get(product_id, 0) + quantity
+    return totals
+
 # Stripe exception compatibility (handles different stripe-python versions)
 try:
     from stripe.error import StripeError as StripeErrorCompat  # stripe<5 style
@@ -94,31 +102,29 @@ async def create_checkout_session(
         
         if payload.type == "product":
             # Product checkout - from cart
+            cart_lines = []
             for item in payload.items:
                 item_id = item.id if hasattr(item, 'id') else item.get('id') if isinstance(item, dict) else None
                 item_quantity = item.quantity if hasattr(item, 'quantity') else item.get('quantity', 1) if isinstance(item, dict) else 1
                 
                 if not item_id:
                     raise HTTPException(status_code=400, detail="Invalid item: missing id")
-                
-                product = await db.products.find_one({"id": item_id}, {"_id": 0})
+                cart_lines.append((item_id, item_quantity))
+            
+            # One $in query for every product in the cart
+            products_by_id = await catalog_service.fetch_products(item_id for item_id, _ in cart_lines)
+            requested = _sum_quantities(cart_lines)
+            
+            for item_id, item_quantity in cart_lines:
+                product = products_by_id.get(item_id)
                 if not product:
                     raise HTTPException(status_code=404, detail=f"Product {item_id} not found")
                 
-                if product.get('stock', 0) < item_quantity:
+                if product.get('stock', 0) < requested[item_id]:
                     raise HTTPException(status_code=400, detail=f"Insufficient stock for {product.get('title', 'product')}")
                 
                 # Robust price parsing: accept strings like "$900", "900.00", etc.
-                raw_price = product.get('price', 0)
-                if isinstance(raw_price, (int, float)):
-                    product_price = float(raw_price)
-                else:
-                    try:
-                        # keep digits and dots only
-                        cleaned = re.sub(r"[^0-9.]", "", str(raw_price))
-                        product_price = float(cleaned or 0)
-                    except Exception:
-                        product_price = 0.0
+                product_price = catalog_service.parse_price(product.get('price', 0))
                 if product_price <= 0:
                     raise HTTPException(status_code=400, detail=f"Invalid product price: ${product_price}")
                 
@@ -144,7 +150,12 @@ async def create_checkout_session(
                 total_amount += product_price * item_quantity
         
         else:  # service
-            # Service checkout
+            # Service checkout - batch the common case (lookup by 'id') up front
+            services_by_id = await catalog_service.fetch_services(
+                item.id if hasattr(item, 'id') else item.get('id') if isinstance(item, dict) else None
+                for item in payload.items
+            )
+            
             for item in payload.items:
                 logger.info(f"🔵 Processing service item: {item}")
                 item_id = item.id if hasattr(item, 'id') else item.get('id') if isinstance(item, dict) else None
@@ -160,7 +171,9 @@ async def create_checkout_session(
                 from bson import ObjectId
                 
                 # First try with 'id' field
-                service = await db.services.find_one({"id": item_id}, {"_id": 0})
+                service = services_by_id.get(item_id)
+                if service:
+                    service = dict(service)
                 
                 # If not found, try with _id
                 if not service:
@@ -201,16 +214,7 @@ async def create_checkout_session(
                     booking_data = {}
                 
                 # Robust price parsing: accept numeric or string with symbols
-                raw_price = service.get('price', 0)
-                if isinstance(raw_price, (int, float)):
-                    service_price = float(raw_price)
-                else:
-                    try:
-                        # Remove currency symbols and keep only digits/dots
-                        cleaned = re.sub(r"[^0-9.]", "", str(raw_price))
-                        service_price = float(cleaned or 0)
-                    except Exception:
-                        service_price = 0.0
+                service_price = catalog_service.parse_price(service.get('price', 0))
                 
                 if service_price <= 0:
                     raise HTTPException(status_code=400, detail=f"Invalid service price: ${service_price}")
@@ -267,11 +271,28 @@ async def create_checkout_session(
             if item.get('quantity', 0) <= 0:
                 raise HTTPException(status_code=400, detail=f"Invalid quantity for item {idx + 1}")
         
+        # Hold the stock until the Stripe session completes, is cancelled or expires
+        reservation = None
+        if payload.type == "product":
+            try:
+                reservation = await stock_reservation_service.reserve(current_user.id, requested)
+            except stock_reservation_service.InsufficientStock as e:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Insufficient stock for {e.title or 'product'}. Available: {e.available}"
+                )
+            cancel_url = f"{cancel_url}?reservation={reservation['id']}"
+        
         try:
             # Ensure Stripe is initialized
             if not stripe.api_key:
                 raise HTTPException(status_code=500, detail="Stripe API key not configured")
             
+            session_options = {}
+            if reservation:
+                # The session expires together with the stock it holds
+                session_options['expires_at'] = int(reservation['expires_at'].timestamp())
+            
             checkout_session = stripe.checkout.Session.create(
                 line_items=line_items,
                 mode='payment',
@@ -281,13 +302,18 @@ async def create_checkout_session(
                     'type': payload.type,
                     'buyer_id': current_user.id,
                     'items': str(metadata_items)[:500],  # Limit metadata size
-                    'total_amount': str(total_amount)
+                    'total_amount': str(total_amount),
+                    'reservation_id': reservation['id'] if reservation else ''
                 },
-                customer_email=current_user.email
+                customer_email=current_user.email,
+                **session_options
             )
             
             logger.info(f"✅ Stripe session created: {checkout_session.id}")
             
+            if reservation:
+                await stock_reservation_service.attach_session(reservation['id'], checkout_session.id)
+            
             # Store session info in database
             session_data = {
                 "session_id": checkout_session.id,
@@ -295,6 +321,7 @@ async def create_checkout_session(
                 "type": payload.type,
                 "items": metadata_items,
                 "total_amount": total_amount,
+                "reservation_id": reservation['id'] if reservation else None,
                 "status": "pending",
                 "created_at": datetime.now(timezone.utc).isoformat()
             }
@@ -308,12 +335,16 @@ async def create_checkout_session(
         
         except StripeErrorCompat as e:
             logger.error(f"❌ Stripe error: {str(e)}", exc_info=True)
+            if reservation:
+                await stock_reservation_service.release(reservation_id=reservation['id'], reason="session_failed")
             raise HTTPException(
                 status_code=500, 
                 detail=f"Payment processing error: {str(e)}"
             )
         except Exception as e:
             logger.error(f"❌ Unexpected error creating checkout session: {str(e)}", exc_info=True)
+            if reservation:
+                await stock_reservation_service.release(reservation_id=reservation['id'], reason="session_failed")
             raise HTTPException(
                 status_code=500, 
                 detail=f"Failed to create checkout session: {str(e)}"
@@ -432,12 +463,15 @@ async def stripe_webhook(request: Request):
                 products = []
                 total_amount = 0
                 
+                products_by_id = await catalog_service.fetch_products(item.get('product_id') for item in items_data)
+                stock_updates: Dict[str, int] = {}
+                
                 for item in items_data:
                     product_id = item.get('product_id')
                     quantity = item.get('quantity', 1)
                     price = item.get('price', 0)
                     
-                    product = await db.products.find_one({"id": product_id}, {"_id": 0})
+                    product = products_by_id.get(product_id)
                     if product:
                         product_ids.append(product_id)
                         products.append({
@@ -446,12 +480,10 @@ async def stripe_webhook(request: Request):
                             "subtotal": price * quantity
                         })
                         total_amount += price * quantity
-                        
-                        # Update stock
-                        await db.products.update_one(
-                            {"id": product_id},
-                            {"$inc": {"stock": -quantity}}
-                        )
+                        stock_updates[product_id] = stock_updates.get(product_id, 0) + quantity
+                
+                # Stock was held when the session was created - commit the hold
+                await stock_reservation_service.settle_paid_session(session_id, stock_updates)
                 
                 if products:
                     # Get seller info (assuming single seller for simplicity, or handle multiple)
@@ -476,6 +508,7 @@ async def stripe_webhook(request: Request):
                     order_dict['timestamp'] = order_dict.pop('created_at').isoformat()
                     
                     await db.orders.insert_one(order_dict)
+                    await rollup_service.record_order(order_dict)
                     
                     # Clear cart
                     await db.cart.delete_many({"buyer_id": buyer_id})
@@ -483,10 +516,11 @@ async def stripe_webhook(request: Request):
             else:  # service
                 # Create booking for service
                 items_data = session_data.get('items', [])
+                services_by_id = await catalog_service.fetch_services(item.get('service_id') for item in items_data)
                 
                 for item in items_data:
                     service_id = item.get('service_id')
-                    service = await db.services.find_one({"id": service_id}, {"_id": 0})
+                    service = services_by_id.get(service_id)
                     
                     if service:
                         booking = ServiceBooking(
@@ -502,8 +536,11 @@ async def stripe_webhook(request: Request):
                         
                         booking_dict = booking.model_dump()
                         booking_dict['timestamp'] = booking_dict.pop('booked_at').isoformat()
+                        # Price at booking time (dashboards and rollups use it)
+                        booking_dict['price'] = catalog_service.parse_price(service.get('price', 0))
                         
                         await db.bookings.insert_one(booking_dict)
+                        await rollup_service.record_booking(booking_dict)
             
             # Update session status
             await db.checkout_sessions.update_one(
@@ -511,9 +548,51 @@ async def stripe_webhook(request: Request):
                 {"$set": {"status": "completed"}}
             )
     
+    elif event['type'] == 'checkout.session.expired':
+        session_id = event['data']['object']['id']
+        await stock_reservation_service.release(session_id=session_id, reason="expired")
+        await db.checkout_sessions.update_one(
+            {"session_id": session_id, "status": "pending"},
+            {"$set": {"status": "expired"}}
+        )
+    
     return {"status": "success"}
 
 
+@router.post("/cancel")
+async def cancel_checkout(
+    payload: Dict[str, Any] = Body(...),
+    current_user: User = Depends(get_current_user)
+):
+    """Release the stock held for an abandoned checkout (called from the Stripe cancel redirect)"""
+    reservation_id = payload.get("reservation_id")
+    if not reservation_id:
+        raise HTTPException(status_code=400, detail="reservation_id is required")
+    
+    reservation = await stock_reservation_service.release(
+        reservation_id=reservation_id,
+        reason="cancelled",
+        buyer_id=current_user.id
+    )
+    if not reservation:
+        return {"released": False}
+    
+    # Make sure the abandoned session can no longer be paid
+    session_id = reservation.get("session_id")
+    if session_id and stripe.api_key:
+        try:
+            stripe.checkout.Session.expire(session_id)
+        except StripeErrorCompat as e:
+            logger.warning(f"⚠️ Could not expire Stripe session {session_id}: {e}")
+        db = get_db()
+        await db.checkout_sessions.update_one(
+            {"session_id": session_id, "status": "pending"},
+            {"$set": {"status": "cancelled"}}
+        )
+    
+    return {"released": True}
+
+
 @router.post("/create-cod-order")
 async def create_cod_order(
     payload: CheckoutSessionRequest,
@@ -536,25 +615,31 @@ async def create_cod_order(
         products = []
         total_amount = 0
         
-        # Process each item
-        for item in payload.items:
-            # CheckoutItem is a Pydantic model, access attributes directly
-            product_id = item.id
-            quantity = item.quantity  # Default is 1 in the model
-            
-            # Get product details
-            product = await db.products.find_one({"id": product_id}, {"_id": 0})
-            if not product:
+        # CheckoutItem is a Pydantic model, access attributes directly (quantity defaults to 1)
+        cart_lines = [(item.id, item.quantity) for item in payload.items]
+        
+        # Get product details for every item in one query
+        products_by_id = await catalog_service.fetch_products(product_id for product_id, _ in cart_lines)
+        requested = _sum_quantities(cart_lines)
+        
+        for product_id, _ in cart_lines:
+            if product_id not in products_by_id:
                 raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+        
+        # Take the stock up front; guarded so concurrent orders cannot oversell
+        try:
+            await stock_reservation_service.take_stock_bulk(requested)
+        except stock_reservation_service.InsufficientStock as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Insufficient stock for {e.title or 'product'}. Available: {e.available}"
+            )
+        
+        # Process each item
+        for product_id, quantity in cart_lines:
+            product = products_by_id[product_id]
             
-            # Check stock
-            if product.get('stock', 0) < quantity:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Insufficient stock for {product.get('title', 'product')}. Available: {product.get('stock', 0)}"
-                )
-            
-            price = product.get('price', 0)
+            price = catalog_service.parse_price(product.get('price', 0))
             subtotal = price * quantity
             total_amount += subtotal
             
@@ -566,12 +651,6 @@ async def create_cod_order(
                 "quantity": quantity,
                 "subtotal": subtotal
             })
-            
-            # Update stock
-            await db.products.update_one(
-                {"id": product_id},
-                {"$inc": {"stock": -quantity}}
-            )
         
         if not products:
             raise HTTPException(status_code=400, detail="No valid products found")
@@ -597,7 +676,13 @@ async def create_cod_order(
         order_dict = order.model_dump()
         order_dict['timestamp'] = order_dict.pop('created_at').isoformat()
         
-        await db.orders.insert_one(order_dict)
+        try:
+            await db.orders.insert_one(order_dict)
+        except Exception:
+            # No order was placed - hand the stock back
+            await stock_reservation_service.restore_stock(requested)
+            raise
+        await rollup_service.record_order(order_dict)
         
         # Clear cart
         await db.cart.delete_many({"buyer_id": current_user.id})
@@ -18,6 +18,8 @@ logger = logging.getLogger(__name__)
 
 # Database connection - Use centralized config
 from config import settings
+from services import freelancer_index_service, request_stats_service
+from utils.joins import Join, batch_join
 
 MONGODB_URL = settings.MONGO_URL
 DB_NAME = settings.DB_NAME  # This will be 'MarketPlace' by default
@@ -189,6 +191,8 @@ async def create_or_update_profile(
                 logger.warning(f"⚠️ No profile found to update for user: {current_user['id']}")
                 raise HTTPException(status_code=404, detail="Profile not found for update")
             
+            await freelancer_index_service.index_profile(current_user["id"], {**existing, **update_data})
+            
             # Fetch updated profile
             updated = await db.freelancer_profiles.find_one({
                 "user_id": current_user["id"]
@@ -242,6 +246,8 @@ async def create_or_update_profile(
                 total_count = await db.freelancer_profiles.count_documents({})
                 logger.info(f"✅ Total profiles in collection after insert: {total_count}")
                 
+                await freelancer_index_service.index_profile(current_user["id"], created)
+                
                 # Convert ObjectId to string for JSON serialization
                 created["id"] = str(created["_id"])
                 created["_id"] = str(created["_id"])
@@ -361,6 +367,8 @@ async def delete_profile(current_user: dict = Depends(get_current_user)):
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Profile not found")
         
+        await freelancer_index_service.remove_profile(current_user["id"])
+        
         return {"message": "Profile deleted successfully"}
     except HTTPException:
         raise
@@ -382,8 +390,10 @@ async def create_service_request(
         request_data["status"] = "open"
         request_data["created_at"] = datetime.now(timezone.utc)
         request_data["proposals_count"] = 0
+        request_data["pending_proposals_count"] = 0
         
         result = await db.service_requests.insert_one(request_data)
+        await request_stats_service.invalidate_stats()
         
         return {
             "message": "Service request posted successfully",
@@ -538,10 +548,7 @@ async def submit_proposal(
         
         result = await db.proposals.insert_one(proposal_data)
         
-        await db.service_requests.update_one(
-            {"_id": ObjectId(proposal.request_id)},
-            {"$inc": {"proposals_count": 1}}
-        )
+        await request_stats_service.proposal_submitted(proposal.request_id)
         
         print(f"✅ Proposal saved successfully: {result.inserted_id}")
         
@@ -580,13 +587,17 @@ async def get_request_proposals(
         cursor = db.proposals.find({"request_id": request_id}).sort("created_at", -1)
         proposals = await cursor.to_list(length=100)
         
+        # Fetch freelancer details for the whole page at once
+        (freelancers,) = await batch_join(
+            proposals,
+            Join(db.freelancer_profiles, "freelancer_id", foreign_field="user_id",
+                 projection={"_id": 0, "user_id": 1, "title": 1, "rating": 1, "total_jobs": 1})
+        )
+        
         for proposal in proposals:
             proposal["_id"] = str(proposal["_id"])
             
-            # Fetch freelancer details
-            freelancer = await db.freelancer_profiles.find_one({
-                "user_id": proposal["freelancer_id"]
-            })
+            freelancer = freelancers.get(proposal["freelancer_id"])
             if freelancer:
                 proposal["freelancer_details"] = {
                     "title": freelancer.get("title", ""),
@@ -610,14 +621,20 @@ async def get_my_proposals(current_user: dict = Depends(get_current_user)):
         
         proposals = await cursor.to_list(length=100)
         
+        # Fetch request details for the whole page at once
+        (requests,) = await batch_join(
+            proposals,
+            Join(db.service_requests, "request_id", foreign_field="_id",
+                 projection={"title": 1, "budget": 1, "status": 1},
+                 convert=lambda rid: ObjectId(rid) if ObjectId.is_valid(rid) else None)
+        )
+        
         for proposal in proposals:
             proposal["_id"] = str(proposal["_id"])
             
             # Fetch request details
             if ObjectId.is_valid(proposal["request_id"]):
-                request = await db.service_requests.find_one({
-                    "_id": ObjectId(proposal["request_id"])
-                })
+                request = requests.get(proposal["request_id"])
                 if request:
                     proposal["request_details"] = {
                         "title": request.get("title", ""),
@@ -676,6 +693,7 @@ async def accept_proposal(
             },
             {"$set": {"status": "rejected"}}
         )
+        await request_stats_service.proposal_accepted(proposal["request_id"])
         
         return {"message": "Proposal accepted successfully"}
     
@@ -710,10 +728,13 @@ async def reject_proposal(
         if not request:
             raise HTTPException(status_code=403, detail="Not authorized")
         
-        await db.proposals.update_one(
+        previous = await db.proposals.find_one_and_update(
             {"_id": ObjectId(proposal_id)},
-            {"$set": {"status": "rejected", "rejected_at": datetime.now(timezone.utc)}}
+            {"$set": {"status": "rejected", "rejected_at": datetime.now(timezone.utc)}},
+            projection={"status": 1}
         )
+        if previous and previous.get("status") == "pending":
+            await request_stats_service.proposal_rejected(proposal["request_id"])
         
         return {"message": "Proposal rejected"}
     
@@ -4,7 +4,7 @@ NovoMarket Marketplace Routes - All Issues Fixed
 Location: backend/routes/marketplace.py
 """
 
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Request
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Request, Body, Query, Response
 from typing import List, Optional
 import uuid
 import shutil
@@ -12,14 +12,21 @@ from datetime import datetime, timezone, timedelta
 from pathlib import Path
 
 from database import get_db
-from utils.auth_utils import get_current_user, hash_password, verify_password, create_access_token
+from utils.auth_utils import (
+    get_current_user, get_full_user,
+    create_token_pair, decode_refresh_token, load_user, invalidate_user_cache
+)
+from utils.password_hasher import password_hasher, PasswordHasherBusy
+from utils.pagination import paginate, set_next_cursor_header
+from utils.joins import Join, batch_join
 from config import settings
+from services import search_service, rating_service, conversation_service, rollup_service
 from models import (
-    User, UserCreate, UserLogin,
+    User, UserCreate, UserLogin, UserUpdate,
     Listing, ListingCreate, ListingUpdate,
     Review, ReviewCreate,
     Order,
-    Message,
+    Message, Thread,
     Wishlist,
     PaymentTransaction, CheckoutSessionResponse, CheckoutStatusResponse
 )
@@ -52,33 +59,84 @@ async def register(user_data: UserCreate):
     
     user_dict = user.model_dump()
     user_dict['timestamp'] = user_dict.pop('created_at').isoformat()
-    user_dict['password'] = hash_password(user_data.password)
+    try:
+        user_dict['password'] = await password_hasher.hash(user_data.password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server is busy, please try again shortly")
     
     await db.users.insert_one(user_dict)
     
-    token = create_access_token({"user_id": user.id, "email": user.email})
-    return {"token": token, "user": user.model_dump()}
+    return {**create_token_pair(user), "user": user.model_dump()}
 
 @router.post("/auth/login")
 async def login(credentials: UserLogin):
     """Login user"""
     db = get_db()
     user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
-    if not user or not verify_password(credentials.password, user.get('password', '')):
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    
+    try:
+        valid, new_hash = await password_hasher.verify_and_update(
+            credentials.password, user.get('password', '')
+        )
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server is busy, please try again shortly")
+    
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
+    # Stored hash used an outdated work factor: upgrade it transparently
+    if new_hash:
+        await db.users.update_one({"id": user['id']}, {"$set": {"password": new_hash}})
+    
     user.pop('password', None)
     if isinstance(user.get('timestamp'), str):
         user['created_at'] = datetime.fromisoformat(user.pop('timestamp'))
     
-    token = create_access_token({"user_id": user['id'], "email": user['email']})
-    return {"token": token, "user": User(**user).model_dump()}
+    user_obj = User(**user)
+    return {**create_token_pair(user_obj), "user": user_obj.model_dump()}
+
+@router.post("/auth/refresh")
+async def refresh_token(payload: dict = Body(...)):
+    """Exchange a refresh token for a new access/refresh token pair"""
+    token_payload = decode_refresh_token(payload.get("refresh_token") or "")
+    
+    # Read through to the database so role/name changes land in the new claims
+    user = await load_user(token_payload["user_id"], use_cache=False)
+    if not user:
+        raise HTTPException(status_code=401, detail="User no longer exists")
+    
+    return {**create_token_pair(user), "user": user.model_dump()}
 
 @router.get("/auth/me", response_model=User)
-async def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: User = Depends(get_full_user)):
     """Get current user info"""
     return current_user
 
+@router.get("/auth/profile", response_model=User)
+async def get_profile(current_user: User = Depends(get_full_user)):
+    """Get current user's profile"""
+    return current_user
+
+@router.put("/auth/profile")
+async def update_profile(updates: UserUpdate, current_user: User = Depends(get_current_user)):
+    """Update current user's profile"""
+    db = get_db()
+    update_data = updates.model_dump(exclude_none=True)
+    if not update_data:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    
+    await db.users.update_one({"id": current_user.id}, {"$set": update_data})
+    invalidate_user_cache(current_user.id)
+    
+    user = await load_user(current_user.id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # Name is a token claim, so hand back fresh tokens with the profile
+    return {**create_token_pair(user), "user": user.model_dump()}
+
 # ============ LISTING ROUTES ============
 
 @router.post("/listings", response_model=Listing)
@@ -98,6 +156,7 @@ async def create_listing(listing_data: ListingCreate, current_user: User = Depen
     listing_dict['timestamp'] = listing_dict.pop('created_at').isoformat()
     
     await db.listings.insert_one(listing_dict)
+    await search_service.index_document("listing", listing_dict)
     return listing
 
 @router.get("/listings", response_model=List[Listing])
@@ -107,13 +166,12 @@ async def get_listings(category: Optional[str] = None, search: Optional[str] = N
     query = {}
     if category:
         query['category'] = category
-    if search:
-        query['$or'] = [
-            {'title': {'$regex': search, '$options': 'i'}},
-            {'description': {'$regex': search, '$options': 'i'}}
-        ]
     
-    listings = await db.listings.find(query, {"_id": 0}).limit(limit).to_list(limit)
+    query, projection, sort = search_service.apply_search(query, search)
+    listings_cursor = db.listings.find(query, projection)
+    if sort:
+        listings_cursor = listings_cursor.sort(sort)
+    listings = await listings_cursor.limit(limit).to_list(limit)
     
     for p in listings:
         if isinstance(p.get('timestamp'), str):
@@ -149,6 +207,7 @@ async def update_listing(listing_id: str, listing_data: ListingUpdate, current_u
     await db.listings.update_one({"id": listing_id}, {"$set": update_data})
     
     updated = await db.listings.find_one({"id": listing_id}, {"_id": 0})
+    await search_service.index_document("listing", updated)
     if isinstance(updated.get('timestamp'), str):
         updated['created_at'] = datetime.fromisoformat(updated.pop('timestamp'))
     
@@ -166,6 +225,7 @@ async def delete_listing(listing_id: str, current_user: User = Depends(get_curre
         raise HTTPException(status_code=403, detail="Not authorized")
     
     await db.listings.delete_one({"id": listing_id})
+    await search_service.remove_document("listing", listing_id)
     return {"message": "Listing deleted"}
 
 # ============ REVIEW ROUTES ============
@@ -174,7 +234,7 @@ async def delete_listing(listing_id: str, current_user: User = Depends(get_curre
 async def create_review(review_data: ReviewCreate, current_user: User = Depends(get_current_user)):
     """Create a review for a listing"""
     db = get_db()
-    listing = await db.listings.find_one({"id": review_data.listing_id}, {"_id": 0})
+    listing = await db.listings.find_one({"id": review_data.listing_id}, {"_id": 0, "id": 1})
     if not listing:
         raise HTTPException(status_code=404, detail="Listing not found")
     
@@ -190,20 +250,23 @@ async def create_review(review_data: ReviewCreate, current_user: User = Depends(
     await db.reviews.insert_one(review_dict)
     
     # Update listing rating
-    reviews = await db.reviews.find({"listing_id": review_data.listing_id}, {"_id": 0}).to_list(1000)
-    avg_rating = sum(r['rating'] for r in reviews) / len(reviews)
-    await db.listings.update_one(
-        {"id": review_data.listing_id},
-        {"$set": {"rating": round(avg_rating, 1), "reviews_count": len(reviews)}}
-    )
+    await rating_service.add_rating("listing", review_data.listing_id, review.rating)
     
     return review
 
 @router.get("/reviews/{listing_id}", response_model=List[Review])
-async def get_reviews(listing_id: str):
-    """Get all reviews for a listing"""
+async def get_reviews(
+    listing_id: str,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500)
+):
+    """Get reviews for a listing, newest first (next page cursor in X-Next-Cursor)"""
     db = get_db()
-    reviews = await db.reviews.find({"listing_id": listing_id}, {"_id": 0}).to_list(1000)
+    reviews, next_cursor = await paginate(
+        db.reviews, {"listing_id": listing_id}, limit=limit, cursor=cursor
+    )
+    set_next_cursor_header(response, next_cursor)
     
     for r in reviews:
         if isinstance(r.get('timestamp'), str):
@@ -238,14 +301,21 @@ async def create_order(listing_id: str, quantity: int, current_user: User = Depe
     order_dict['timestamp'] = order_dict.pop('created_at').isoformat()
     
     await db.orders.insert_one(order_dict)
+    await rollup_service.record_order(order_dict)
     return order
 
 @router.get("/orders")
-async def get_orders(current_user: User = Depends(get_current_user)):
-    """Get user's orders - FIXED to handle missing fields"""
+async def get_orders(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    current_user: User = Depends(get_current_user)
+):
+    """Get user's orders, newest first (next page cursor in X-Next-Cursor)"""
     db = get_db()
     query = {"buyer_id": current_user.id} if current_user.role == "buyer" else {"seller_id": current_user.id}
-    orders = await db.orders.find(query, {"_id": 0}).to_list(1000)
+    orders, next_cursor = await paginate(db.orders, query, limit=limit, cursor=cursor)
+    set_next_cursor_header(response, next_cursor)
     
     # ✅ FIX: Handle missing fields gracefully
     result = []
@@ -271,43 +341,110 @@ async def get_orders(current_user: User = Depends(get_current_user)):
 # ============ USER & MESSAGE ROUTES ============
 
 @router.get("/users", response_model=List[User])
-async def get_users(current_user: User = Depends(get_current_user)):
-    """Get all users (for chat)"""
+async def get_users(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    ids: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Get users for chat, newest first (next page cursor in X-Next-Cursor; ids=a,b fetches those users)"""
     db = get_db()
-    users = await db.users.find({}, {"_id": 0, "password": 0}).to_list(1000)
+    query = {"id": {"$ne": current_user.id}}
+    if ids:
+        query["id"]["$in"] = [i.strip() for i in ids.split(",") if i.strip()][:limit]
+    users, next_cursor = await paginate(
+        db.users,
+        query,
+        {"_id": 0, "password": 0},
+        limit=limit,
+        cursor=cursor
+    )
+    set_next_cursor_header(response, next_cursor)
     
     result = []
     for u in users:
-        if u["id"] != current_user.id:
-            if isinstance(u.get('timestamp'), str):
-                u['created_at'] = datetime.fromisoformat(u.pop('timestamp'))
-            result.append(User(**u))
+        if isinstance(u.get('timestamp'), str):
+            u['created_at'] = datetime.fromisoformat(u.pop('timestamp'))
+        result.append(User(**u))
     
     return result
 
 @router.get("/messages/{other_user_id}", response_model=List[Message])
-async def get_messages(other_user_id: str, current_user: User = Depends(get_current_user)):
-    """Get messages with another user"""
+async def get_messages(
+    other_user_id: str,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=1000),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get the most recent messages with another user, oldest first
+    
+    One range read on (conversation_id, timestamp, id); X-Next-Cursor pages
+    further back in the conversation history.
+    """
     db = get_db()
-    messages = await db.messages.find(
-        {"$or": [
-            {"sender_id": current_user.id, "receiver_id": other_user_id},
-            {"sender_id": other_user_id, "receiver_id": current_user.id}
-        ]},
-        {"_id": 0}
-    ).to_list(10000)
-    
-    # Mark as read
-    await db.messages.update_many(
-        {"sender_id": other_user_id, "receiver_id": current_user.id},
-        {"$set": {"read": True}}
+    conv_id = conversation_service.conversation_id(current_user.id, other_user_id)
+    messages, next_cursor = await paginate(
+        db.messages,
+        {"conversation_id": conv_id},
+        limit=limit,
+        cursor=cursor
     )
+    set_next_cursor_header(response, next_cursor)
+    
+    # Mark as read when opening the conversation (skipped when nothing is unread)
+    if not cursor:
+        await conversation_service.mark_read(conv_id, current_user.id)
     
     for m in messages:
         if isinstance(m.get('timestamp'), str):
             m['created_at'] = datetime.fromisoformat(m.pop('timestamp'))
     
-    return sorted([Message(**m) for m in messages], key=lambda x: x.created_at)
+    return [Message(**m) for m in reversed(messages)]
+
+@router.get("/conversations", response_model=List[Thread])
+async def get_conversations(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_current_user)
+):
+    """Get the current user's conversations, most recent first (next page cursor in X-Next-Cursor)"""
+    db = get_db()
+    conversations, next_cursor = await paginate(
+        db.conversations,
+        {"participants": current_user.id},
+        limit=limit,
+        cursor=cursor,
+        sort_field="updated_at"
+    )
+    set_next_cursor_header(response, next_cursor)
+    
+    for conv in conversations:
+        others = [p for p in conv.get("participants", []) if p != current_user.id]
+        conv["other_user_id"] = others[0] if others else current_user.id
+    (users,) = await batch_join(
+        conversations,
+        Join(db.users, "other_user_id", projection={"_id": 0, "id": 1, "name": 1, "avatar": 1})
+    )
+    
+    result = []
+    for conv in conversations:
+        other = users.get(conv["other_user_id"], {})
+        last = conv.get("last_message") or {}
+        result.append(Thread(
+            id=conv["id"],
+            other_user_id=conv["other_user_id"],
+            other_user_name=other.get("name", "Unknown"),
+            other_user_avatar=other.get("avatar"),
+            last_message=last.get("message") or last.get("file_name") or "",
+            last_message_time=datetime.fromisoformat(conv["updated_at"]),
+            unread_count=(conv.get("unread") or {}).get(current_user.id, 0)
+        ))
+    
+    return result
 
 # ============ FILE UPLOAD ============
 
@@ -365,15 +502,23 @@ async def remove_from_wishlist(listing_id: str, current_user: User = Depends(get
     return {"message": "Removed from wishlist"}
 
 @router.get("/wishlist")
-async def get_wishlist(current_user: User = Depends(get_current_user)):
-    """Get user's wishlist (includes both listings and products)"""
+async def get_wishlist(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    current_user: User = Depends(get_current_user)
+):
+    """Get user's wishlist (includes both listings and products; next page cursor in X-Next-Cursor)"""
     db = get_db()
-    wishlist_items = await db.wishlist.find({"user_id": current_user.id}, {"_id": 0}).to_list(1000)
+    wishlist_items, next_cursor = await paginate(
+        db.wishlist, {"user_id": current_user.id}, limit=limit, cursor=cursor
+    )
+    set_next_cursor_header(response, next_cursor)
     listing_ids = [item['listing_id'] for item in wishlist_items]
     
     # Get both listings and products
-    listings = await db.listings.find({"id": {"$in": listing_ids}}, {"_id": 0}).to_list(1000)
-    products = await db.products.find({"id": {"$in": listing_ids}}, {"_id": 0}).to_list(1000)
+    listings = await db.listings.find({"id": {"$in": listing_ids}}, {"_id": 0}).to_list(len(listing_ids))
+    products = await db.products.find({"id": {"$in": listing_ids}}, {"_id": 0}).to_list(len(listing_ids))
     
     # Combine results
     result = []
@@ -4,7 +4,7 @@ Notification Routes for NovoMarket
 Handles in-app notifications API
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import Optional
 from database import get_db
 from utils.auth_utils import get_current_user
@@ -15,6 +15,7 @@ from services.notification_service import (
     send_message_notification,
     send_cancellation_notification
 )
+from services import unread_service, notification_retention_service
 
 router = APIRouter(prefix="/notifications", tags=["Notifications"])
 
@@ -52,12 +53,17 @@ async def mark_notification_read(
     """Mark notification as read"""
     db = get_db()
     result = await db.notifications.update_one(
-        {"id": notif_id, "user_id": current_user.id},
-        {"$set": {"read": True}}
+        {"id": notif_id, "user_id": current_user.id, "read": False},
+        {"$set": notification_retention_service.read_fields()}
     )
+    if result.matched_count == 0:
+        # Already read, or not this user's
+        exists = await db.notifications.find_one({"id": notif_id, "user_id": current_user.id}, {"_id": 0, "id": 1})
+        if not exists:
+            raise HTTPException(status_code=404, detail="Notification not found")
+        return {"message": "Marked as read"}
     
-    if result.modified_count == 0:
-        raise HTTPException(status_code=404, detail="Notification not found")
+    await unread_service.change(current_user.id, notifications=-1)
     
     return {"message": "Marked as read"}
 
@@ -70,8 +76,9 @@ async def mark_all_notifications_read(
     db = get_db()
     result = await db.notifications.update_many(
         {"user_id": current_user.id, "read": False},
-        {"$set": {"read": True}}
+        {"$set": notification_retention_service.read_fields()}
     )
+    await unread_service.reset(current_user.id, unread_service.NOTIFICATIONS)
     
     return {
         "message": f"Marked {result.modified_count} notifications as read",
@@ -83,13 +90,35 @@ async def mark_all_notifications_read(
 async def get_unread_notification_count(
     current_user: User = Depends(get_current_user)
 ):
-    """Get count of unread notifications"""
-    db = get_db()
-    count = await db.notifications.count_documents({
-        "user_id": current_user.id,
-        "read": False
-    })
-    return {"unread_count": count}
+    """
+    Get count of unread notifications (and unread chat messages)
+    
+    Served from the unread counters; the same counts are pushed over the
+    chat WebSocket as "unread_counts" whenever they change.
+    """
+    counts = await unread_service.get_counts(current_user.id)
+    return {"unread_count": counts["notifications"], "unread_messages": counts["messages"]}
+
+
+@router.get("/archive")
+async def get_notification_archive(
+    month: Optional[str] = Query(None, regex=r"^\d{4}-\d{2}$"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Archived notifications
+    
+    Without a month: the months that have archived notifications (with counts).
+    With month=YYYY-MM: that month's notifications, newest first.
+    """
+    if not month:
+        return {"months": await notification_retention_service.get_archive_months(current_user.id)}
+    
+    notifications = await notification_retention_service.get_archived(current_user.id, month)
+    for n in notifications:
+        if isinstance(n.get("timestamp"), str):
+            n["created_at"] = n.pop("timestamp")
+    return {"month": month, "notifications": notifications}
 
 
 @router.post("/test")
@@ -3,7 +3,7 @@
 Product Marketplace Routes - COMPLETE & FIXED
 Handles: Products, Cart, Orders for physical goods
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from typing import List, Optional
 from datetime import datetime, timezone
 from database import get_db
@@ -14,6 +14,8 @@ from models_dual_marketplace import (
     CartItem, CartItemAdd, ProductOrder
 )
 from config import settings
+from services import search_service, catalog_service, rollup_service
+from utils.pagination import paginate, set_next_cursor_header
 import uuid
 import logging
 import os
@@ -109,6 +111,7 @@ async def add_product(
     logger.info(f"📸 Product dict to save - images length: {len(product_dict.get('images', []))}")
     
     await db.products.insert_one(product_dict)
+    await search_service.index_document("product", product_dict)
     logger.info(f"✅ Product created: {product.id} with {len(normalized_images)} images")
     
     # Verify what we're returning
@@ -121,13 +124,20 @@ async def add_product(
 
 @router.get("", response_model=List[Product])
 async def get_products(
+    response: Response,
     category: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
     min_price: Optional[float] = Query(None),
     max_price: Optional[float] = Query(None),
+    cursor: Optional[str] = Query(None),
     limit: int = Query(50, ge=1, le=100)
 ):
-    """Get all products with filters (public)"""
+    """
+    Get all products with filters (public)
+    
+    Without a search term products are newest first and X-Next-Cursor pages
+    through them. Search results are relevance-ranked and not paginated.
+    """
     db = get_db()
     
     query = {}
@@ -135,12 +145,6 @@ async def get_products(
     if category:
         query['category'] = category
     
-    if search:
-        query['$or'] = [
-            {'title': {'$regex': search, '$options': 'i'}},
-            {'description': {'$regex': search, '$options': 'i'}}
-        ]
-    
     if min_price is not None or max_price is not None:
         query['price'] = {}
         if min_price is not None:
@@ -152,7 +156,13 @@ async def get_products(
     query['stock'] = {'$gt': 0}
     
     try:
-        listings = await db.products.find(query, {"_id": 0}).limit(limit).to_list(limit)
+        if search and search.strip():
+            # Relevance-ranked text search (products_text index)
+            query, projection, sort = search_service.apply_search(query, search)
+            listings = await db.products.find(query, projection).sort(sort).limit(limit).to_list(limit)
+        else:
+            listings, next_cursor = await paginate(db.products, query, limit=limit, cursor=cursor)
+            set_next_cursor_header(response, next_cursor)
         
         for p in listings:
             if isinstance(p.get('timestamp'), str):
@@ -214,6 +224,8 @@ async def get_products(
                 logger.info(f"📸 Sample: First product has {len(first_product.images)} images: {first_product.images[:1] if first_product.images else []}")
         
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Error fetching products: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch products")
@@ -295,6 +307,16 @@ async def get_cart(current_user: User = Depends(get_current_user)):
         logger.info(f"📦 Found {len(cart_items)} cart items for user {current_user.id}")
         
         # Enrich with product details (robust, no strict model conversion)
+        products_by_id = await catalog_service.fetch_products(item.get('product_id') for item in cart_items)
+
+        # Products deleted since they were added - remove from cart in one go
+        stale_ids = [
+            item.get('id') for item in cart_items
+            if item.get('product_id') and item['product_id'] not in products_by_id
+        ]
+        if stale_ids:
+            await db.cart.delete_many({"id": {"$in": stale_ids}})
+
         result = []
         for item in cart_items:
             try:
@@ -302,11 +324,11 @@ async def get_cart(current_user: User = Depends(get_current_user)):
                 if not product_id:
                     continue
 
-                product = await db.products.find_one({"id": product_id}, {"_id": 0})
+                product = products_by_id.get(product_id)
                 if not product:
-                    # Product deleted - remove from cart
-                    await db.cart.delete_one({"id": item.get('id')})
                     continue
+                # Copy: the same product may back several cart rows
+                product = dict(product)
 
                 # Normalize fields and timestamps safely
                 if isinstance(product.get('timestamp'), str):
@@ -336,13 +358,7 @@ async def get_cart(current_user: User = Depends(get_current_user)):
 
                 quantity = int(item.get('quantity', 1) or 1)
                 # Robust price parsing: accept numeric or string with symbols
-                raw_price = product.get('price', 0)
-                if isinstance(raw_price, (int, float)):
-                    price = float(raw_price)
-                else:
-                    import re
-                    cleaned = re.sub(r"[^0-9.]", "", str(raw_price))
-                    price = float(cleaned or 0)
+                price = catalog_service.parse_price(product.get('price', 0))
 
                 # Append without Pydantic conversion to avoid validation errors
                 result.append({
@@ -470,6 +486,7 @@ async def delete_product(
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
     
+    await search_service.remove_document("product", product_id)
     logger.info(f"✅ Product deleted: {product_id} by seller {current_user.id}")
     return {"message": "Product deleted successfully"}
 
@@ -477,8 +494,12 @@ async def delete_product(
 # ============ ORDER ROUTES - FIXED ============
 
 @router.get("/orders")
-async def get_orders(current_user: User = Depends(get_current_user)):
-    """Get user's orders (buyer sees purchases, seller sees sales)"""
+async def get_orders(
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=500),
+    current_user: User = Depends(get_current_user)
+):
+    """Get user's orders (buyer sees purchases, seller sees sales), newest first"""
     db = get_db()
     
     try:
@@ -489,7 +510,7 @@ async def get_orders(current_user: User = Depends(get_current_user)):
         
         logger.info(f"📦 Fetching orders for {current_user.role} {current_user.id}")
         
-        orders = await db.orders.find(query, {"_id": 0}).sort("timestamp", -1).to_list(100)
+        orders, next_cursor = await paginate(db.orders, query, limit=limit, cursor=cursor)
         
         result = []
         for o in orders:
@@ -499,8 +520,10 @@ async def get_orders(current_user: User = Depends(get_current_user)):
         
         logger.info(f"✅ Returning {len(result)} orders")
         
-        return {"orders": result, "total": len(result)}
+        return {"orders": result, "total": len(result), "next_cursor": next_cursor}
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Error fetching orders: {e}")
         import traceback
@@ -535,10 +558,12 @@ async def create_order(
         total_amount = 0
         products = []
         
+        products_by_id = await catalog_service.fetch_products(item["product_id"] for item in cart_items)
+        
         for item in cart_items:
-            product = await db.products.find_one({"id": item["product_id"]}, {"_id": 0})
+            product = products_by_id.get(item["product_id"])
             if product:
-                subtotal = product['price'] * item['quantity']
+                subtotal = catalog_service.parse_price(product.get('price', 0)) * item['quantity']
                 total_amount += subtotal
                 products.append({
                     **product,
@@ -558,6 +583,7 @@ async def create_order(
         }
         
         await db.orders.insert_one(order)
+        await rollup_service.record_order(order)
         
         # Clear cart
         await db.cart.delete_many({
@@ -2,12 +2,14 @@
 """
 Review and Rating Routes
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from typing import List, Optional
 from database import get_db
 from utils.auth_utils import get_current_user
+from utils.pagination import paginate, set_next_cursor_header
 from models import User
 from models_reviews import Review, ReviewCreate, ReviewResponse
+from services import rating_service
 from datetime import datetime, timezone
 
 router = APIRouter(prefix="/reviews", tags=["Reviews"])
@@ -66,46 +68,34 @@ async def create_review(
     await db.reviews.insert_one(review_dict)
     
     # Update item rating
-    await update_item_rating(db, review_data.item_id, review_data.item_type)
+    await update_item_rating(db, review_data.item_id, review_data.item_type, review_data.rating)
     
     return ReviewResponse(**{**review_dict, "created_at": review.created_at})
 
 
-async def update_item_rating(db, item_id: str, item_type: str):
-    """Calculate and update average rating for product/service"""
-    reviews = await db.reviews.find({
-        "item_id": item_id,
-        "item_type": item_type
-    }, {"rating": 1}).to_list(100)
-    
-    if reviews:
-        avg_rating = sum(r['rating'] for r in reviews) / len(reviews)
-        reviews_count = len(reviews)
-        
-        if item_type == "product":
-            await db.products.update_one(
-                {"id": item_id},
-                {"$set": {"rating": round(avg_rating, 1), "reviews_count": reviews_count}}
-            )
-        else:
-            await db.services.update_one(
-                {"id": item_id},
-                {"$set": {"rating": round(avg_rating, 1), "reviews_count": reviews_count}}
-            )
+async def update_item_rating(db, item_id: str, item_type: str, rating: int):
+    """Fold a new review into the product/service rating aggregates"""
+    await rating_service.add_rating(item_type, item_id, rating)
 
 
 @router.get("", response_model=List[ReviewResponse])
 async def get_reviews(
+    response: Response,
     item_id: str = Query(...),
-    item_type: str = Query(..., regex="^(product|service)$")
+    item_type: str = Query(..., regex="^(product|service)$"),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=500)
 ):
-    """Get reviews for a product or service"""
+    """Get reviews for a product or service, newest first (next page cursor in X-Next-Cursor)"""
     db = get_db()
     
-    reviews = await db.reviews.find({
-        "item_id": item_id,
-        "item_type": item_type
-    }, {"_id": 0}).sort("timestamp", -1).to_list(100)
+    reviews, next_cursor = await paginate(
+        db.reviews,
+        {"item_id": item_id, "item_type": item_type},
+        limit=limit,
+        cursor=cursor
+    )
+    set_next_cursor_header(response, next_cursor)
     
     result = []
     for r in reviews:
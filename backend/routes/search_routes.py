@@ -0,0 +1,63 @@
+# backend/routes/search_routes.py
+"""
+Unified Search Routes
+Relevance-ranked search and autocomplete across listings, products and services
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+import logging
+
+from models import SearchQuery, SearchResponse
+from services import search_service
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+
+@router.get("", response_model=SearchResponse)
+async def search(
+    params: SearchQuery = Depends(),
+    page: int = Query(1, ge=1, le=search_service.MAX_SEARCH_WINDOW)
+):
+    """Search all catalogs (public; total is capped at MAX_SEARCH_WINDOW)"""
+    if not params.query.strip():
+        raise HTTPException(status_code=400, detail="Search query is required")
+    
+    if params.type and params.type not in ("product", "service"):
+        raise HTTPException(status_code=400, detail="type must be 'product' or 'service'")
+    
+    limit = max(1, min(params.limit, 100))
+    if page * limit > search_service.MAX_SEARCH_WINDOW:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Results beyond the first {search_service.MAX_SEARCH_WINDOW} are not available; refine the search"
+        )
+    
+    try:
+        results, total = await search_service.search_catalogs(
+            query=params.query.strip(),
+            category=params.category,
+            min_price=params.min_price,
+            max_price=params.max_price,
+            type=params.type,
+            page=page,
+            limit=limit
+        )
+    except Exception as e:
+        logger.error(f"❌ Search failed: {e}")
+        raise HTTPException(status_code=500, detail="Search failed")
+    
+    return SearchResponse(results=results, total=total, page=page, limit=limit)
+
+
+@router.get("/autocomplete")
+async def search_autocomplete(
+    q: str = Query(..., min_length=1),
+    type: Optional[str] = Query(None),
+    limit: int = Query(10, ge=1, le=25)
+):
+    """Title suggestions for a partially typed query (public)"""
+    suggestions = await search_service.autocomplete(q, type=type, limit=limit)
+    return {"query": q, "suggestions": suggestions}
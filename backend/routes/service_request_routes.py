@@ -4,14 +4,17 @@ Service Request Routes - Freelance/Project Board Feature
 Allows buyers to post service requests and sellers to submit proposals
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, BackgroundTasks
 from typing import List, Optional
 from datetime import datetime, timezone, timedelta
 from database import get_db
 from utils.auth_utils import get_current_user
+from utils.pagination import paginate
+from utils.joins import Join, batch_join
 from models import User, ServiceRequest, ServiceRequestCreate, Proposal, FreelancerProfile
 from models_dual_marketplace import ServiceRequestBooking, ServiceRequestBookingCreate
-from services.notification_service import create_notification
+from services.notification_service import create_notification, create_notifications_bulk
+from services import match_scoring_service, freelancer_index_service, request_stats_service
 import uuid
 import logging
 
@@ -19,112 +22,74 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/service-requests", tags=["Service Requests"])
 
+# Freelancers loaded and scored per round when fanning out a new request
+MATCH_BATCH_SIZE = 1000
+
 
 # ============ HELPER FUNCTIONS ============
 
 async def calculate_match_score(db, freelancer_id: str, request_id: str) -> int:
     """Calculate AI match score between freelancer and service request"""
-    
-    # Get freelancer profile
-    profile = await db.freelancer_profiles.find_one(
-        {"user_id": freelancer_id},
-        {"_id": 0}
-    )
-    
-    # Get service request
-    request = await db.service_requests.find_one(
-        {"id": request_id},
-        {"_id": 0}
-    )
-    
-    if not profile or not request:
-        return 0
-    
-    score = 0
-    
-    # 1. Skills Match (40 points)
-    freelancer_skills = set(profile.get('skills', []))
-    required_skills = set(request.get('skills_required', []))
-    
-    if required_skills:
-        skill_match = len(freelancer_skills & required_skills) / len(required_skills)
-        score += int(skill_match * 40)
-    
-    # 2. Experience Level Match (20 points)
-    exp_mapping = {"beginner": 0, "intermediate": 1, "expert": 2}
-    req_exp = exp_mapping.get(request.get('experience_level', 'intermediate'), 1)
-    profile_exp = profile.get('experience_years', 0)
-    
-    if profile_exp >= req_exp * 2:
-        score += 20
-    elif profile_exp >= req_exp:
-        score += 10
-    
-    # 3. Budget Compatibility (15 points)
-    hourly_rate = profile.get('hourly_rate')
-    budget = request.get('budget')
-    
-    if hourly_rate and budget:
-        estimated_hours = budget / hourly_rate if hourly_rate > 0 else 0
-        if 10 <= estimated_hours <= 100:  # Reasonable project size
-            score += 15
-        elif estimated_hours > 5:
-            score += 8
-    
-    # 4. Success Rate (15 points)
-    success_rate = profile.get('success_rate', 0)
-    if success_rate >= 90:
-        score += 15
-    elif success_rate >= 70:
-        score += 10
-    elif success_rate >= 50:
-        score += 5
-    
-    # 5. Category Match (10 points)
-    if profile.get('categories'):
-        if request.get('category') in profile.get('categories', []):
-            score += 10
-    
-    return min(score, 100)
+    return await match_scoring_service.calculate_match_score(freelancer_id, request_id)
 
 
-async def notify_matched_freelancers(db, request_id: str):
-    """Notify freelancers with high match scores about new service request"""
-    
-    request = await db.service_requests.find_one(
-        {"id": request_id},
-        {"_id": 0}
-    )
+async def notify_matched_freelancers(db, request_id: str, request: Optional[dict] = None):
+    """
+    Notify freelancers with high match scores about new service request
     
-    if not request:
-        return
-    
-    # Get all freelancers
-    freelancers = await db.users.find(
-        {"role": "seller"},
-        {"_id": 0}
-    ).to_list(1000)
-    
-    # Calculate match scores and notify top matches
-    for freelancer in freelancers:
-        match_score = await calculate_match_score(db, freelancer['id'], request_id)
+    Candidates come from the skill/category index, so only freelancers who
+    share something with the request are loaded and scored. Runs as a
+    background task after the request is created.
+    """
+    try:
+        if request is None:
+            request = await db.service_requests.find_one(
+                {"id": request_id},
+                {"_id": 0}
+            )
         
-        # Notify if match score is high (>60%)
-        if match_score >= 60:
-            try:
-                await create_notification(
-                    user_id=freelancer['id'],
-                    notification_type="new_opportunity",
-                    title=f"New Project Match ({match_score}% fit) 🎯",
-                    message=f"A new project matches your skills: {request['title']}",
-                    link=f"/service-requests/{request_id}",
-                    data={
+        if not request:
+            return
+        
+        candidates = await freelancer_index_service.candidate_ids(
+            request.get("skills_required", []), request.get("category")
+        )
+        
+        notified = 0
+        for start in range(0, len(candidates), MATCH_BATCH_SIZE):
+            batch = candidates[start:start + MATCH_BATCH_SIZE]
+            
+            # Only sellers receive opportunities
+            sellers = await db.users.find(
+                {"id": {"$in": batch}, "role": "seller"},
+                {"_id": 0, "id": 1}
+            ).to_list(len(batch))
+            
+            # Score the batch against the request in one pass
+            scores = await match_scoring_service.score_freelancers_for_request(
+                request, [f['id'] for f in sellers]
+            )
+            
+            # Notify if match score is high (>60%)
+            notified += await create_notifications_bulk([
+                {
+                    "user_id": freelancer_id,
+                    "notification_type": "new_opportunity",
+                    "title": f"New Project Match ({match_score}% fit) 🎯",
+                    "message": f"A new project matches your skills: {request['title']}",
+                    "link": f"/service-requests/{request_id}",
+                    "data": {
                         "request_id": request_id,
                         "match_score": match_score
                     }
-                )
-            except Exception as e:
-                print(f"Failed to notify freelancer {freelancer['id']}: {e}")
+                }
+                for freelancer_id, match_score in scores.items()
+                if match_score >= 60
+            ])
+        
+        logger.info(f"🎯 Request {request_id}: {len(candidates)} candidates, {notified} notified")
+    except Exception as e:
+        logger.error(f"Failed to notify freelancers: {e}")
 
 
 # ============ SERVICE REQUEST ROUTES ============
@@ -132,6 +97,7 @@ async def notify_matched_freelancers(db, request_id: str):
 @router.post("", response_model=dict)
 async def create_service_request(
     request_data: ServiceRequestCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user)
 ):
     """Create a new service request (buyers post work)"""
@@ -170,6 +136,8 @@ async def create_service_request(
         "skills_required": request_data.skills_required or [],
         "experience_level": request_data.experience_level or "intermediate",
         "status": "open",  # Always start as "open" so sellers can see it
+        "proposals_count": 0,
+        "pending_proposals_count": 0,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
@@ -180,11 +148,12 @@ async def create_service_request(
     # Convert MongoDB _id to string for JSON serialization
     request["_id"] = str(result.inserted_id)
     
-    # Trigger AI matching for relevant freelancers
-    try:
-        await notify_matched_freelancers(db, request["id"])
-    except Exception as e:
-        logger.error(f"Failed to notify freelancers: {e}")
+    await request_stats_service.invalidate_stats()
+    
+    # Trigger AI matching for relevant freelancers once the response is sent
+    background_tasks.add_task(
+        notify_matched_freelancers, db, request["id"], {k: v for k, v in request.items() if k != "_id"}
+    )
     
     # Return response without MongoDB ObjectId
     response_data = {
@@ -203,9 +172,15 @@ async def get_service_requests(
     max_budget: Optional[float] = None,
     experience_level: Optional[str] = None,
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
     current_user: User = Depends(get_current_user)
 ):
-    """Browse all service requests (for freelancers) or own requests (for buyers)"""
+    """
+    Browse all service requests (for freelancers) or own requests (for buyers)
+    
+    Pages are newest first; for sellers each page is then ranked by match score.
+    """
     db = get_db()
     
     query = {}
@@ -247,35 +222,20 @@ async def get_service_requests(
     logger.info(f"Fetching service requests for {current_user.role} (user: {current_user.id})")
     logger.info(f"Query: {query}")
     
-    # Debug: Check total requests and their statuses
-    total_reqs = await db.service_requests.count_documents({})
-    open_reqs = await db.service_requests.count_documents({"status": "open"})
-    all_statuses = await db.service_requests.find({}, {"status": 1, "_id": 0}).to_list(1000)
-    status_counts = {}
-    for req in all_statuses:
-        status = req.get("status", "unknown")
-        status_counts[status] = status_counts.get(status, 0) + 1
-    
-    logger.info(f"DEBUG: Total requests in DB: {total_reqs}, Open requests: {open_reqs}")
-    logger.info(f"DEBUG: Status breakdown: {status_counts}")
-    
-    requests = await db.service_requests.find(
-        query,
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(100)
+    requests, next_cursor = await paginate(
+        db.service_requests, query, limit=limit, cursor=cursor, sort_field="created_at"
+    )
     
     logger.info(f"Found {len(requests)} service requests matching query")
     
-    # Log sample of found requests for debugging
-    if len(requests) > 0:
-        logger.info(f"Sample request IDs: {[req.get('id', req.get('_id', 'N/A'))[:8] if isinstance(req.get('id', req.get('_id', 'N/A')), str) else 'N/A' for req in requests[:3]]}")
-        logger.info(f"Sample request statuses: {[req.get('status', 'N/A') for req in requests[:3]]}")
-    else:
-        # Check if any requests exist at all
-        total_count = await db.service_requests.count_documents({})
-        open_count = await db.service_requests.count_documents({"status": "open"})
-        logger.warning(f"⚠️ No matching requests found. Total requests in DB: {total_count}, Open requests: {open_count}")
-        logger.warning(f"⚠️ User role: {current_user.role}, Query filter: {query}")
+    if not requests:
+        # Status totals are available from GET /service-requests/stats
+        logger.warning(f"⚠️ No matching requests found. User role: {current_user.role}, Query filter: {query}")
+    
+    # Match scores for the whole page in one pass
+    match_scores = {}
+    if current_user.role == "seller":
+        match_scores = await match_scoring_service.score_requests_for_freelancer(current_user.id, requests)
     
     # Add additional data for each request
     result = []
@@ -284,10 +244,8 @@ async def get_service_requests(
         if "id" not in req and "_id" in req:
             req["id"] = str(req["_id"])
         
-        # Count proposals
-        proposal_count = await db.proposals.count_documents({
-            "service_request_id": req.get("id") or req.get("_id")
-        })
+        # Proposal counter maintained on the request document
+        proposal_count = req.get("proposals_count", 0)
         
         req_dict = {
             **req,
@@ -297,8 +255,7 @@ async def get_service_requests(
         
         # Add AI match score for sellers
         if current_user.role == "seller":
-            match_score = await calculate_match_score(db, current_user.id, req.get("id") or req.get("_id"))
-            req_dict["ai_match_score"] = match_score
+            req_dict["ai_match_score"] = match_scores.get(req.get("id"), 0)
         
         result.append(req_dict)
     
@@ -306,7 +263,13 @@ async def get_service_requests(
     if current_user.role == "seller":
         result.sort(key=lambda x: x.get("ai_match_score", 0), reverse=True)
     
-    return {"requests": result, "total": len(result)}
+    return {"requests": result, "total": len(result), "next_cursor": next_cursor}
+
+
+@router.get("/stats")
+async def get_service_request_stats(current_user: User = Depends(get_current_user)):
+    """Service request counts by status and total proposals (cached)"""
+    return await request_stats_service.get_status_stats()
 
 
 @router.get("/{request_id}")
@@ -343,23 +306,26 @@ async def get_service_request_details(
     if "id" not in request:
         request["id"] = str(request.get("_id", request_id))
     
-    # Count proposals - try multiple ID formats
-    request_id_for_count = request.get("id") or request_id
-    proposal_count = await db.proposals.count_documents({
-        "$or": [
-            {"service_request_id": request_id_for_count},
-            {"service_request_id": request_id},
-            {"service_request_id": str(request.get("_id", ""))}
-        ]
-    })
+    # Proposal counter maintained on the request document; count only for
+    # legacy requests that have not been backfilled yet
+    proposal_count = request.get("proposals_count")
+    if proposal_count is None:
+        request_id_for_count = request.get("id") or request_id
+        proposal_count = await db.proposals.count_documents({
+            "$or": [
+                {"service_request_id": request_id_for_count},
+                {"service_request_id": request_id},
+                {"service_request_id": str(request.get("_id", ""))}
+            ]
+        })
     
     request["proposal_count"] = proposal_count
     request["proposals_count"] = proposal_count  # Also add for backward compatibility
     
     # Add match score for sellers
     if current_user.role == "seller":
-        match_score = await calculate_match_score(db, current_user.id, request_id)
-        request["ai_match_score"] = match_score
+        profiles = await match_scoring_service.load_profiles([current_user.id])
+        request["ai_match_score"] = match_scoring_service.score_pair(profiles.get(current_user.id), request)
         
         # Check if already applied
         existing_proposal = await db.proposals.find_one({
@@ -431,8 +397,9 @@ async def submit_proposal(
     if existing:
         raise HTTPException(status_code=400, detail="You have already submitted a proposal for this request")
     
-    # Calculate AI match score
-    match_score = await calculate_match_score(db, current_user.id, request_id)
+    # Calculate AI match score (request is already loaded)
+    profiles = await match_scoring_service.load_profiles([current_user.id])
+    match_score = match_scoring_service.score_pair(profiles.get(current_user.id), request)
     
     # Use the request's actual ID for consistency
     request_actual_id = request.get("id") or request_id
@@ -453,6 +420,7 @@ async def submit_proposal(
     logger.info(f"Submitting proposal for request_id: {request_id}, using service_request_id: {request_actual_id}")
     
     await db.proposals.insert_one(proposal)
+    await request_stats_service.proposal_submitted(request_actual_id)
     
     # Notify client
     try:
@@ -533,23 +501,23 @@ async def get_proposals(
     
     logger.info(f"Found {len(proposals)} proposals for request {request_id}")
     
-    # Enrich with freelancer data
+    # Enrich with freelancer data - one query per collection for the whole page
+    freelancers, profiles = await batch_join(
+        proposals,
+        Join(db.users, "freelancer_id", projection={"_id": 0, "password": 0}),
+        Join(db.freelancer_profiles, "freelancer_id", foreign_field="user_id")
+    )
+    
     result = []
     for proposal in proposals:
         # Get freelancer info
-        freelancer = await db.users.find_one(
-            {"id": proposal["freelancer_id"]},
-            {"_id": 0, "password": 0}
-        )
+        freelancer = freelancers.get(proposal["freelancer_id"])
         
         if not freelancer:
             continue
         
         # Get freelancer profile
-        profile = await db.freelancer_profiles.find_one(
-            {"user_id": proposal["freelancer_id"]},
-            {"_id": 0}
-        )
+        profile = profiles.get(proposal["freelancer_id"])
         
         proposal_data = {
             **proposal,
@@ -619,6 +587,7 @@ async def accept_proposal(
         },
         {"$set": {"status": "rejected"}}
     )
+    await request_stats_service.proposal_accepted(request_id)
     
     # Notify accepted freelancer
     try:
@@ -669,6 +638,7 @@ async def complete_service_request(
             "completed_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    await request_stats_service.invalidate_stats()
     
     # Notify freelancer if there's an accepted proposal
     if request.get("accepted_proposal_id"):
@@ -734,6 +704,8 @@ async def delete_service_request(
         ]
     })
     
+    await request_stats_service.invalidate_stats()
+    
     logger.info(f"Service request {request_id} deleted by user {current_user.id}")
     
     return {"message": "Service request deleted successfully"}
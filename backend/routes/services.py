@@ -3,7 +3,7 @@
 Service Marketplace Routes
 Handle all service-related operations
 """
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, Response
 from typing import List, Optional
 from datetime import datetime, timezone
 from database import get_db
@@ -13,6 +13,9 @@ from models_dual_marketplace import (
     Service, ServiceCreate, ServiceUpdate,
     ServiceBooking, BookingCreate
 )
+from services import search_service, catalog_service, rollup_service
+from utils.pagination import paginate, set_next_cursor_header
+from utils.joins import Join, batch_join
 import uuid
 
 router = APIRouter(prefix="/services", tags=["Services"])
@@ -59,6 +62,7 @@ async def add_service(
         
         # Insert service
         result = await db.services.insert_one(service_dict)
+        await search_service.index_document("service", service_dict)
         
         # Fetch created service
         created = await db.services.find_one({"_id": result.inserted_id}, {"_id": 0})
@@ -81,6 +85,7 @@ async def add_service(
 
 @router.get("", response_model=List[Service])
 async def get_services(
+    response: Response,
     category: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
     skills: Optional[str] = Query(None),  # Comma-separated
@@ -88,9 +93,15 @@ async def get_services(
     min_price: Optional[float] = Query(None),
     max_price: Optional[float] = Query(None),
     max_delivery_days: Optional[int] = Query(None),
+    cursor: Optional[str] = Query(None),
     limit: int = Query(50, ge=1, le=100)
 ):
-    """Get all services with filters (public)"""
+    """
+    Get all services with filters (public)
+    
+    Without a search term services are newest first and X-Next-Cursor pages
+    through them. Search results are relevance-ranked and not paginated.
+    """
     db = get_db()
     
     query = {}
@@ -98,12 +109,6 @@ async def get_services(
     if category:
         query['category'] = category
     
-    if search:
-        query['$or'] = [
-            {'title': {'$regex': search, '$options': 'i'}},
-            {'description': {'$regex': search, '$options': 'i'}}
-        ]
-    
     if skills:
         skill_list = [s.strip() for s in skills.split(",")]
         query['skills'] = {'$in': skill_list}
@@ -121,7 +126,13 @@ async def get_services(
     if max_delivery_days:
         query['delivery_days'] = {'$lte': max_delivery_days}
     
-    services = await db.services.find(query, {"_id": 0}).limit(limit).to_list(limit)
+    if search and search.strip():
+        # Relevance-ranked text search (services_text index)
+        query, projection, sort = search_service.apply_search(query, search)
+        services = await db.services.find(query, projection).sort(sort).limit(limit).to_list(limit)
+    else:
+        services, next_cursor = await paginate(db.services, query, limit=limit, cursor=cursor)
+        set_next_cursor_header(response, next_cursor)
     
     result = []
     for s in services:
@@ -188,6 +199,7 @@ async def update_service(
     await db.services.update_one({"id": service_id}, {"$set": update_data})
     
     updated = await db.services.find_one({"id": service_id}, {"_id": 0})
+    await search_service.index_document("service", updated)
     if isinstance(updated.get('timestamp'), str):
         updated['created_at'] = datetime.fromisoformat(updated.pop('timestamp'))
     
@@ -213,6 +225,7 @@ async def delete_service(
         raise HTTPException(status_code=403, detail="Not authorized")
     
     await db.services.delete_one({"id": service_id})
+    await search_service.remove_document("service", service_id)
     return {"message": "Service deleted successfully"}
 
 
@@ -246,8 +259,11 @@ async def create_booking(
     
     booking_dict = booking.model_dump()
     booking_dict['timestamp'] = booking_dict.pop('booked_at').isoformat()
+    # Price at booking time (dashboards and rollups use it)
+    booking_dict['price'] = catalog_service.parse_price(service.get('price', 0))
     
     await db.bookings.insert_one(booking_dict)
+    await rollup_service.record_booking(booking_dict)
     
     return {
         "message": "Booking created successfully",
@@ -268,11 +284,15 @@ async def get_my_bookings(current_user: User = Depends(get_current_user)):
     
     bookings = await db.bookings.find(query, {"_id": 0}).sort("timestamp", -1).to_list(100)
     
-    # Enrich with service details
+    # Enrich with service details - one query for the whole page
+    (services_by_id,) = await batch_join(bookings, Join(db.services, "service_id"))
+    
     result = []
     for booking in bookings:
-        service = await db.services.find_one({"id": booking['service_id']}, {"_id": 0})
+        service = services_by_id.get(booking['service_id'])
         if service:
+            # Copy: several bookings can share one service
+            service = dict(service)
             if isinstance(service.get('timestamp'), str):
                 service['created_at'] = datetime.fromisoformat(service.pop('timestamp'))
         
@@ -323,7 +343,16 @@ async def update_booking_status(
     if status == "completed":
         update_data["completed_at"] = datetime.now(timezone.utc).isoformat()
     
-    await db.bookings.update_one({"id": booking_id}, {"$set": update_data})
+    result = await db.bookings.update_one(
+        {"id": booking_id, "status": booking['status']},
+        {"$set": update_data}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=409, detail="Booking was updated by someone else, please retry")
+    
+    # Cancellations (and undoing them) move the seller's daily rollups
+    if result.modified_count and (status == "cancelled") != (booking['status'] == "cancelled"):
+        await rollup_service.record_booking_cancelled(booking, reinstated=status != "cancelled")
     
     # Update service completed_count if completed
     if status == "completed":
@@ -3,9 +3,10 @@
 NovoMarket Backend API - Fully Integrated & Fixed
 All features working, all imports resolved
 """
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends, Body, Request
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends, Body, Request, Query
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import logging
 import uuid
 from datetime import datetime, timezone, timedelta
@@ -14,14 +15,26 @@ from contextlib import asynccontextmanager
 
 # Configuration and database
 from config import settings
-from database import database, get_db, init_indexes, check_database_health
+from database import database, get_db, init_indexes, connect_redis, close_redis
 from utils.websocket_manager import connection_manager
-from utils.auth_utils import get_current_user
+from utils.auth_utils import get_current_user, user_cache, load_user
+from utils.password_hasher import password_hasher
+from utils.scheduler import add_interval_job, start_scheduler, shutdown_scheduler
+from utils.pagination import NEXT_CURSOR_HEADER
 from models import User, TimeSlot, ServiceAvailability, Booking, BookingCreate, AvailabilityCreate
 
 # Import services
 from services import notification_service
 from services import booking_service
+from services import stock_reservation_service
+from services import rating_service
+from services.chat_service import message_writer
+from services import conversation_service
+from services import unread_service
+from services import notification_retention_service
+from services import provider_stats_service  # registers the provider_stats view
+from utils.change_streams import materializer
+from services import platform_stats_service
 
 # Near the top with other imports
 from routes import freelancer_routes
@@ -44,6 +57,15 @@ async def lifespan(app: FastAPI):
         database.connect()
         logger.info("✅ Database connected")
         
+        # Connect Redis (optional - slot locks fall back to in-process)
+        await connect_redis()
+        
+        # WebSocket backplane (Redis pub/sub when connected, in-process otherwise)
+        try:
+            await connection_manager.start()
+        except Exception as ws_err:
+            logger.warning(f"⚠️ WebSocket backplane start failed (non-critical): {ws_err}")
+        
         # Validate configuration
         settings.validate()
         logger.info("✅ Configuration validated")
@@ -55,6 +77,101 @@ async def lifespan(app: FastAPI):
         except Exception as idx_err:
             logger.warning(f"⚠️ Index init failed (non-critical): {idx_err}")
         
+        # Build the search autocomplete index on first start
+        try:
+            from services.search_service import ensure_autocomplete_index
+            await ensure_autocomplete_index()
+        except Exception as ac_err:
+            logger.warning(f"⚠️ Autocomplete index build failed (non-critical): {ac_err}")
+        
+        # Build the freelancer skill index on first start
+        try:
+            from services.freelancer_index_service import ensure_index
+            await ensure_index()
+        except Exception as fi_err:
+            logger.warning(f"⚠️ Freelancer index build failed (non-critical): {fi_err}")
+        
+        # Conversation ids and summaries for messages stored before they existed
+        try:
+            await conversation_service.backfill_conversations()
+        except Exception as cv_err:
+            logger.warning(f"⚠️ Conversation backfill failed (non-critical): {cv_err}")
+        
+        # Unread counters for notifications and messages
+        try:
+            await unread_service.ensure_counters()
+        except Exception as uc_err:
+            logger.warning(f"⚠️ Unread counter build failed (non-critical): {uc_err}")
+        
+        # Proposal counters for service requests created before they existed
+        try:
+            from services.request_stats_service import backfill_proposal_counts
+            await backfill_proposal_counts()
+        except Exception as pc_err:
+            logger.warning(f"⚠️ Proposal counter backfill failed (non-critical): {pc_err}")
+        
+        # Expiry for read notifications stored before retention existed
+        try:
+            await notification_retention_service.backfill_purge_at()
+        except Exception as nr_err:
+            logger.warning(f"⚠️ Notification retention backfill failed (non-critical): {nr_err}")
+        
+        # Materialized views fed by change streams
+        try:
+            await materializer.start()
+        except Exception as mv_err:
+            logger.warning(f"⚠️ Materializer start failed (non-critical): {mv_err}")
+        
+        # First platform stats / health snapshots (then refreshed by jobs)
+        await platform_stats_service.refresh_health()
+        await platform_stats_service.refresh_counts()
+        
+        # Write-behind storage for chat messages and notifications
+        message_writer.start()
+        notification_service.notification_writer.start()
+        
+        # Background jobs
+        add_interval_job(
+            stock_reservation_service.release_expired,
+            seconds=settings.STOCK_RESERVATION_SWEEP_SECONDS,
+            job_id="release_expired_stock_reservations"
+        )
+        add_interval_job(
+            rating_service.reconcile_ratings,
+            seconds=settings.RATING_RECONCILE_INTERVAL_SECONDS,
+            job_id="reconcile_ratings",
+            single_worker=True
+        )
+        if settings.NOTIFICATION_ARCHIVE_ENABLED:
+            add_interval_job(
+                notification_retention_service.archive_notifications,
+                seconds=settings.NOTIFICATION_ARCHIVE_INTERVAL_SECONDS,
+                job_id="archive_notifications",
+                single_worker=True
+            )
+        if settings.MATERIALIZER_ENABLED:
+            add_interval_job(
+                materializer.heartbeat,
+                seconds=max(1, settings.MATERIALIZER_LEASE_SECONDS // 3),
+                job_id="materializer_heartbeat"
+            )
+        add_interval_job(
+            platform_stats_service.refresh_counts,
+            seconds=settings.PLATFORM_STATS_REFRESH_SECONDS,
+            job_id="refresh_platform_stats"
+        )
+        add_interval_job(
+            platform_stats_service.refresh_health,
+            seconds=settings.HEALTH_CHECK_INTERVAL_SECONDS,
+            job_id="refresh_database_health"
+        )
+        add_interval_job(
+            connection_manager.heartbeat,
+            seconds=settings.WS_HEARTBEAT_SECONDS,
+            job_id="websocket_heartbeat"
+        )
+        start_scheduler()
+        
         # Log configuration
         logger.info(f"📊 MongoDB: {settings.DB_NAME}")
         logger.info(f"📡 API Documentation: http://localhost:8000/docs")
@@ -70,10 +187,14 @@ async def lifespan(app: FastAPI):
         raise
     finally:
         # Cleanup
+        shutdown_scheduler()
+        await materializer.stop()
+        await connection_manager.stop()
+        await message_writer.stop()
+        await notification_service.notification_writer.stop()
         database.close()
-        from database import redis_client
-        if redis_client:
-            redis_client.close()
+        await close_redis()
+        password_hasher.shutdown()
         logger.info("👋 Shutting down NovoMarket Backend...")
 
 
@@ -168,10 +289,11 @@ app = FastAPI(
 async def test_cors():
     return {"message": "CORS works!"}
 
-# Simple health endpoint to verify MongoDB and Redis connections
+# Simple health endpoint to verify MongoDB and Redis connections (last background check)
 @app.get("/api/health")
 async def health():
-    return await check_database_health()
+    snapshot = await platform_stats_service.database_health.get()
+    return snapshot["data"]
 
 
 # ============ MIDDLEWARE ============
@@ -185,7 +307,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
     allow_headers=["*"],
-    expose_headers=["*"],
+    # Listed explicitly: browsers ignore "*" when credentials are allowed
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # ============ INCLUDE ROUTERS - FIXED VERSION ============
@@ -235,6 +358,22 @@ except ImportError as e:
     import traceback
     traceback.print_exc()
 
+# Search Router
+try:
+    from routes import search_routes
+    app.include_router(search_routes.router, prefix="/api", tags=["Search"])
+    logger.info("✅ Search routes included")
+except ImportError as e:
+    logger.error(f"❌ Search routes failed: {e}")
+
+# Analytics Router
+try:
+    from routes import analytics_routes
+    app.include_router(analytics_routes.router, prefix="/api", tags=["Analytics"])
+    logger.info("✅ Analytics routes included")
+except ImportError as e:
+    logger.error(f"❌ Analytics routes failed: {e}")
+
 # Checkout Router
 try:
     from routes import checkout
@@ -296,44 +435,58 @@ async def options_handler(full_path: str):
     """Handle OPTIONS requests for CORS preflight"""
     return {"message": "OK"}
 
-@app.get("/health")
-async def health_check():
-    """Comprehensive health check endpoint"""
-    from database import check_database_health
-    
-    db_health = await check_database_health()
-    
-    overall_status = "healthy" if all(
-        h["status"] in ["healthy", "disabled"] for h in db_health.values()
-    ) else "unhealthy"
-    
+async def _readiness() -> dict:
+    snapshot = await platform_stats_service.database_health.get()
+    db_health = snapshot["data"]
     return {
-        "status": overall_status,
+        "status": "healthy" if platform_stats_service.is_healthy(db_health) else "unhealthy",
         "timestamp": datetime.now(timezone.utc).isoformat(),
         "version": settings.APP_VERSION,
-        "services": db_health
+        "services": db_health,
+        "checked_at": snapshot["refreshed_at"],
+        "age_seconds": snapshot["age_seconds"]
     }
 
+@app.get("/health")
+async def health_check():
+    """Health of the API and its databases (from the last background check)"""
+    return await _readiness()
+
+@app.get("/health/live")
+async def liveness_probe():
+    """Liveness: the process is serving requests (no I/O)"""
+    return {"status": "alive", "timestamp": datetime.now(timezone.utc).isoformat()}
+
+@app.get("/health/ready")
+async def readiness_probe():
+    """Readiness: 503 while MongoDB or Redis was unhealthy at the last check"""
+    readiness = await _readiness()
+    if readiness["status"] != "healthy":
+        return JSONResponse(status_code=503, content=readiness)
+    return readiness
+
 @app.get("/api/stats")
 async def get_stats():
-    """Get platform statistics"""
-    from database import get_collection_stats
-    
-    stats = await get_collection_stats()
-    
-    # Add service request stats
-    db = get_db()
-    try:
-        service_request_count = await db.service_requests.count_documents({})
-        proposal_count = await db.proposals.count_documents({})
-        stats["service_requests"] = service_request_count
-        stats["proposals"] = proposal_count
-    except Exception as e:
-        logger.warning(f"⚠️ Failed to get service request stats: {e}")
+    """Get platform statistics (collection counts are an estimated, periodically refreshed snapshot)"""
+    counts = await platform_stats_service.collection_counts.get()
     
     return {
         "platform": settings.APP_NAME,
-        "statistics": stats,
+        "statistics": counts["data"],
+        "statistics_refreshed_at": counts["refreshed_at"],
+        "statistics_age_seconds": counts["age_seconds"],
+        "caches": {
+            "users": user_cache.stats(),
+            "calendar": booking_service.calendar_cache.stats()
+        },
+        "password_hashing": password_hasher.stats(),
+        "stock_reservations": stock_reservation_service.stats(),
+        "websockets": connection_manager.stats(),
+        "chat_writer": message_writer.stats(),
+        "notification_writer": notification_service.notification_writer.stats(),
+        "notification_retention": notification_retention_service.stats(),
+        "materializer": materializer.stats(),
+        "platform_stats": platform_stats_service.stats(),
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
 
@@ -342,11 +495,37 @@ async def get_stats():
 async def chat_websocket(websocket: WebSocket, user_id: str):
     """WebSocket endpoint for real-time chat"""
     await connection_manager.connect(websocket, user_id)
-    db = get_db()
+    
+    # Sender name for message notifications, looked up once per connection
+    sender_name = None
+    try:
+        sender = await load_user(user_id)
+        sender_name = sender.name if sender else None
+    except Exception as e:
+        logger.warning(f"⚠️ Could not load chat sender {user_id}: {e}")
+    
+    # Current unread counts; later changes are pushed as they happen
+    try:
+        await unread_service.push_counts(user_id)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not push unread counts to {user_id}: {e}")
     
     try:
         while True:
             data = await websocket.receive_json()
+            connection_manager.touch(websocket)
+            
+            # Heartbeat from the client keeps the socket and presence alive
+            if data.get("type") == "ping":
+                connection_manager.send_to_socket(websocket, {"type": "pong"})
+                continue
+            
+            # Client lists the users it shows presence for; reply with who is online now
+            if data.get("type") == "presence_subscribe":
+                state = await connection_manager.subscribe_presence(websocket, data.get("users") or [])
+                connection_manager.send_to_socket(websocket, {"type": "presence_state", **state})
+                continue
+            
             receiver_id = data.get("receiver_id")
             message_text = data.get("message", "")
             file_url = data.get("file_url")
@@ -358,6 +537,7 @@ async def chat_websocket(websocket: WebSocket, user_id: str):
                 "id": str(uuid.uuid4()),
                 "sender_id": user_id,
                 "receiver_id": receiver_id,
+                "conversation_id": conversation_service.conversation_id(user_id, receiver_id),
                 "message": message_text,
                 "file_url": file_url,
                 "file_type": file_type,
@@ -366,27 +546,15 @@ async def chat_websocket(websocket: WebSocket, user_id: str):
                 "timestamp": datetime.now(timezone.utc).isoformat(),
             }
             
-            # Save message to database
-            await db.messages.insert_one(message_doc.copy())
+            # Queue for storage (batched insert) and notification (coalesced per sender/receiver)
+            await message_writer.enqueue(message_doc, sender_name)
             
             # Send to receiver via WebSocket
             ws_message = {"type": "chat", "data": message_doc}
             await connection_manager.send_personal_message(receiver_id, ws_message)
             
             # Echo back to sender
-            await websocket.send_json(ws_message)
-            
-            # Send notification
-            try:
-                sender = await db.users.find_one({"id": user_id}, {"_id": 0})
-                if sender:
-                    await notification_service.send_message_notification(
-                        sender['name'],
-                        receiver_id,
-                        message_text
-                    )
-            except Exception as e:
-                logger.warning(f"⚠️ Message notification failed: {e}")
+            connection_manager.send_to_socket(websocket, ws_message)
             
             logger.debug(f"💬 Message from {user_id} to {receiver_id}")
     
@@ -483,41 +651,66 @@ async def delete_service_availability(
         raise HTTPException(status_code=500, detail="Failed to delete availability")
 
 @app.get("/api/bookings/available-slots/{service_id}")
-async def get_available_slots_api(service_id: str, date: str):
-    """Get all available time slots for a specific date"""
+async def get_available_slots_api(
+    service_id: str,
+    date: Optional[str] = None,
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to")
+):
+    """
+    Get available time slots for a single date (?date=) or a range of dates
+    (?from=&to=, inclusive, up to 31 days) in one request
+    """
+    if not date and not from_date:
+        raise HTTPException(status_code=400, detail="Provide either date or from/to")
+    
     try:
-        # Parse date
-        booking_date = datetime.strptime(date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        # Parse dates
+        if date:
+            first_day = last_day = datetime.strptime(date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        else:
+            first_day = datetime.strptime(from_date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+            last_day = datetime.strptime(to_date or from_date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
     
+    if last_day < first_day:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    
+    if (last_day - first_day).days + 1 > booking_service.MAX_SLOT_RANGE_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Date range cannot exceed {booking_service.MAX_SLOT_RANGE_DAYS} days"
+        )
+    
     # Check if date is in the past
-    if booking_date.date() < datetime.now(timezone.utc).date():
+    if first_day.date() < datetime.now(timezone.utc).date():
         raise HTTPException(status_code=400, detail="Cannot book dates in the past")
     
     try:
-        slots = await booking_service.get_available_slots(service_id, booking_date)
-        
-        return {
-            "service_id": service_id,
-            "date": date,
-            "day_of_week": booking_date.weekday(),
-            "day_name": booking_date.strftime("%A"),
-            "slots": slots,
-            "total_slots": len(slots),
-            "available_count": len([s for s in slots if s['available']])
-        }
-    
+        days = await booking_service.get_available_slots_range(service_id, first_day, last_day)
     except Exception as e:
         logger.error(f"❌ Failed to get available slots: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve available slots")
+    
+    if date:
+        return {"service_id": service_id, **days[0]}
+    
+    return {
+        "service_id": service_id,
+        "from": first_day.strftime("%Y-%m-%d"),
+        "to": last_day.strftime("%Y-%m-%d"),
+        "days": days,
+        "total_slots": sum(d["total_slots"] for d in days),
+        "available_count": sum(d["available_count"] for d in days)
+    }
 
 @app.post("/api/bookings/lock-slot")
 async def lock_booking_slot(
     payload: Dict = Body(...),
     current_user: User = Depends(get_current_user)
 ):
-    """Lock a time slot temporarily (5 minutes) while user completes booking"""
+    """Lock a time slot temporarily (SLOT_LOCK_TTL_SECONDS) while user completes booking"""
     service_id = payload.get("service_id")
     start_time_str = payload.get("start_time")
     
@@ -544,25 +737,47 @@ async def lock_booking_slot(
     if existing:
         raise HTTPException(status_code=400, detail="Time slot is already booked")
     
-    # Check if slot is locked by someone else
-    if booking_service.is_slot_locked(service_id, start_time):
-        lock_info = booking_service.get_lock_info(service_id, start_time)
-        if lock_info and lock_info.get("user_id") != current_user.id:
-            raise HTTPException(
-                status_code=409,
-                detail=f"Time slot is currently being booked. Try again in {lock_info.get('expires_in', 0)} seconds."
-            )
-    
-    # Acquire lock
-    if not booking_service.lock_slot(service_id, start_time, current_user.id, timeout=300):
-        raise HTTPException(status_code=409, detail="Failed to acquire slot lock")
+    # Acquire lock (atomic owner check: fails only if someone else holds it)
+    lock_timeout = settings.SLOT_LOCK_TTL_SECONDS
+    if not await booking_service.lock_slot(service_id, start_time, current_user.id, timeout=lock_timeout):
+        lock_info = await booking_service.get_lock_info(service_id, start_time)
+        expires_in = lock_info.get('expires_in', 0) if lock_info else 0
+        raise HTTPException(
+            status_code=409,
+            detail=f"Time slot is currently being booked. Try again in {expires_in} seconds."
+        )
     
     return {
         "message": "Slot locked successfully",
-        "expires_in_seconds": 300,
-        "expires_at": (datetime.now(timezone.utc) + timedelta(seconds=300)).isoformat()
+        "expires_in_seconds": lock_timeout,
+        "expires_at": (datetime.now(timezone.utc) + timedelta(seconds=lock_timeout)).isoformat()
     }
 
+@app.post("/api/bookings/unlock-slot")
+async def unlock_booking_slot(
+    payload: Dict = Body(...),
+    current_user: User = Depends(get_current_user)
+):
+    """Release a slot lock held by the current user"""
+    service_id = payload.get("service_id")
+    start_time_str = payload.get("start_time")
+    
+    if not service_id or not start_time_str:
+        raise HTTPException(
+            status_code=400,
+            detail="service_id and start_time are required"
+        )
+    
+    try:
+        start_time = datetime.fromisoformat(start_time_str)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid start_time format")
+    
+    if not await booking_service.unlock_slot(service_id, start_time, current_user.id):
+        raise HTTPException(status_code=404, detail="No lock held by you on this slot")
+    
+    return {"message": "Slot unlocked successfully"}
+
 @app.post("/api/bookings/create")
 async def create_booking_api(
     booking_data: BookingCreate,
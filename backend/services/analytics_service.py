@@ -1,277 +1,316 @@
-# # backend/services/analytics_service.py - NEW FILE
-# from database import db
-# from datetime import datetime, timedelta
-# from typing import List, Dict, Any
-# import numpy as np
-# from collections import defaultdict
-
-# # ============ PROVIDER ANALYTICS ============
-
-# async def get_provider_analytics(provider_id: str, days: int = 30) -> Dict[str, Any]:
-#     """Get comprehensive analytics for provider"""
-    
-#     start_date = datetime.utcnow() - timedelta(days=days)
-    
-#     # Get bookings
-#     bookings = await db.bookings.find(
-#         {
-#             "provider_id": provider_id,
-#             "timestamp": {"$gte": start_date.isoformat()}
-#         },
-#         {"_id": 0}
-#     ).to_list(10000)
-    
-#     # Get services
-#     services = await db.listings.find(
-#         {"seller_id": provider_id, "type": "service"},
-#         {"_id": 0}
-#     ).to_list(1000)
-    
-#     # Calculate metrics
-#     total_bookings = len(bookings)
-#     completed_bookings = len([b for b in bookings if b['status'] == 'completed'])
-#     cancelled_bookings = len([b for b in bookings if b['status'] == 'cancelled'])
-    
-#     # Revenue
-#     total_revenue = sum(b['price'] for b in bookings if b['status'] != 'cancelled')
-#     avg_booking_value = total_revenue / total_bookings if total_bookings > 0 else 0
-    
-#     # Daily breakdown
-#     daily_data = defaultdict(lambda: {'bookings': 0, 'revenue': 0})
-    
-#     for booking in bookings:
-#         if booking['status'] == 'cancelled':
-#             continue
-        
-#         date = datetime.fromisoformat(booking['timestamp']).date()
-#         daily_data[date.isoformat()]['bookings'] += 1
-#         daily_data[date.isoformat()]['revenue'] += booking['price']
-    
-#     # Sort by date
-#     daily_stats = [
-#         {'date': date, **stats}
-#         for date, stats in sorted(daily_data.items())
-#     ]
-    
-#     # Service performance
-#     service_stats = []
-#     for service in services:
-#         service_bookings = [b for b in bookings if b['service_id'] == service['id']]
-        
-#         service_stats.append({
-#             'service_id': service['id'],
-#             'title': service['title'],
-#             'total_bookings': len(service_bookings),
-#             'revenue': sum(b['price'] for b in service_bookings if b['status'] != 'cancelled'),
-#             'avg_rating': service.get('rating', 0),
-#             'reviews_count': service.get('reviews_count', 0)
-#         })
-    
-#     # Sort by revenue
-#     service_stats.sort(key=lambda x: x['revenue'], reverse=True)
-    
-#     # Growth trends
-#     current_period = bookings
-#     previous_start = start_date - timedelta(days=days)
-    
-#     previous_bookings = await db.bookings.find(
-#         {
-#             "provider_id": provider_id,
-#             "timestamp": {
-#                 "$gte": previous_start.isoformat(),
-#                 "$lt": start_date.isoformat()
-#             }
-#         },
-#         {"_id": 0}
-#     ).to_list(10000)
-    
-#     prev_revenue = sum(b['price'] for b in previous_bookings if b['status'] != 'cancelled')
-    
-#     revenue_growth = 0
-#     if prev_revenue > 0:
-#         revenue_growth = ((total_revenue - prev_revenue) / prev_revenue) * 100
-    
-#     booking_growth = 0
-#     if len(previous_bookings) > 0:
-#         booking_growth = ((total_bookings - len(previous_bookings)) / len(previous_bookings)) * 100
-    
-#     # Peak hours analysis
-#     hourly_bookings = defaultdict(int)
-#     for booking in bookings:
-#         hour = datetime.fromisoformat(booking['start_time']).hour
-#         hourly_bookings[hour] += 1
-    
-#     peak_hours = sorted(hourly_bookings.items(), key=lambda x: x[1], reverse=True)[:3]
-    
-#     return {
-#         'summary': {
-#             'total_bookings': total_bookings,
-#             'completed_bookings': completed_bookings,
-#             'cancelled_bookings': cancelled_bookings,
-#             'cancellation_rate': (cancelled_bookings / total_bookings * 100) if total_bookings > 0 else 0,
-#             'total_revenue': total_revenue,
-#             'avg_booking_value': avg_booking_value,
-#             'revenue_growth': revenue_growth,
-#             'booking_growth': booking_growth
-#         },
-#         'daily_stats': daily_stats,
-#         'service_performance': service_stats,
-#         'peak_hours': [{'hour': h, 'bookings': c} for h, c in peak_hours],
-#         'total_services': len(services)
-#     }
-
-# # ============ CLIENT INSIGHTS ============
-
-# async def get_client_insights(provider_id: str) -> Dict[str, Any]:
-#     """Get insights about clients"""
-    
-#     bookings = await db.bookings.find(
-#         {"provider_id": provider_id},
-#         {"_id": 0}
-#     ).to_list(10000)
-    
-#     # Client frequency
-#     client_bookings = defaultdict(int)
-#     for booking in bookings:
-#         client_bookings[booking['client_id']] += 1
-    
-#     # Categorize clients
-#     new_clients = sum(1 for count in client_bookings.values() if count == 1)
-#     repeat_clients = sum(1 for count in client_bookings.values() if count > 1)
-#     vip_clients = sum(1 for count in client_bookings.values() if count >= 5)
-    
-#     # Top clients
-#     top_clients = sorted(client_bookings.items(), key=lambda x: x[1], reverse=True)[:10]
-    
-#     top_client_details = []
-#     for client_id, booking_count in top_clients:
-#         client = await db.users.find_one({"id": client_id}, {"_id": 0})
-#         if client:
-#             client_total = sum(
-#                 b['price'] for b in bookings 
-#                 if b['client_id'] == client_id and b['status'] != 'cancelled'
-#             )
-            
-#             top_client_details.append({
-#                 'client_id': client_id,
-#                 'name': client['name'],
-#                 'email': client['email'],
-#                 'total_bookings': booking_count,
-#                 'total_spent': client_total
-#             })
-    
-#     # Client retention rate
-#     total_clients = len(client_bookings)
-#     retention_rate = (repeat_clients / total_clients * 100) if total_clients > 0 else 0
-    
-#     return {
-#         'total_clients': total_clients,
-#         'new_clients': new_clients,
-#         'repeat_clients': repeat_clients,
-#         'vip_clients': vip_clients,
-#         'retention_rate': retention_rate,
-#         'top_clients': top_client_details
-#     }
-
-# # ============ PREDICTIVE ANALYTICS ============
-
-# async def predict_demand(provider_id: str, days_ahead: int = 7) -> List[Dict[str, Any]]:
-#     """Predict booking demand for next N days"""
-    
-#     # Get historical data (last 30 days)
-#     start_date = datetime.utcnow() - timedelta(days=30)
-    
-#     bookings = await db.bookings.find(
-#         {
-#             "provider_id": provider_id,
-#             "timestamp": {"$gte": start_date.isoformat()}
-#         },
-#         {"_id": 0}
-#     ).to_list(10000)
-    
-#     # Analyze by day of week
-#     weekday_bookings = defaultdict(list)
-    
-#     for booking in bookings:
-#         date = datetime.fromisoformat(booking['start_time'])
-#         weekday = date.weekday()
-#         weekday_bookings[weekday].append(booking)
-    
-#     # Calculate averages
-#     weekday_avg = {}
-#     for weekday in range(7):
-#         bookings_list = weekday_bookings[weekday]
-#         if bookings_list:
-#             weekday_avg[weekday] = len(bookings_list) / 4  # ~4 weeks
-#         else:
-#             weekday_avg[weekday] = 0
-    
-#     # Predict next N days
-#     predictions = []
-#     current_date = datetime.utcnow()
-    
-#     for i in range(days_ahead):
-#         future_date = current_date + timedelta(days=i)
-#         weekday = future_date.weekday()
-        
-#         predictions.append({
-#             'date': future_date.date().isoformat(),
-#             'day_name': future_date.strftime('%A'),
-#             'predicted_bookings': round(weekday_avg.get(weekday, 0)),
-#             'confidence': 'medium' if weekday_avg.get(weekday, 0) > 0 else 'low'
-#         })
-    
-#     return predictions
-
-# # ============ RECOMMENDATIONS FOR PROVIDER ============
-
-# async def get_provider_recommendations(provider_id: str) -> List[Dict[str, str]]:
-#     """AI-powered recommendations for improving business"""
-    
-#     analytics = await get_provider_analytics(provider_id)
-#     recommendations = []
-    
-#     # Low booking rate
-#     if analytics['summary']['total_bookings'] < 5:
-#         recommendations.append({
-#             'title': 'Increase Visibility',
-#             'description': 'Your booking rate is low. Consider adding more images, improving descriptions, and offering promotional discounts.',
-#             'priority': 'high'
-#         })
-    
-#     # High cancellation rate
-#     if analytics['summary']['cancellation_rate'] > 20:
-#         recommendations.append({
-#             'title': 'Reduce Cancellations',
-#             'description': f"Your cancellation rate is {analytics['summary']['cancellation_rate']:.1f}%. Review your booking policies and improve communication with clients.",
-#             'priority': 'high'
-#         })
-    
-#     # Pricing optimization
-#     avg_value = analytics['summary']['avg_booking_value']
-#     if avg_value > 0:
-#         recommendations.append({
-#             'title': 'Optimize Pricing',
-#             'description': f'Your average booking value is ${avg_value:.2f}. Consider creating package deals to increase value.',
-#             'priority': 'medium'
-#         })
-    
-#     # Peak hours
-#     if analytics['peak_hours']:
-#         peak_hour = analytics['peak_hours'][0]['hour']
-#         recommendations.append({
-#             'title': 'Leverage Peak Hours',
-#             'description': f'Your busiest time is around {peak_hour}:00. Consider surge pricing during peak hours.',
-#             'priority': 'medium'
-#         })
-    
-#     # Service performance
-#     if analytics['service_performance']:
-#         top_service = analytics['service_performance'][0]
-#         recommendations.append({
-#             'title': 'Promote Top Service',
-#             'description': f'"{top_service["title"]}" is your best performer. Focus marketing on similar services.',
-#             'priority': 'low'
-#         })
-    
-#     return recommendations
\ No newline at end of file
+# backend/services/analytics_service.py
+"""
+Analytics Service
+Provider analytics computed inside MongoDB
+
+- One $facet pipeline over the provider's bookings (current + previous
+  period) yields the summary, growth, daily breakdown, per-service revenue,
+  peak hours and the booking value distribution ($bucket)
+- Client insights group by client server-side; only the top clients are
+  joined to users, with a single $lookup
+- Only the aggregated rows come back to Python
+- Dashboard totals come from the provider_stats view when it is maintained
+"""
+
+from datetime import datetime, timezone, timedelta
+from typing import Any, Dict, List
+import asyncio
+import logging
+
+from database import get_db
+from models import AnalyticsData, DashboardStats
+from services import unread_service
+from services import provider_stats_service
+
+logger = logging.getLogger(__name__)
+
+# Booking value ranges for the distribution ($bucket boundaries, last one open-ended)
+VALUE_BOUNDARIES = [0, 25, 50, 100, 250, 500, 1000]
+
+NOT_CANCELLED = {"$ne": ["$status", "cancelled"]}
+
+# Provider bookings use provider_id/client_id, service bookings (checkout,
+# /services/.../book) seller_id/buyer_id
+CLIENT_ID = {"$ifNull": ["$client_id", "$buyer_id"]}
+CLIENT_NAME = {"$ifNull": ["$client_name", "$buyer_name"]}
+
+
+def _provider_bookings(provider_id: str) -> Dict[str, Any]:
+    """Match a provider's bookings in either shape"""
+    return {"$or": [{"provider_id": provider_id}, {"seller_id": provider_id}]}
+
+
+def _count_if(condition: Dict[str, Any]) -> Dict[str, Any]:
+    return {"$sum": {"$cond": [condition, 1, 0]}}
+
+
+def _revenue() -> Dict[str, Any]:
+    """Sum of price over bookings that were not cancelled"""
+    return {"$sum": {"$cond": [NOT_CANCELLED, {"$ifNull": ["$price", 0]}, 0]}}
+
+
+def _growth(current: float, previous: float) -> float:
+    if not previous:
+        return 0
+    return round((current - previous) / previous * 100, 2)
+
+
+# ============ PROVIDER ANALYTICS ============
+
+async def get_provider_analytics(provider_id: str, days: int = 30) -> Dict[str, Any]:
+    """Comprehensive analytics for a provider over the last `days` days"""
+    db = get_db()
+    now = datetime.now(timezone.utc)
+    start = (now - timedelta(days=days)).isoformat()
+    previous_start = (now - timedelta(days=2 * days)).isoformat()
+    current = {"$match": {"timestamp": {"$gte": start}}}
+
+    pipeline = [
+        {"$match": {**_provider_bookings(provider_id), "timestamp": {"$gte": previous_start}}},
+        {"$facet": {
+            "summary": [
+                current,
+                {"$group": {
+                    "_id": None,
+                    "total_bookings": {"$sum": 1},
+                    "completed_bookings": _count_if({"$eq": ["$status", "completed"]}),
+                    "cancelled_bookings": _count_if({"$eq": ["$status", "cancelled"]}),
+                    "total_revenue": _revenue(),
+                }},
+            ],
+            "previous": [
+                {"$match": {"timestamp": {"$lt": start}}},
+                {"$group": {"_id": None, "total_bookings": {"$sum": 1}, "total_revenue": _revenue()}},
+            ],
+            "daily_stats": [
+                current,
+                {"$match": {"status": {"$ne": "cancelled"}}},
+                {"$group": {
+                    "_id": {"$substrBytes": ["$timestamp", 0, 10]},
+                    "bookings": {"$sum": 1},
+                    "revenue": {"$sum": {"$ifNull": ["$price", 0]}},
+                }},
+                {"$sort": {"_id": 1}},
+                {"$project": {"_id": 0, "date": "$_id", "bookings": 1, "revenue": 1}},
+            ],
+            "service_performance": [
+                current,
+                {"$group": {
+                    "_id": "$service_id",
+                    "title": {"$first": "$service_title"},
+                    "total_bookings": {"$sum": 1},
+                    "revenue": _revenue(),
+                }},
+                {"$sort": {"revenue": -1}},
+                {"$lookup": {"from": "services", "localField": "_id", "foreignField": "id", "as": "service"}},
+                {"$project": {
+                    "_id": 0,
+                    "service_id": "$_id",
+                    "title": {"$ifNull": [{"$first": "$service.title"}, "$title"]},
+                    "total_bookings": 1,
+                    "revenue": 1,
+                    "avg_rating": {"$ifNull": [{"$first": "$service.rating"}, 0]},
+                    "reviews_count": {"$ifNull": [{"$first": "$service.reviews_count"}, 0]},
+                }},
+            ],
+            "peak_hours": [
+                current,
+                {"$group": {
+                    "_id": {"$hour": {"$convert": {"input": "$start_time", "to": "date", "onError": None, "onNull": None}}},
+                    "bookings": {"$sum": 1},
+                }},
+                {"$match": {"_id": {"$ne": None}}},
+                {"$sort": {"bookings": -1, "_id": 1}},
+                {"$limit": 3},
+                {"$project": {"_id": 0, "hour": "$_id", "bookings": 1}},
+            ],
+            "value_distribution": [
+                current,
+                {"$match": {"status": {"$ne": "cancelled"}}},
+                {"$bucket": {
+                    "groupBy": {"$ifNull": ["$price", 0]},
+                    "boundaries": VALUE_BOUNDARIES,
+                    "default": f"{VALUE_BOUNDARIES[-1]}+",
+                    "output": {"bookings": {"$sum": 1}, "revenue": {"$sum": "$price"}},
+                }},
+                {"$project": {"_id": 0, "min_price": "$_id", "bookings": 1, "revenue": 1}},
+            ],
+        }},
+    ]
+
+    results, total_services = await asyncio.gather(
+        db.bookings.aggregate(pipeline).to_list(1),
+        db.services.count_documents({"seller_id": provider_id})
+    )
+    facets = results[0] if results else {}
+
+    summary = (facets.get("summary") or [{}])[0]
+    previous = (facets.get("previous") or [{}])[0]
+    total_bookings = summary.get("total_bookings", 0)
+    cancelled = summary.get("cancelled_bookings", 0)
+    total_revenue = summary.get("total_revenue", 0)
+
+    return {
+        "summary": {
+            "total_bookings": total_bookings,
+            "completed_bookings": summary.get("completed_bookings", 0),
+            "cancelled_bookings": cancelled,
+            "cancellation_rate": round(cancelled / total_bookings * 100, 2) if total_bookings else 0,
+            "total_revenue": total_revenue,
+            "avg_booking_value": round(total_revenue / total_bookings, 2) if total_bookings else 0,
+            "revenue_growth": _growth(total_revenue, previous.get("total_revenue", 0)),
+            "booking_growth": _growth(total_bookings, previous.get("total_bookings", 0)),
+        },
+        "daily_stats": facets.get("daily_stats", []),
+        "service_performance": facets.get("service_performance", []),
+        "peak_hours": facets.get("peak_hours", []),
+        "value_distribution": facets.get("value_distribution", []),
+        "total_services": total_services,
+        "days": days,
+    }
+
+
+async def get_analytics_data(provider_id: str, days: int = 30) -> AnalyticsData:
+    """Provider analytics in the AnalyticsData shape used by the dashboard"""
+    db = get_db()
+    since = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+
+    analytics, total_orders, ratings = await asyncio.gather(
+        get_provider_analytics(provider_id, days),
+        db.orders.count_documents({"seller_id": provider_id, "timestamp": {"$gte": since}, "status": {"$ne": "cancelled"}}),
+        db.services.aggregate([
+            {"$match": {"seller_id": provider_id, "reviews_count": {"$gt": 0}}},
+            {"$group": {
+                "_id": None,
+                "rating_sum": {"$sum": {"$multiply": ["$rating", "$reviews_count"]}},
+                "reviews": {"$sum": "$reviews_count"},
+            }},
+        ]).to_list(1)
+    )
+
+    avg_rating = 0.0
+    if ratings and ratings[0]["reviews"]:
+        avg_rating = round(ratings[0]["rating_sum"] / ratings[0]["reviews"], 1)
+
+    return AnalyticsData(
+        total_revenue=analytics["summary"]["total_revenue"],
+        total_bookings=analytics["summary"]["total_bookings"],
+        total_orders=total_orders,
+        avg_rating=avg_rating,
+        popular_services=analytics["service_performance"][:5],
+        revenue_trend=analytics["daily_stats"],
+    )
+
+
+# ============ CLIENT INSIGHTS ============
+
+async def get_client_insights(provider_id: str, top: int = 10) -> Dict[str, Any]:
+    """Client counts, retention and the top clients of a provider"""
+    db = get_db()
+    pipeline = [
+        {"$match": _provider_bookings(provider_id)},
+        {"$group": {
+            "_id": CLIENT_ID,
+            "name": {"$last": CLIENT_NAME},
+            "total_bookings": {"$sum": 1},
+            "total_spent": _revenue(),
+        }},
+        {"$facet": {
+            "counts": [
+                {"$group": {
+                    "_id": None,
+                    "total_clients": {"$sum": 1},
+                    "new_clients": _count_if({"$eq": ["$total_bookings", 1]}),
+                    "repeat_clients": _count_if({"$gt": ["$total_bookings", 1]}),
+                    "vip_clients": _count_if({"$gte": ["$total_bookings", 5]}),
+                }},
+            ],
+            "top_clients": [
+                {"$sort": {"total_bookings": -1, "total_spent": -1}},
+                {"$limit": top},
+                {"$lookup": {"from": "users", "localField": "_id", "foreignField": "id", "as": "user"}},
+                {"$project": {
+                    "_id": 0,
+                    "client_id": "$_id",
+                    "name": {"$ifNull": [{"$first": "$user.name"}, "$name"]},
+                    "email": {"$first": "$user.email"},
+                    "total_bookings": 1,
+                    "total_spent": 1,
+                }},
+            ],
+        }},
+    ]
+    results = await db.bookings.aggregate(pipeline).to_list(1)
+    facets = results[0] if results else {}
+
+    counts = (facets.get("counts") or [{}])[0]
+    total_clients = counts.get("total_clients", 0)
+    repeat_clients = counts.get("repeat_clients", 0)
+    return {
+        "total_clients": total_clients,
+        "new_clients": counts.get("new_clients", 0),
+        "repeat_clients": repeat_clients,
+        "vip_clients": counts.get("vip_clients", 0),
+        "retention_rate": round(repeat_clients / total_clients * 100, 2) if total_clients else 0,
+        "top_clients": facets.get("top_clients", []),
+    }
+
+
+# ============ DASHBOARD ============
+
+async def _scan_provider_totals(user_id: str) -> Dict[str, Any]:
+    """
+    Dashboard totals straight from bookings/orders (provider_stats view not live)
+
+    Attributes bookings and orders to sellers the way the provider_stats
+    projectors do, so the numbers do not change when the view goes live.
+    """
+    db = get_db()
+    bookings, pending_orders = await asyncio.gather(
+        db.bookings.aggregate([
+            {"$match": _provider_bookings(user_id)},
+            # The seller is seller_id, falling back to provider_id
+            {"$match": {"$expr": {"$eq": [{"$ifNull": ["$seller_id", "$provider_id"]}, user_id]}}},
+            {"$group": {"_id": None, "total_bookings": {"$sum": 1}, "total_revenue": _revenue()}},
+        ]).to_list(1),
+        # Cart orders count for every seller with a product in them
+        db.orders.count_documents({
+            "status": "pending",
+            "$or": [{"seller_id": user_id}, {"products.seller_id": user_id}],
+        })
+    )
+    booking_totals = bookings[0] if bookings else {}
+    return {
+        "bookings": booking_totals.get("total_bookings", 0),
+        "booking_revenue": booking_totals.get("total_revenue", 0),
+        "pending_orders": pending_orders,
+    }
+
+
+async def get_dashboard_stats(user_id: str, recent_days: int = 30) -> DashboardStats:
+    """Headline numbers for a provider's dashboard"""
+    db = get_db()
+    since = (datetime.now(timezone.utc) - timedelta(days=recent_days)).isoformat()
+
+    services, products, totals, counts = await asyncio.gather(
+        db.services.distinct("id", {"seller_id": user_id}),
+        db.products.distinct("id", {"seller_id": user_id}),
+        provider_stats_service.get_provider_stats(user_id),
+        unread_service.get_counts(user_id)
+    )
+    if totals is None:
+        totals = await _scan_provider_totals(user_id)
+
+    item_ids: List[str] = services + products
+    recent_reviews = 0
+    if item_ids:
+        recent_reviews = await db.reviews.count_documents({"item_id": {"$in": item_ids}, "timestamp": {"$gte": since}})
+
+    return DashboardStats(
+        total_listings=len(item_ids),
+        total_bookings=totals["bookings"],
+        total_revenue=totals["booking_revenue"],
+        pending_orders=totals["pending_orders"],
+        recent_reviews=recent_reviews,
+        unread_messages=counts[unread_service.MESSAGES],
+    )
@@ -296,8 +296,9 @@
 # backend/services/booking_service.py - ENHANCED & COMPLETE
 """
 Complete Booking Service with Advanced Features
-- Slot locking with Redis
+- Slot locking (Redis, with in-process fallback)
 - Availability management
+- Calendar caching (per service and date, invalidated on writes)
 - Smart slot generation
 - Booking lifecycle management
 - Meeting link generation
@@ -305,89 +306,91 @@ Complete Booking Service with Advanced Features
 
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional, Dict, Any
+import heapq
 import uuid
 import secrets
 
-from database import get_db, redis_client
+from config import settings
+from database import get_db
 from models import Booking, ServiceAvailability, TimeSlot
+from utils.slot_locks import slot_lock_manager
+from utils.cache import AsyncCache
+from services import rollup_service
 
-# ============ SLOT LOCKING (Redis) ============
+# ============ SLOT LOCKING ============
 
-def lock_slot(service_id: str, start_time: datetime, user_id: str, timeout: int = 300) -> bool:
+async def lock_slot(service_id: str, start_time: datetime, user_id: str, timeout: int = None) -> bool:
     """
     Lock a time slot for 5 minutes to prevent double booking
     
+    Re-acquiring a lock already held by the same user refreshes its TTL.
+    
     Args:
         service_id: Service ID
         start_time: Slot start time
         user_id: User attempting to book
-        timeout: Lock timeout in seconds (default: 300 = 5 minutes)
+        timeout: Lock timeout in seconds (default: settings.SLOT_LOCK_TTL_SECONDS)
     
     Returns:
         True if lock acquired, False otherwise
     """
-    if not redis_client:
-        print("⚠️  Redis not available, skipping lock")
-        return True
-    
-    slot_key = f"slot_lock:{service_id}:{start_time.isoformat()}"
-    try:
-        # NX = only set if not exists, EX = expiry in seconds
-        locked = redis_client.set(slot_key, user_id, nx=True, ex=timeout)
-        if locked:
-            print(f"🔒 Slot locked: {service_id} at {start_time.isoformat()} by {user_id}")
-        return bool(locked)
-    except Exception as e:
-        print(f"❌ Redis lock error: {e}")
-        return True  # Allow booking on error
+    locked = await slot_lock_manager.acquire(service_id, start_time, user_id, ttl=timeout)
+    if locked:
+        print(f"🔒 Slot locked: {service_id} at {start_time.isoformat()} by {user_id}")
+    return locked
 
 
-def unlock_slot(service_id: str, start_time: datetime):
-    """Manually unlock a time slot"""
-    if not redis_client:
-        return
-    
-    slot_key = f"slot_lock:{service_id}:{start_time.isoformat()}"
-    try:
-        redis_client.delete(slot_key)
+async def extend_slot_lock(service_id: str, start_time: datetime, user_id: str, timeout: int = None) -> bool:
+    """Extend a slot lock held by user_id"""
+    return await slot_lock_manager.extend(service_id, start_time, user_id, ttl=timeout)
+
+
+async def unlock_slot(service_id: str, start_time: datetime, user_id: str) -> bool:
+    """Unlock a time slot (only the lock owner can release it)"""
+    released = await slot_lock_manager.release(service_id, start_time, user_id)
+    if released:
         print(f"🔓 Slot unlocked: {service_id} at {start_time.isoformat()}")
-    except Exception as e:
-        print(f"❌ Redis unlock error: {e}")
+    return released
 
 
-def is_slot_locked(service_id: str, start_time: datetime) -> bool:
+async def is_slot_locked(service_id: str, start_time: datetime) -> bool:
     """Check if a slot is currently locked"""
-    if not redis_client:
-        return False
-    
-    slot_key = f"slot_lock:{service_id}:{start_time.isoformat()}"
-    try:
-        return redis_client.exists(slot_key) > 0
-    except Exception as e:
-        print(f"❌ Redis check error: {e}")
-        return False
+    return await get_lock_info(service_id, start_time) is not None
 
 
-def get_lock_info(service_id: str, start_time: datetime) -> Optional[Dict[str, Any]]:
+async def get_lock_info(service_id: str, start_time: datetime) -> Optional[Dict[str, Any]]:
     """Get information about who locked the slot"""
-    if not redis_client:
-        return None
-    
-    slot_key = f"slot_lock:{service_id}:{start_time.isoformat()}"
-    try:
-        user_id = redis_client.get(slot_key)
-        ttl = redis_client.ttl(slot_key)
-        
-        if user_id:
-            return {
-                "locked": True,
-                "user_id": user_id.decode() if isinstance(user_id, bytes) else user_id,
-                "expires_in": ttl
-            }
-        return None
-    except Exception as e:
-        print(f"❌ Redis lock info error: {e}")
-        return None
+    return await slot_lock_manager.get_info(service_id, start_time)
+
+
+# ============ CALENDAR CACHE ============
+
+# Weekly availability and the booked/free slot grid per (service_id, date).
+# Keys embed a per-service generation; bumping it invalidates every cached
+# date of that service at once. Locks and "is_past" change by the second, so
+# they are overlaid at read time and never cached.
+calendar_cache = AsyncCache(
+    "calendar",
+    ttl=settings.CALENDAR_CACHE_TTL_SECONDS,
+    maxsize=settings.CALENDAR_CACHE_MAX_ENTRIES
+)
+
+
+def _generation_key(service_id: str) -> str:
+    return f"gen:{service_id}"
+
+
+def _grid_key(service_id: str, generation: int, day: datetime) -> str:
+    return f"grid:{service_id}:{generation}:{day.strftime('%Y-%m-%d')}"
+
+
+def _availability_key(service_id: str, generation: int) -> str:
+    return f"weekly:{service_id}:{generation}"
+
+
+async def invalidate_calendar_cache(service_id: str):
+    """Drop all cached availability and slot grids for a service"""
+    await calendar_cache.incr(_generation_key(service_id))
 
 
 # ============ AVAILABILITY MANAGEMENT ============
@@ -444,6 +447,7 @@ async def set_availability(
         {"$set": avail_dict},
         upsert=True
     )
+    await invalidate_calendar_cache(service_id)
     
     print(f"✅ Availability set for service {service_id}, day {day_of_week}")
     return availability
@@ -451,14 +455,21 @@ async def set_availability(
 
 async def get_availability(service_id: str) -> List[ServiceAvailability]:
     """Get provider's complete weekly availability"""
-    db = get_db()
-    availability = await db.availability.find(
-        {"service_id": service_id},
-        {"_id": 0}
-    ).to_list(7)  # Max 7 days
+    generation = await calendar_cache.get_counter(_generation_key(service_id))
+    cache_key = _availability_key(service_id, generation)
+    
+    availability = await calendar_cache.get(cache_key)
+    if availability is None:
+        db = get_db()
+        availability = await db.availability.find(
+            {"service_id": service_id},
+            {"_id": 0}
+        ).to_list(7)  # Max 7 days
+        await calendar_cache.set(cache_key, availability)
     
     result = []
     for avail in availability:
+        avail = dict(avail)  # cached entries are shared; don't mutate them
         if isinstance(avail.get('timestamp'), str):
             avail['created_at'] = datetime.fromisoformat(avail.pop('timestamp'))
         result.append(ServiceAvailability(**avail))
@@ -476,99 +487,226 @@ async def delete_availability(service_id: str, provider_id: str, day_of_week: in
         "provider_id": provider_id,
         "day_of_week": day_of_week
     })
-    return result.deleted_count > 0
+    if result.deleted_count > 0:
+        await invalidate_calendar_cache(service_id)
+        return True
+    return False
 
 
 # ============ AVAILABLE SLOTS GENERATION ============
 
-async def get_available_slots(service_id: str, date: datetime) -> List[dict]:
-    """
-    Get all available time slots for a specific date
-    Generates 30-minute slots based on provider's availability
+SLOT_MINUTES = 30
+MAX_SLOT_RANGE_DAYS = 31
+
+
+def _parse_booking_time(value: str) -> datetime:
+    """Parse a stored ISO timestamp, treating naive values as UTC"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _generate_day_slots(day: datetime, availability: Optional[dict]) -> List[datetime]:
+    """Candidate slot start times for one day from the provider's time ranges"""
+    if not availability:
+        return []
     
-    Args:
-        service_id: Service ID
-        date: Date to check availability
+    starts = []
+    for time_range in availability.get('time_slots', []):
+        if not time_range.get('is_available', True):
+            continue
+        
+        start_hour, start_min = map(int, time_range['start_time'].split(':'))
+        end_hour, end_min = map(int, time_range['end_time'].split(':'))
+        
+        current = day.replace(hour=start_hour, minute=start_min, second=0, microsecond=0)
+        end = day.replace(hour=end_hour, minute=end_min, second=0, microsecond=0)
+        
+        while current < end:
+            starts.append(current)
+            current += timedelta(minutes=SLOT_MINUTES)
     
-    Returns:
-        List of slot dictionaries with availability status
+    return starts
+
+
+def _mark_booked_slots(slot_starts: List[datetime], intervals: List[tuple]) -> set:
     """
-    db = get_db()
-    day_of_week = date.weekday()
+    Sweep-line over sorted slot starts and sorted booking intervals
     
-    # Get provider's availability for this day
-    availability = await db.availability.find_one({
-        "service_id": service_id,
-        "day_of_week": day_of_week
-    }, {"_id": 0})
+    A slot is booked when its start falls inside any booking [start, end).
+    Runs in O((slots + bookings) log bookings) instead of O(slots x bookings).
+    """
+    booked = set()
+    active_ends = []  # min-heap of end times for bookings already started
+    i = 0
     
-    if not availability:
-        print(f"ℹ️  No availability configured for day {day_of_week}")
-        return []
+    for slot_start in slot_starts:
+        while i < len(intervals) and intervals[i][0] <= slot_start:
+            heapq.heappush(active_ends, intervals[i][1])
+            i += 1
+        while active_ends and active_ends[0] <= slot_start:
+            heapq.heappop(active_ends)
+        if active_ends:
+            booked.add(slot_start)
     
-    # Get existing bookings for this date
-    start_of_day = date.replace(hour=0, minute=0, second=0, microsecond=0)
-    end_of_day = start_of_day + timedelta(days=1)
+    return booked
+
+
+async def _build_slot_grids(service_id: str, days: List[datetime]) -> Dict[str, List[dict]]:
+    """
+    Compute the booked/free slot grid for each of the given (consecutive) days
+    
+    Availability and bookings are fetched once for the whole span, and booking
+    intervals are parsed once and swept against the sorted slots.
+    """
+    db = get_db()
+    span_start = days[0]
+    span_end = days[-1] + timedelta(days=1)
+    
+    # Weekly availability, keyed by day of week
+    availability_docs = await db.availability.find(
+        {"service_id": service_id},
+        {"_id": 0}
+    ).to_list(7)
+    availability_by_day = {a['day_of_week']: a for a in availability_docs}
     
+    # Bookings overlapping the span, parsed once into sorted intervals
     bookings = await db.bookings.find({
         "service_id": service_id,
-        "start_time": {
-            "$gte": start_of_day.isoformat(),
-            "$lt": end_of_day.isoformat()
-        },
+        "start_time": {"$lt": span_end.isoformat()},
+        "end_time": {"$gt": span_start.isoformat()},
         "status": {"$ne": "cancelled"}
-    }, {"_id": 0}).to_list(100)
+    }, {"_id": 0, "start_time": 1, "end_time": 1}).to_list(None)
+    
+    intervals = sorted(
+        (_parse_booking_time(b['start_time']), _parse_booking_time(b['end_time']))
+        for b in bookings
+    )
+    
+    print(f"📅 Found {len(intervals)} existing bookings between {span_start.date()} and {days[-1].date()}")
+    
+    day_slots = [
+        sorted(set(_generate_day_slots(day, availability_by_day.get(day.weekday()))))
+        for day in days
+    ]
+    booked = _mark_booked_slots([start for slots in day_slots for start in slots], intervals)
+    
+    return {
+        day.strftime("%Y-%m-%d"): [
+            {"start": start.isoformat(), "booked": start in booked}
+            for start in starts
+        ]
+        for day, starts in zip(days, day_slots)
+    }
+
+
+async def get_available_slots_range(
+    service_id: str,
+    start_date: datetime,
+    end_date: datetime
+) -> List[dict]:
+    """
+    Get available time slots for every day in [start_date, end_date]
     
-    print(f"📅 Found {len(bookings)} existing bookings for {date.date()}")
+    Slot grids come from the calendar cache; days that miss are computed
+    together in one pass. All slot locks are read in a single Redis
+    round-trip and overlaid on the grids.
     
-    # Generate available slots (30-minute intervals)
-    available_slots = []
+    Args:
+        service_id: Service ID
+        start_date: First day (inclusive)
+        end_date: Last day (inclusive)
+    
+    Returns:
+        List of day dictionaries, each with its slots
+    """
+    first_day = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    last_day = end_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    num_days = (last_day - first_day).days + 1
+    if num_days < 1:
+        return []
+    if num_days > MAX_SLOT_RANGE_DAYS:
+        raise ValueError(f"Date range cannot exceed {MAX_SLOT_RANGE_DAYS} days")
+    
+    days = [first_day + timedelta(days=n) for n in range(num_days)]
+    
+    # Cached grids for this availability generation
+    generation = await calendar_cache.get_counter(_generation_key(service_id))
+    cached = await calendar_cache.get_many([_grid_key(service_id, generation, d) for d in days])
+    grids = {d.strftime("%Y-%m-%d"): g for d, g in zip(days, cached) if g is not None}
+    
+    missing = [d for d in days if d.strftime("%Y-%m-%d") not in grids]
+    if missing:
+        # Recompute the span covering every missing day in one pass
+        span = [missing[0] + timedelta(days=n) for n in range((missing[-1] - missing[0]).days + 1)]
+        built = await _build_slot_grids(service_id, span)
+        await calendar_cache.set_many({
+            _grid_key(service_id, generation, d): built[d.strftime("%Y-%m-%d")]
+            for d in span
+        })
+        grids.update(built)
+    
+    # Overlay live state: locks and past slots
+    all_starts = [
+        datetime.fromisoformat(slot["start"])
+        for d in days
+        for slot in grids[d.strftime("%Y-%m-%d")]
+    ]
+    locks = await slot_lock_manager.get_many_info(service_id, all_starts)
     now_utc = datetime.now(timezone.utc)
     
-    for time_range in availability.get('time_slots', []):
-        if not time_range.get('is_available', True):
-            continue
-        
-        start_hour, start_min = map(int, time_range['start_time'].split(':'))
-        end_hour, end_min = map(int, time_range['end_time'].split(':'))
-        
-        current = date.replace(hour=start_hour, minute=start_min, second=0, microsecond=0)
-        end = date.replace(hour=end_hour, minute=end_min, second=0, microsecond=0)
-        
-        while current < end:
-            slot_end = current + timedelta(minutes=30)
-            
-            # Check if slot is booked
-            is_booked = any(
-                datetime.fromisoformat(b['start_time']) <= current < datetime.fromisoformat(b['end_time'])
-                for b in bookings
-            )
-            
-            # Check if slot is locked
-            is_locked = is_slot_locked(service_id, current)
-            
-            # Check if slot is in the past
+    result = []
+    starts_iter = iter(all_starts)
+    for day in days:
+        slots = []
+        for cached_slot in grids[day.strftime("%Y-%m-%d")]:
+            current = next(starts_iter)
+            is_booked = cached_slot["booked"]
+            lock_info = locks.get(current)
+            is_locked = lock_info is not None
             is_past = current < now_utc
             
             slot_info = {
-                "start": current.isoformat(),
-                "end": slot_end.isoformat(),
+                "start": cached_slot["start"],
+                "end": (current + timedelta(minutes=SLOT_MINUTES)).isoformat(),
                 "available": not is_booked and not is_locked and not is_past,
                 "locked": is_locked,
                 "booked": is_booked,
                 "is_past": is_past
             }
             
-            # Add lock info if locked
             if is_locked:
-                lock_info = get_lock_info(service_id, current)
-                if lock_info:
-                    slot_info["lock_expires_in"] = lock_info["expires_in"]
+                slot_info["lock_expires_in"] = lock_info["expires_in"]
             
-            available_slots.append(slot_info)
-            current = slot_end
+            slots.append(slot_info)
+        
+        result.append({
+            "date": day.strftime("%Y-%m-%d"),
+            "day_of_week": day.weekday(),
+            "day_name": day.strftime("%A"),
+            "slots": slots,
+            "total_slots": len(slots),
+            "available_count": len([s for s in slots if s['available']])
+        })
     
-    return available_slots
+    return result
+
+
+async def get_available_slots(service_id: str, date: datetime) -> List[dict]:
+    """
+    Get all available time slots for a specific date
+    Generates 30-minute slots based on provider's availability
+    
+    Args:
+        service_id: Service ID
+        date: Date to check availability
+    
+    Returns:
+        List of slot dictionaries with availability status
+    """
+    days = await get_available_slots_range(service_id, date, date)
+    return days[0]["slots"] if days else []
 
 
 # ============ BOOKING CREATION ============
@@ -609,34 +747,28 @@ async def create_booking(
     db = get_db()
     end_time = start_time + timedelta(minutes=duration_minutes)
     
-    # 1. Check if slot is locked by someone else
-    lock_info = get_lock_info(service_id, start_time)
-    if lock_info and lock_info.get("user_id") != client_id:
+    # 1. Lock the slot (atomic; succeeds if free or already held by this client)
+    if not await lock_slot(service_id, start_time, client_id):
         raise ValueError("This slot is currently being booked by someone else. Please try another slot.")
     
-    # 2. Check for existing bookings at this time
-    existing = await db.bookings.find_one({
-        "service_id": service_id,
-        "start_time": {"$lte": end_time.isoformat()},
-        "end_time": {"$gte": start_time.isoformat()},
-        "status": {"$ne": "cancelled"}
-    }, {"_id": 0})
-    
-    if existing:
-        raise ValueError("This time slot is already booked")
-    
-    # 3. Lock the slot (if not already locked by this user)
-    if not lock_info:
-        if not lock_slot(service_id, start_time, client_id):
-            raise ValueError("Failed to acquire slot lock. Please try again.")
-    
     try:
-        # 4. Get service title if not provided
+        # 2. Check for existing bookings at this time
+        existing = await db.bookings.find_one({
+            "service_id": service_id,
+            "start_time": {"$lte": end_time.isoformat()},
+            "end_time": {"$gte": start_time.isoformat()},
+            "status": {"$ne": "cancelled"}
+        }, {"_id": 0})
+        
+        if existing:
+            raise ValueError("This time slot is already booked")
+        
+        # 3. Get service title if not provided
         if not service_title:
             service = await db.listings.find_one({"id": service_id}, {"_id": 0, "title": 1})
             service_title = service.get("title", "Service") if service else "Service"
         
-        # 5. Create booking
+        # 4. Create booking
         booking = Booking(
             service_id=service_id,
             service_title=service_title,
@@ -658,19 +790,21 @@ async def create_booking(
         booking_dict['start_time'] = booking.start_time.isoformat()
         booking_dict['end_time'] = booking.end_time.isoformat()
         
-        # 6. Save to database
+        # 5. Save to database
         await db.bookings.insert_one(booking_dict)
+        await invalidate_calendar_cache(service_id)
+        await rollup_service.record_booking(booking_dict)
         
         print(f"✅ Booking created: {booking.id}")
         
-        # 7. Unlock the slot (booking is confirmed)
-        unlock_slot(service_id, start_time)
+        # 6. Unlock the slot (booking is confirmed)
+        await unlock_slot(service_id, start_time, client_id)
         
         return booking
         
     except Exception as e:
         # Unlock on error
-        unlock_slot(service_id, start_time)
+        await unlock_slot(service_id, start_time, client_id)
         print(f"❌ Booking creation failed: {e}")
         raise e
 
@@ -781,9 +915,9 @@ async def cancel_booking(booking_id: str, user_id: str, role: str) -> Dict[str,
     if time_until_booking < timedelta(hours=24):
         raise ValueError("Cannot cancel within 24 hours of booking start time")
     
-    # Update booking status
-    await db.bookings.update_one(
-        {"id": booking_id},
+    # Update booking status (guarded so a concurrent cancel is only counted once)
+    result = await db.bookings.update_one(
+        {"id": booking_id, "status": {"$ne": "cancelled"}},
         {
             "$set": {
                 "status": "cancelled",
@@ -792,6 +926,10 @@ async def cancel_booking(booking_id: str, user_id: str, role: str) -> Dict[str,
             }
         }
     )
+    if result.modified_count == 0:
+        raise ValueError("Booking is already cancelled")
+    await invalidate_calendar_cache(booking['service_id'])
+    await rollup_service.record_booking_cancelled(booking)
     
     print(f"🚫 Booking cancelled: {booking_id} by {user_id}")
     
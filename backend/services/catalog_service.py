@@ -0,0 +1,100 @@
+# backend/services/catalog_service.py
+"""
+Catalog Service
+- Batched lookups: one $in query per collection, joined in memory by id
+- Robust price parsing shared by cart, order and checkout flows
+- Stock decrements as a single unordered bulk_write
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+import re
+import logging
+
+from pymongo import UpdateOne
+
+from database import get_db
+
+logger = logging.getLogger(__name__)
+
+_PRICE_CLEAN_RE = re.compile(r"[^0-9.]")
+
+
+# ============ PRICES ============
+
+def parse_price(raw_price: Any) -> float:
+    """Accept numeric prices or strings like "$900" / "900.00"; 0.0 if unparseable"""
+    if isinstance(raw_price, (int, float)):
+        return float(raw_price)
+    try:
+        return float(_PRICE_CLEAN_RE.sub("", str(raw_price)) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+# ============ BATCHED LOOKUPS ============
+
+def _unique_ids(ids: Iterable[Optional[str]]) -> List[str]:
+    # Keeps first-seen order, drops blanks and duplicates
+    return list(dict.fromkeys(i for i in ids if i))
+
+
+async def fetch_by_ids(
+    collection_name: str,
+    ids: Iterable[Optional[str]],
+    projection: Optional[Dict[str, Any]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch documents by their `id` field in one round-trip
+
+    Returns:
+        {id: document} - ids with no matching document are simply absent
+    """
+    unique = _unique_ids(ids)
+    if not unique:
+        return {}
+
+    db = get_db()
+    docs = await db[collection_name].find(
+        {"id": {"$in": unique}},
+        projection if projection is not None else {"_id": 0}
+    ).to_list(len(unique))
+    return {doc["id"]: doc for doc in docs if doc.get("id")}
+
+
+async def fetch_products(ids: Iterable[Optional[str]]) -> Dict[str, Dict[str, Any]]:
+    return await fetch_by_ids("products", ids)
+
+
+async def fetch_services(ids: Iterable[Optional[str]]) -> Dict[str, Dict[str, Any]]:
+    return await fetch_by_ids("services", ids)
+
+
+async def fetch_users(ids: Iterable[Optional[str]]) -> Dict[str, Dict[str, Any]]:
+    return await fetch_by_ids("users", ids, {"_id": 0, "password": 0})
+
+
+# ============ STOCK ============
+
+async def decrement_stock(quantities: Dict[str, int]) -> int:
+    """
+    Decrement stock for several products in one bulk_write
+
+    Args:
+        quantities: {product_id: quantity}
+
+    Returns:
+        Number of product documents modified
+    """
+    ops = [
+        UpdateOne({"id": product_id}, {"$inc": {"stock": -int(quantity)}})
+        for product_id, quantity in quantities.items()
+        if product_id and quantity
+    ]
+    if not ops:
+        return 0
+
+    db = get_db()
+    result = await db.products.bulk_write(ops, ordered=False)
+    if result.matched_count != len(ops):
+        logger.warning(f"⚠️ Stock update matched {result.matched_count}/{len(ops)} products")
+    return result.modified_count
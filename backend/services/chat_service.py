@@ -0,0 +1,233 @@
+# backend/services/chat_service.py
+"""
+Chat Service
+Write-behind persistence for WebSocket chat messages
+
+The WebSocket loop hands each message to message_writer and goes back to
+receiving; delivery to the receiver does not wait for MongoDB.
+- Messages are queued and stored with insert_many in micro-batches
+  (up to CHAT_WRITE_BATCH_SIZE, or whatever arrived within CHAT_WRITE_FLUSH_MS)
+- Conversation summaries are updated once per stored batch
+- "New message" notifications are coalesced per (sender, receiver) over
+  CHAT_NOTIFY_WINDOW_SECONDS: a burst of messages becomes one notification
+- stop() lets the writer finish its current batch and drain the queue
+  before returning, so a clean shutdown loses nothing
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import logging
+
+from database import get_db
+from config import settings
+from services import notification_service, conversation_service
+
+logger = logging.getLogger(__name__)
+
+# Queued by stop(): everything ahead of it is written, then the writer exits
+_STOP = object()
+
+
+def _preview(text: str) -> str:
+    return text[:100] + "..." if len(text) > 100 else text
+
+
+class MessageWriter:
+    """Queues chat messages and writes them (and their notifications) in batches"""
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._notify_task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+        # (sender_id, receiver_id) -> {"sender_name", "count", "last_message"}
+        self._pending_notifications: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._stats = {
+            "queued": 0,
+            "written": 0,
+            "batches": 0,
+            "failed": 0,
+            "notifications": 0,
+            "notifications_coalesced": 0,
+        }
+
+    # ============ LIFECYCLE ============
+
+    def start(self):
+        if self._task:
+            return
+        self._queue = asyncio.Queue(maxsize=settings.CHAT_WRITE_QUEUE_SIZE)
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._run_writer())
+        self._notify_task = asyncio.create_task(self._run_notifier())
+        logger.info("✅ Chat message writer started")
+
+    async def stop(self):
+        """Flush queued messages and pending notifications, then stop"""
+        if not self._task:
+            return
+        # Not cancelled: a cancelled writer would drop the batch it is holding
+        await self._queue.put(_STOP)
+        await self._task
+        self._stopping.set()
+        await self._notify_task
+        self._task = self._notify_task = None
+
+        await self.flush_notifications()
+        logger.info("✅ Chat message writer stopped")
+
+    # ============ MESSAGES ============
+
+    async def enqueue(self, message_doc: Dict[str, Any], sender_name: Optional[str] = None):
+        """
+        Queue a message for storage (and a notification when sender_name is known)
+
+        Only waits when the queue is full, which slows senders down instead of
+        letting the backlog grow without bound.
+        """
+        if not self._task:
+            self.start()
+        await self._queue.put(message_doc.copy())
+        self._stats["queued"] += 1
+
+        if sender_name and message_doc.get("receiver_id"):
+            key = (message_doc["sender_id"], message_doc["receiver_id"])
+            pending = self._pending_notifications.get(key)
+            if pending:
+                pending["count"] += 1
+                pending["last_message"] = message_doc.get("message", "")
+                self._stats["notifications_coalesced"] += 1
+            else:
+                self._pending_notifications[key] = {
+                    "sender_name": sender_name,
+                    "count": 1,
+                    "last_message": message_doc.get("message", ""),
+                }
+
+    def _take_batch(self, batch: List[Dict[str, Any]]) -> bool:
+        """Top batch up from the queue without waiting; True once the stop marker was taken"""
+        stopping = False
+        while len(batch) < settings.CHAT_WRITE_BATCH_SIZE and not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is _STOP:
+                stopping = True
+            else:
+                batch.append(item)
+        return stopping
+
+    async def _run_writer(self):
+        flush_seconds = settings.CHAT_WRITE_FLUSH_MS / 1000
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            # Give the rest of a burst a moment to arrive, then write it together
+            deadline = asyncio.get_running_loop().time() + flush_seconds
+            while len(batch) < settings.CHAT_WRITE_BATCH_SIZE:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            stopping = self._take_batch(batch) or stopping
+            await self._write_batch(batch)
+
+        # Messages queued while stopping
+        while not self._queue.empty():
+            batch = []
+            self._take_batch(batch)
+            await self._write_batch(batch)
+
+    async def _write_batch(self, batch: List[Dict[str, Any]]):
+        if not batch:
+            return
+        db = get_db()
+        original = batch
+        stored = set()
+        for attempt in (1, 2):
+            try:
+                await db.messages.insert_many(batch, ordered=False)
+                self._stats["written"] += len(batch)
+                self._stats["batches"] += 1
+                stored.update(doc["id"] for doc in batch)
+                break
+            except Exception as e:
+                if attempt == 2:
+                    self._stats["failed"] += len(batch)
+                    logger.error(f"❌ Failed to store {len(batch)} chat messages: {e}")
+                else:
+                    logger.warning(f"⚠️ Chat message batch failed, retrying: {e}")
+                    # Keep the batch idempotent: drop _ids the driver added and anything already stored
+                    try:
+                        ids = [doc["id"] for doc in batch]
+                        stored = set(await db.messages.distinct("id", {"id": {"$in": ids}}))
+                    except Exception:
+                        stored = set()
+                    self._stats["written"] += len(stored)
+                    batch = [{k: v for k, v in doc.items() if k != "_id"} for doc in batch if doc["id"] not in stored]
+                    if not batch:
+                        break
+
+        try:
+            await conversation_service.record_messages([doc for doc in original if doc["id"] in stored])
+        except Exception as e:
+            logger.warning(f"⚠️ Conversation summary update failed: {e}")
+
+    # ============ NOTIFICATIONS ============
+
+    async def _run_notifier(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=settings.CHAT_NOTIFY_WINDOW_SECONDS)
+                # Stopping: stop() flushes once the writer has finished
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush_notifications()
+            except Exception as e:
+                logger.warning(f"⚠️ Message notification flush failed: {e}")
+
+    async def flush_notifications(self):
+        """Create one notification per (sender, receiver) seen since the last flush"""
+        pending, self._pending_notifications = self._pending_notifications, {}
+        if not pending:
+            return
+
+        notifications = []
+        for (sender_id, receiver_id), entry in pending.items():
+            count = entry["count"]
+            title = f"New message from {entry['sender_name']} 💬"
+            if count > 1:
+                title = f"{count} new messages from {entry['sender_name']} 💬"
+            notifications.append({
+                "user_id": receiver_id,
+                "notification_type": "new_message",
+                "title": title,
+                "message": _preview(entry["last_message"]),
+                "link": "/messages",
+                "data": {"sender_name": entry["sender_name"], "sender_id": sender_id, "count": count},
+                # Already one per sender; the writer would merge different senders (same link)
+                "coalesce": False,
+            })
+        created = await notification_service.create_notifications_bulk(notifications)
+        self._stats["notifications"] += created
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "pending_notifications": len(self._pending_notifications),
+        }
+
+
+# Global writer instance
+message_writer = MessageWriter()
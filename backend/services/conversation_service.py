@@ -0,0 +1,173 @@
+# backend/services/conversation_service.py
+"""
+Conversation Service
+- Every message carries a canonical conversation_id for its user pair
+  ("<smaller id>:<larger id>"), so one conversation is a single index range
+  on (conversation_id, timestamp, id)
+- A summary document per conversation in conversations (participants, last
+  message, unread count per participant) is maintained as messages are stored
+- Read receipts only touch messages when the summary says something is unread
+- Per-user unread message counters (unread_service) move with both
+"""
+
+from typing import Any, Dict, List, Optional
+import logging
+
+from pymongo import UpdateOne
+
+from database import get_db
+from services import unread_service
+
+logger = logging.getLogger(__name__)
+
+LAST_MESSAGE_FIELDS = ("id", "sender_id", "receiver_id", "message", "file_type", "file_name", "timestamp")
+
+
+def conversation_id(user_a: Optional[str], user_b: Optional[str]) -> Optional[str]:
+    """Canonical id of the conversation between two users (order-independent)"""
+    if not user_a or not user_b:
+        return None
+    first, second = sorted((user_a, user_b))
+    return f"{first}:{second}"
+
+
+def participants_of(conv_id: str) -> List[str]:
+    return conv_id.split(":", 1)
+
+
+# ============ SUMMARIES ============
+
+def _summary_update(conv_id: str, last: Dict[str, Any], unread: Dict[str, int]) -> UpdateOne:
+    """Upsert that folds a run of new messages into a conversation summary"""
+    last_message = {k: last.get(k) for k in LAST_MESSAGE_FIELDS}
+    stage: Dict[str, Any] = {
+        "id": conv_id,
+        "participants": {"$ifNull": ["$participants", participants_of(conv_id)]},
+        # Batches from different workers can land out of order: keep the newest
+        "last_message": {"$cond": [
+            {"$gte": [last["timestamp"], {"$ifNull": ["$updated_at", ""]}]},
+            {"$literal": last_message},
+            "$last_message"
+        ]},
+        "updated_at": {"$max": [{"$ifNull": ["$updated_at", ""]}, last["timestamp"]]},
+    }
+    for user_id, count in unread.items():
+        stage[f"unread.{user_id}"] = {"$add": [{"$ifNull": [f"$unread.{user_id}", 0]}, count]}
+    return UpdateOne({"id": conv_id}, [{"$set": stage}], upsert=True)
+
+
+async def record_messages(messages: List[Dict[str, Any]]):
+    """Update the summaries of the conversations a batch of stored messages belongs to"""
+    by_conversation: Dict[str, Dict[str, Any]] = {}
+    for msg in messages:
+        conv_id = msg.get("conversation_id")
+        if not conv_id or not msg.get("timestamp"):
+            continue
+        entry = by_conversation.setdefault(conv_id, {"last": msg, "unread": {}})
+        if msg["timestamp"] >= entry["last"]["timestamp"]:
+            entry["last"] = msg
+        if not msg.get("read") and msg.get("receiver_id") != msg.get("sender_id"):
+            receiver = msg["receiver_id"]
+            entry["unread"][receiver] = entry["unread"].get(receiver, 0) + 1
+
+    if not by_conversation:
+        return
+    db = get_db()
+    await db.conversations.bulk_write([
+        _summary_update(conv_id, entry["last"], entry["unread"])
+        for conv_id, entry in by_conversation.items()
+    ], ordered=False)
+
+    per_user: Dict[str, Dict[str, int]] = {}
+    for entry in by_conversation.values():
+        for receiver, count in entry["unread"].items():
+            per_user.setdefault(receiver, {"messages": 0})["messages"] += count
+    await unread_service.change_many(per_user)
+
+
+async def mark_read(conv_id: str, user_id: str) -> int:
+    """
+    Mark the messages a user received in a conversation as read
+
+    Returns:
+        number of messages updated (0 without touching messages when nothing is unread)
+    """
+    db = get_db()
+    summary = await db.conversations.find_one({"id": conv_id}, {"_id": 0, "unread": 1})
+    if summary is not None and not (summary.get("unread") or {}).get(user_id):
+        return 0
+
+    result = await db.messages.update_many(
+        {"conversation_id": conv_id, "receiver_id": user_id, "read": False},
+        {"$set": {"read": True}}
+    )
+    await db.conversations.update_one({"id": conv_id}, {"$set": {f"unread.{user_id}": 0}})
+    if result.modified_count:
+        await unread_service.change(user_id, messages=-result.modified_count)
+    return result.modified_count
+
+
+# ============ BACKFILL ============
+
+async def backfill_conversations() -> int:
+    """
+    Give older messages a conversation_id and build missing summaries
+
+    Returns:
+        number of messages that got a conversation_id
+    """
+    db = get_db()
+    result = await db.messages.update_many(
+        {"conversation_id": {"$exists": False}, "sender_id": {"$type": "string"}, "receiver_id": {"$type": "string"}},
+        [{"$set": {"conversation_id": {"$cond": [
+            {"$lte": ["$sender_id", "$receiver_id"]},
+            {"$concat": ["$sender_id", ":", "$receiver_id"]},
+            {"$concat": ["$receiver_id", ":", "$sender_id"]}
+        ]}}}]
+    )
+    if result.modified_count:
+        logger.info(f"✅ Set conversation_id on {result.modified_count} messages")
+
+    if result.modified_count or await db.conversations.estimated_document_count() == 0:
+        await rebuild_summaries()
+    return result.modified_count
+
+
+async def rebuild_summaries(batch_size: int = 500) -> int:
+    """Recompute every conversation summary from the messages"""
+    db = get_db()
+
+    unread: Dict[str, Dict[str, int]] = {}
+    pipeline = [
+        {"$match": {"conversation_id": {"$exists": True}, "read": False}},
+        {"$group": {"_id": {"c": "$conversation_id", "r": "$receiver_id"}, "n": {"$sum": 1}}},
+    ]
+    async for row in db.messages.aggregate(pipeline):
+        unread.setdefault(row["_id"]["c"], {})[row["_id"]["r"]] = row["n"]
+
+    pipeline = [
+        {"$match": {"conversation_id": {"$exists": True}}},
+        {"$sort": {"conversation_id": 1, "timestamp": -1, "id": -1}},
+        {"$group": {"_id": "$conversation_id", "last": {"$first": "$$ROOT"}}},
+    ]
+    ops = []
+    total = 0
+    async for row in db.messages.aggregate(pipeline, allowDiskUse=True):
+        conv_id, last = row["_id"], row["last"]
+        ops.append(UpdateOne({"id": conv_id}, {"$set": {
+            "id": conv_id,
+            "participants": participants_of(conv_id),
+            "last_message": {k: last.get(k) for k in LAST_MESSAGE_FIELDS},
+            "unread": {u: n for u, n in unread.get(conv_id, {}).items() if u},
+            "updated_at": last.get("timestamp"),
+        }}, upsert=True))
+        if len(ops) >= batch_size:
+            await db.conversations.bulk_write(ops, ordered=False)
+            total += len(ops)
+            ops = []
+    if ops:
+        await db.conversations.bulk_write(ops, ordered=False)
+        total += len(ops)
+
+    logger.info(f"✅ Rebuilt {total} conversation summaries")
+    return total
@@ -0,0 +1,111 @@
+# backend/services/freelancer_index_service.py
+"""
+Freelancer Index Service
+Inverted index from skill / category to freelancer user ids
+
+One row per (term, user_id) in freelancer_terms, where term is
+"skill:<skill>" or "category:<category>" with the values stored exactly as
+on the profile. Match scoring compares skills and categories exactly, and a
+freelancer sharing neither with a request can score at most 50, so the
+index returns every freelancer who can reach the notification threshold.
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List
+import logging
+
+from pymongo import UpdateOne
+
+from database import get_db
+
+logger = logging.getLogger(__name__)
+
+SKILL_PREFIX = "skill:"
+CATEGORY_PREFIX = "category:"
+
+
+def profile_terms(skills: Iterable[Any], categories: Iterable[Any]) -> List[str]:
+    """Index terms for a profile (or the lookup terms for a request)"""
+    terms = [f"{SKILL_PREFIX}{s}" for s in (skills or []) if isinstance(s, str) and s]
+    terms += [f"{CATEGORY_PREFIX}{c}" for c in (categories or []) if isinstance(c, str) and c]
+    return list(dict.fromkeys(terms))
+
+
+def _rows(user_id: str, profile: Dict[str, Any]) -> List[Dict[str, Any]]:
+    now = datetime.now(timezone.utc).isoformat()
+    return [
+        {"term": term, "user_id": user_id, "updated_at": now}
+        for term in profile_terms(profile.get("skills"), profile.get("categories"))
+    ]
+
+
+# ============ MAINTENANCE ============
+
+async def index_profile(user_id: str, profile: Dict[str, Any]):
+    """Replace a freelancer's index rows after a profile create or update"""
+    db = get_db()
+    try:
+        await db.freelancer_terms.delete_many({"user_id": user_id})
+        rows = _rows(user_id, profile)
+        if rows:
+            await db.freelancer_terms.insert_many(rows, ordered=False)
+    except Exception as e:
+        logger.warning(f"⚠️ Freelancer index update failed for {user_id}: {e}")
+
+
+async def remove_profile(user_id: str):
+    """Drop a freelancer from the index after their profile is deleted"""
+    db = get_db()
+    try:
+        await db.freelancer_terms.delete_many({"user_id": user_id})
+    except Exception as e:
+        logger.warning(f"⚠️ Freelancer index delete failed for {user_id}: {e}")
+
+
+async def rebuild_index(batch_size: int = 1000) -> int:
+    """Rebuild the whole index from freelancer_profiles"""
+    db = get_db()
+    await db.freelancer_terms.delete_many({})
+
+    ops = []
+    total = 0
+    cursor = db.freelancer_profiles.find(
+        {"user_id": {"$exists": True}},
+        {"_id": 0, "user_id": 1, "skills": 1, "categories": 1}
+    )
+    async for profile in cursor:
+        for row in _rows(profile["user_id"], profile):
+            # Upsert: legacy data may hold more than one profile per user
+            ops.append(UpdateOne(
+                {"term": row["term"], "user_id": row["user_id"]},
+                {"$set": row},
+                upsert=True
+            ))
+        if len(ops) >= batch_size:
+            await db.freelancer_terms.bulk_write(ops, ordered=False)
+            total += len(ops)
+            ops = []
+    if ops:
+        await db.freelancer_terms.bulk_write(ops, ordered=False)
+        total += len(ops)
+
+    logger.info(f"✅ Freelancer index rebuilt ({total} terms)")
+    return total
+
+
+async def ensure_index():
+    """Build the index on first start"""
+    db = get_db()
+    if await db.freelancer_terms.estimated_document_count() == 0:
+        await rebuild_index()
+
+
+# ============ LOOKUP ============
+
+async def candidate_ids(skills: Iterable[Any], category: Any = None) -> List[str]:
+    """User ids of freelancers sharing at least one skill or the category"""
+    terms = profile_terms(skills, [category] if category else [])
+    if not terms:
+        return []
+    db = get_db()
+    return await db.freelancer_terms.distinct("user_id", {"term": {"$in": terms}})
@@ -0,0 +1,189 @@
+# backend/services/match_scoring_service.py
+"""
+Match Scoring Service
+Batch scoring of freelancers against service requests (0-100)
+
+Profiles and requests are loaded in bulk, encoded as small matrices
+(skills and categories as 0/1 columns over the vocabulary of the requests
+being scored) and every (freelancer, request) pair is scored in one NumPy
+pass. Points per component:
+- Skills match: 40 x share of required skills the freelancer has
+- Experience: 20 if experience_years >= 2 x level, 10 if >= level
+- Budget: 15 if budget / hourly_rate is 10-100 hours, 8 if over 5
+- Success rate: 15 (>= 90), 10 (>= 70), 5 (>= 50)
+- Category: 10 if the request category is one of the freelancer's
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+
+import numpy as np
+
+from database import get_db
+
+logger = logging.getLogger(__name__)
+
+EXPERIENCE_LEVELS = {"beginner": 0, "intermediate": 1, "expert": 2}
+
+PROFILE_PROJECTION = {
+    "_id": 0, "user_id": 1, "skills": 1, "experience_years": 1,
+    "hourly_rate": 1, "success_rate": 1, "categories": 1
+}
+
+REQUEST_PROJECTION = {
+    "_id": 0, "id": 1, "skills_required": 1, "experience_level": 1,
+    "budget": 1, "category": 1
+}
+
+
+# ============ LOADING ============
+
+async def load_profiles(user_ids: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """Freelancer profiles keyed by user_id (all profiles when user_ids is None)"""
+    db = get_db()
+    query: Dict[str, Any] = {}
+    if user_ids is not None:
+        ids = list(dict.fromkeys(user_ids))
+        if not ids:
+            return {}
+        query["user_id"] = {"$in": ids}
+
+    profiles: Dict[str, Dict[str, Any]] = {}
+    async for profile in db.freelancer_profiles.find(query, PROFILE_PROJECTION):
+        # Same precedence as find_one: the first profile stored for a user wins
+        profiles.setdefault(profile.get("user_id"), profile)
+    return profiles
+
+
+async def load_requests(request_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Service requests keyed by id"""
+    ids = list(dict.fromkeys(i for i in request_ids if i))
+    if not ids:
+        return {}
+    db = get_db()
+    docs = await db.service_requests.find({"id": {"$in": ids}}, REQUEST_PROJECTION).to_list(len(ids))
+    return {doc["id"]: doc for doc in docs}
+
+
+# ============ SCORING ============
+
+def _number(value: Any) -> float:
+    return float(value) if isinstance(value, (int, float)) else 0.0
+
+
+def score_matrix(profiles: List[Dict[str, Any]], requests: List[Dict[str, Any]]) -> np.ndarray:
+    """
+    Score every profile against every request
+
+    Returns:
+        int array of shape (len(profiles), len(requests))
+    """
+    n_profiles, n_requests = len(profiles), len(requests)
+    if not n_profiles or not n_requests:
+        return np.zeros((n_profiles, n_requests), dtype=np.int64)
+
+    # 1. Skills match (40 points) - overlap counts from one matrix product
+    required = [set(r.get("skills_required") or []) for r in requests]
+    skill_index: Dict[str, int] = {}
+    for skills in required:
+        for skill in skills:
+            skill_index.setdefault(skill, len(skill_index))
+
+    request_skills = np.zeros((n_requests, len(skill_index)))
+    for j, skills in enumerate(required):
+        request_skills[j, [skill_index[s] for s in skills]] = 1.0
+
+    profile_skills = np.zeros((n_profiles, len(skill_index)))
+    for i, profile in enumerate(profiles):
+        cols = [skill_index[s] for s in set(profile.get("skills") or []) if s in skill_index]
+        profile_skills[i, cols] = 1.0
+
+    overlap = profile_skills @ request_skills.T
+    required_count = np.array([len(s) for s in required], dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        skill_points = np.where(required_count > 0, np.trunc(overlap / required_count * 40), 0)
+
+    # 2. Experience level match (20 points)
+    req_exp = np.array([EXPERIENCE_LEVELS.get(r.get("experience_level", "intermediate"), 1) for r in requests])
+    profile_exp = np.array([_number(p.get("experience_years", 0)) for p in profiles])[:, None]
+    exp_points = np.where(profile_exp >= req_exp * 2, 20, np.where(profile_exp >= req_exp, 10, 0))
+
+    # 3. Budget compatibility (15 points)
+    hourly_rate = np.array([_number(p.get("hourly_rate")) for p in profiles])[:, None]
+    budget = np.array([_number(r.get("budget")) for r in requests])[None, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        estimated_hours = np.where(hourly_rate > 0, budget / np.where(hourly_rate > 0, hourly_rate, 1), 0)
+    budget_points = np.where((estimated_hours >= 10) & (estimated_hours <= 100), 15,
+                             np.where(estimated_hours > 5, 8, 0))
+    budget_points = np.where((hourly_rate != 0) & (budget != 0), budget_points, 0)
+
+    # 4. Success rate (15 points)
+    success = np.array([_number(p.get("success_rate", 0)) for p in profiles])[:, None]
+    success_points = np.select([success >= 90, success >= 70, success >= 50], [15, 10, 5], 0)
+
+    # 5. Category match (10 points)
+    category_index: Dict[Any, int] = {}
+    request_category = np.array([
+        category_index.setdefault(r.get("category"), len(category_index)) for r in requests
+    ])
+    profile_categories = np.zeros((n_profiles, len(category_index)), dtype=bool)
+    for i, profile in enumerate(profiles):
+        for category in profile.get("categories") or []:
+            if category in category_index:
+                profile_categories[i, category_index[category]] = True
+    category_points = np.where(profile_categories[:, request_category], 10, 0)
+
+    total = skill_points + exp_points + budget_points + success_points + category_points
+    return np.minimum(total, 100).astype(np.int64)
+
+
+def score_pair(profile: Optional[Dict[str, Any]], request: Optional[Dict[str, Any]]) -> int:
+    """Score one already-loaded profile against one already-loaded request"""
+    if not profile or not request:
+        return 0
+    return int(score_matrix([profile], [request])[0, 0])
+
+
+# ============ BATCH ENTRY POINTS ============
+
+async def score_requests_for_freelancer(freelancer_id: str, requests: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Match scores of one freelancer against a page of requests
+
+    Returns:
+        {request_id: score} - 0 for every request when there is no profile
+    """
+    profiles = await load_profiles([freelancer_id])
+    profile = profiles.get(freelancer_id)
+    ids = [r.get("id") for r in requests]
+    if not profile:
+        return {request_id: 0 for request_id in ids}
+
+    scores = score_matrix([profile], requests)[0]
+    return {request_id: int(score) for request_id, score in zip(ids, scores)}
+
+
+async def score_freelancers_for_request(
+    request: Dict[str, Any],
+    user_ids: Optional[Iterable[str]] = None
+) -> Dict[str, int]:
+    """
+    Match scores of many freelancers against one request
+
+    Returns:
+        {user_id: score} for freelancers that have a profile
+    """
+    profiles = await load_profiles(user_ids)
+    if not profiles:
+        return {}
+
+    user_order = list(profiles)
+    scores = score_matrix([profiles[u] for u in user_order], [request])[:, 0]
+    return {user_id: int(score) for user_id, score in zip(user_order, scores)}
+
+
+async def calculate_match_score(freelancer_id: str, request_id: str) -> int:
+    """Score a single (freelancer, request) pair"""
+    profiles = await load_profiles([freelancer_id])
+    requests = await load_requests([request_id])
+    return score_pair(profiles.get(freelancer_id), requests.get(request_id))
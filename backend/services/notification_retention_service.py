@@ -0,0 +1,193 @@
+# backend/services/notification_retention_service.py
+"""
+Notification Retention Service
+Keeps the hot notifications collection small
+
+- Reading a notification stamps purge_at; the TTL index deletes it once
+  NOTIFICATION_READ_RETENTION_DAYS have passed (unread ones never expire)
+- Optional archival (NOTIFICATION_ARCHIVE_ENABLED) moves notifications older
+  than NOTIFICATION_ARCHIVE_AFTER_DAYS into notification_archive: one bucket
+  per (user, month) holding zlib-compressed JSON chunks, one chunk per batch
+- Each batch is claimed first (archive_batch) and its chunk is only pushed
+  into buckets that do not list the batch yet, so a batch interrupted
+  before its notifications were deleted is finished by the next run without
+  duplicating anything
+- Archived notifications that were still unread count as read from then on
+"""
+
+from datetime import datetime, timezone, timedelta
+from typing import Any, Dict, List
+import json
+import logging
+import uuid
+import zlib
+
+from bson import Binary
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from database import get_db
+from config import settings
+from services import unread_service
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+# Metrics
+_stats = {
+    "archived": 0,
+    "archive_runs": 0,
+}
+
+
+def read_fields() -> Dict[str, Any]:
+    """$set fields for marking notifications read"""
+    fields: Dict[str, Any] = {"read": True}
+    if settings.NOTIFICATION_READ_RETENTION_DAYS > 0:
+        # Picked up by the TTL index once the retention period has passed
+        fields["purge_at"] = datetime.now(timezone.utc) + timedelta(days=settings.NOTIFICATION_READ_RETENTION_DAYS)
+    return fields
+
+
+async def backfill_purge_at() -> int:
+    """Give read notifications stored before retention existed a purge_at"""
+    if settings.NOTIFICATION_READ_RETENTION_DAYS <= 0:
+        return 0
+    db = get_db()
+    result = await db.notifications.update_many(
+        {"read": True, "purge_at": {"$exists": False}},
+        {"$set": {"purge_at": datetime.now(timezone.utc) + timedelta(days=settings.NOTIFICATION_READ_RETENTION_DAYS)}}
+    )
+    if result.modified_count:
+        logger.info(f"✅ Scheduled {result.modified_count} read notifications for expiry")
+    return result.modified_count
+
+
+# ============ ARCHIVE ============
+
+def _compress(notifications: List[Dict[str, Any]]) -> Binary:
+    return Binary(zlib.compress(json.dumps(notifications, default=str).encode("utf-8")))
+
+
+def _decompress(chunk: bytes) -> List[Dict[str, Any]]:
+    return json.loads(zlib.decompress(chunk).decode("utf-8"))
+
+
+async def _archive_batch(batch_id: str) -> int:
+    """Archive (or finish archiving) the notifications claimed by one batch"""
+    db = get_db()
+    docs = await db.notifications.find(
+        {"archive_batch": batch_id},
+        {"_id": 0, "purge_at": 0, "archive_batch": 0}
+    ).to_list(None)
+    if not docs:
+        return 0
+
+    buckets: Dict[tuple, List[Dict[str, Any]]] = {}
+    unread: Dict[str, Dict[str, int]] = {}
+    for doc in docs:
+        user_id = doc.get("user_id")
+        month = str(doc.get("timestamp", ""))[:7]
+        buckets.setdefault((user_id, month), []).append(doc)
+        if not doc.get("read"):
+            unread.setdefault(user_id, {unread_service.NOTIFICATIONS: 0})[unread_service.NOTIFICATIONS] -= 1
+
+    now = datetime.now(timezone.utc).isoformat()
+    try:
+        await db.notification_archive.bulk_write([
+            UpdateOne(
+                # Buckets that already hold this batch do not match (and their upsert is a duplicate key)
+                {"user_id": user_id, "month": month, "batches": {"$ne": batch_id}},
+                {
+                    "$push": {"chunks": _compress(items)},
+                    "$addToSet": {"batches": batch_id},
+                    "$inc": {"count": len(items)},
+                    "$set": {"updated_at": now},
+                },
+                upsert=True
+            )
+            for (user_id, month), items in buckets.items()
+        ], ordered=False)
+    except BulkWriteError as e:
+        if any(err.get("code") != DUPLICATE_KEY for err in e.details.get("writeErrors", [])):
+            raise
+
+    result = await db.notifications.delete_many({"archive_batch": batch_id})
+    if result.deleted_count:
+        try:
+            await unread_service.change_many(unread)
+        except Exception as e:
+            logger.warning(f"⚠️ Unread counter update after archiving failed: {e}")
+    return len(docs)
+
+
+async def archive_notifications(batch_size: int = 1000, max_batches: int = 20) -> int:
+    """
+    Move old notifications into per-user monthly archive buckets
+
+    Run on one worker at a time (the scheduler job is single_worker).
+
+    Returns:
+        number of notifications archived in this run
+    """
+    if not settings.NOTIFICATION_ARCHIVE_ENABLED:
+        return 0
+    db = get_db()
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=settings.NOTIFICATION_ARCHIVE_AFTER_DAYS)).isoformat()
+
+    archived = 0
+    # Batches claimed by an earlier run that did not get to delete them
+    for batch_id in await db.notifications.distinct("archive_batch", {"archive_batch": {"$exists": True}}):
+        archived += await _archive_batch(batch_id)
+
+    for _ in range(max_batches):
+        candidates = await db.notifications.find(
+            {"timestamp": {"$lt": cutoff}, "archive_batch": {"$exists": False}},
+            {"_id": 0, "id": 1}
+        ).sort("timestamp", 1).limit(batch_size).to_list(batch_size)
+        if not candidates:
+            break
+
+        batch_id = uuid.uuid4().hex
+        await db.notifications.update_many(
+            {"id": {"$in": [doc["id"] for doc in candidates]}, "archive_batch": {"$exists": False}},
+            {"$set": {"archive_batch": batch_id}}
+        )
+        archived += await _archive_batch(batch_id)
+        if len(candidates) < batch_size:
+            break
+
+    _stats["archive_runs"] += 1
+    _stats["archived"] += archived
+    if archived:
+        logger.info(f"📦 Archived {archived} notifications")
+    return archived
+
+
+async def get_archive_months(user_id: str) -> List[Dict[str, Any]]:
+    """Months with archived notifications for a user (newest first)"""
+    db = get_db()
+    return await db.notification_archive.find(
+        {"user_id": user_id},
+        {"_id": 0, "month": 1, "count": 1}
+    ).sort("month", -1).to_list(None)
+
+
+async def get_archived(user_id: str, month: str) -> List[Dict[str, Any]]:
+    """Archived notifications of one month (newest first)"""
+    db = get_db()
+    bucket = await db.notification_archive.find_one({"user_id": user_id, "month": month}, {"_id": 0, "chunks": 1})
+    if not bucket:
+        return []
+    notifications = [n for chunk in bucket.get("chunks", []) for n in _decompress(chunk)]
+    notifications.sort(key=lambda n: n.get("timestamp", ""), reverse=True)
+    return notifications
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        **_stats,
+        "archive_enabled": settings.NOTIFICATION_ARCHIVE_ENABLED,
+        "read_retention_days": settings.NOTIFICATION_READ_RETENTION_DAYS,
+    }
@@ -2,19 +2,210 @@
 NovoMarket Notification Service
 Handles in-app notifications and email notifications
 Location: backend/services/notification_service.py
+
+Notifications are written behind: create_notification queues the document
+and returns it straight away; a background writer stores each batch with
+one insert_many, bumps the recipients' unread counters and pushes the new
+notifications to their open sockets. Duplicates - same user, type, link
+and data - that arrive within NOTIFICATION_FLUSH_MS are coalesced into one,
+with data["count"] holding how many were merged; distinct events that share
+a link (two bookings, two projects) stay separate. A batch that
+cannot be stored is retried once and otherwise kept for the next flush;
+stop() lets the writer finish and flushes the rest.
 """
 
+import asyncio
+import json
 import uuid
+import logging
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from fastapi import APIRouter, Depends, HTTPException
 from database import get_db
+from config import settings
 from utils.auth_utils import get_current_user
+from utils.websocket_manager import connection_manager
 from models import User
+from services import unread_service
+
+logger = logging.getLogger(__name__)
 
 # Create router for notification endpoints
 router = APIRouter()
 
+# ============ BATCHED WRITER ============
+
+class NotificationWriter:
+    """Coalesces queued notifications and stores them in batches"""
+    
+    def __init__(self):
+        # (user_id, type, link, data) -> notification waiting for the next flush
+        self._pending: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._flush_now: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._stats = {
+            "queued": 0,
+            "coalesced": 0,
+            "written": 0,
+            "batches": 0,
+            "failed": 0,
+            "pushed": 0,
+        }
+    
+    def start(self):
+        if self._task:
+            return
+        self._flush_now = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        logger.info("✅ Notification writer started")
+    
+    async def stop(self):
+        """Store whatever is still pending, then stop"""
+        if not self._task:
+            return
+        # Not cancelled: a cancelled flush would drop the batch it is storing
+        self._stopping = True
+        self._flush_now.set()
+        await self._task
+        self._task = None
+        await self.flush()
+        if self._pending:
+            logger.error(f"❌ {len(self._pending)} notifications could not be stored before shutdown")
+        logger.info("✅ Notification writer stopped")
+    
+    def enqueue(self, notification: Dict[str, Any], coalesce: bool = True) -> Dict[str, Any]:
+        """
+        Queue a notification document
+        
+        Returns:
+            the document that will be stored (an earlier one when coalesced)
+        """
+        if not self._task:
+            self.start()
+        self._stats["queued"] += 1
+        
+        if coalesce:
+            # The data identifies the event (booking_id, project_id, ...); count is ours
+            identity = {k: v for k, v in (notification.get("data") or {}).items() if k != "count"}
+            key = (notification["user_id"], notification["type"], notification["link"],
+                   json.dumps(identity, sort_keys=True, default=str))
+        else:
+            key = (notification["user_id"], notification["type"], notification["link"], notification["id"])
+        
+        pending = self._pending.get(key)
+        if pending is not None:
+            # Keep the first id (already handed out), show the latest content
+            count = pending["data"].get("count", 1) + 1
+            pending.update({
+                "title": notification["title"],
+                "message": notification["message"],
+                "data": {**notification["data"], "count": count},
+                "timestamp": notification["timestamp"],
+            })
+            self._stats["coalesced"] += 1
+            return pending
+        
+        self._pending[key] = notification
+        if len(self._pending) >= settings.NOTIFICATION_BATCH_SIZE:
+            self._flush_now.set()
+        return notification
+    
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), timeout=settings.NOTIFICATION_FLUSH_MS / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"⚠️ Notification flush failed: {e}")
+    
+    async def flush(self) -> int:
+        """Store the pending notifications with one insert_many"""
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        
+        db = get_db()
+        remaining = list(pending.values())
+        stored: List[Dict[str, Any]] = []
+        for attempt in (1, 2):
+            try:
+                await db.notifications.insert_many([n.copy() for n in remaining], ordered=False)
+                stored += remaining
+                remaining = []
+                break
+            except Exception as e:
+                logger.warning(f"⚠️ Notification batch failed (attempt {attempt}): {e}")
+                # Part of an unordered batch may have been stored: only retry the rest
+                try:
+                    ids = set(await db.notifications.distinct("id", {"id": {"$in": [n["id"] for n in remaining]}}))
+                except Exception:
+                    ids = set()
+                stored += [n for n in remaining if n["id"] in ids]
+                remaining = [n for n in remaining if n["id"] not in ids]
+                if not remaining:
+                    break
+        
+        if remaining:
+            # Already handed out by create_notification: keep them for the next flush
+            self._stats["failed"] += len(remaining)
+            logger.error(f"❌ Failed to store {len(remaining)} notifications, keeping them for the next flush")
+            for n in remaining:
+                self._pending[(n["user_id"], n["type"], n["link"], n["id"])] = n
+        if not stored:
+            return 0
+        batch = stored
+        self._stats["written"] += len(batch)
+        self._stats["batches"] += 1
+        
+        per_user: Dict[str, Dict[str, int]] = {}
+        for n in batch:
+            per_user.setdefault(n["user_id"], {"notifications": 0})["notifications"] += 1
+        try:
+            await unread_service.change_many(per_user)
+        except Exception as e:
+            logger.warning(f"⚠️ Unread counter update failed: {e}")
+        
+        for n in batch:
+            await connection_manager.send_personal_message(n["user_id"], {"type": "notification", "data": n})
+            self._stats["pushed"] += 1
+        
+        logger.debug(f"🔔 Stored {len(batch)} notifications")
+        return len(batch)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "pending": len(self._pending)}
+
+
+# Global writer instance
+notification_writer = NotificationWriter()
+
+
+def _build_notification(
+    user_id: str,
+    notification_type: str,
+    title: str,
+    message: str,
+    link: Optional[str] = None,
+    data: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "type": notification_type,
+        "title": title,
+        "message": message,
+        "link": link or "/",
+        "data": data or {},
+        "read": False,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+
 # ============ HELPER FUNCTIONS ============
 
 async def create_notification(
@@ -26,7 +217,7 @@ async def create_notification(
     data: Optional[Dict[str, Any]] = None
 ) -> dict:
     """
-    Create an in-app notification
+    Create an in-app notification (stored by the batched writer)
     
     Args:
         user_id: ID of the user to notify
@@ -39,27 +230,31 @@ async def create_notification(
     Returns:
         Created notification dict
     """
-    db = get_db()
+    notification = _build_notification(user_id, notification_type, title, message, link, data)
+    return notification_writer.enqueue(notification)
+
+
+async def create_notifications_bulk(notifications: List[Dict[str, Any]]) -> int:
+    """
+    Create many in-app notifications (stored by the batched writer)
     
-    notification = {
-        "id": str(uuid.uuid4()),
-        "user_id": user_id,
-        "type": notification_type,
-        "title": title,
-        "message": message,
-        "link": link or "/",
-        "data": data or {},
-        "read": False,
-        "timestamp": datetime.now(timezone.utc).isoformat()
-    }
+    Args:
+        notifications: dicts with the create_notification arguments
+            (user_id, notification_type, title, message, link, data) and an
+            optional coalesce flag (default True)
     
-    try:
-        await db.notifications.insert_one(notification.copy())
-        print(f"✅ Notification created for user {user_id}: {title}")
-        return notification
-    except Exception as e:
-        print(f"❌ Failed to create notification: {e}")
-        return notification
+    Returns:
+        Number of notifications queued
+    """
+    for n in notifications:
+        notification_writer.enqueue(
+            _build_notification(
+                n["user_id"], n["notification_type"], n["title"], n["message"],
+                n.get("link"), n.get("data")
+            ),
+            coalesce=n.get("coalesce", True)
+        )
+    return len(notifications)
 
 
 async def send_booking_notifications(booking: dict) -> None:
@@ -161,14 +356,10 @@ async def send_payment_notification(order_id: str, seller_id: str, amount: float
 
 
 async def get_unread_count(user_id: str) -> int:
-    """Get count of unread notifications for a user"""
+    """Get count of unread notifications for a user (from the unread counter)"""
     try:
-        db = get_db()
-        count = await db.notifications.count_documents({
-            "user_id": user_id,
-            "read": False
-        })
-        return count
+        counts = await unread_service.get_counts(user_id)
+        return counts["notifications"]
     except Exception as e:
         print(f"❌ Failed to get unread count: {e}")
         return 0
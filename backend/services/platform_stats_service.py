@@ -0,0 +1,107 @@
+# backend/services/platform_stats_service.py
+"""
+Platform Stats Service
+Snapshots for /api/stats and the health probes
+
+- Collection counts (estimated, all at once) are refreshed every
+  PLATFORM_STATS_REFRESH_SECONDS by a background job
+- The MongoDB/Redis health check runs every HEALTH_CHECK_INTERVAL_SECONDS;
+  readiness probes read the last result instead of pinging on every poll
+- Snapshots carry their age; one that is several intervals old (the job
+  stalled) is refreshed on read, once for all concurrent callers
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import time
+import logging
+
+from config import settings
+from database import get_collection_stats, check_database_health
+
+logger = logging.getLogger(__name__)
+
+# A snapshot this many intervals old is refreshed on read
+STALE_AFTER_INTERVALS = 3
+
+
+class Snapshot:
+    """Latest result of a periodic check, with its age"""
+
+    def __init__(self, name: str, loader: Callable, interval_seconds: int):
+        self.name = name
+        self.loader = loader
+        self.interval_seconds = interval_seconds
+        self.value: Optional[Dict[str, Any]] = None
+        self.refreshed_at: Optional[str] = None
+        self._refreshed_monotonic: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._stats = {
+            "refreshes": 0,
+            "failures": 0,
+            "reads": 0,
+        }
+
+    def age(self) -> Optional[float]:
+        if self._refreshed_monotonic is None:
+            return None
+        return round(time.monotonic() - self._refreshed_monotonic, 1)
+
+    async def refresh(self):
+        async with self._lock:
+            await self._load()
+
+    async def _load(self):
+        try:
+            self.value = await self.loader()
+            self.refreshed_at = datetime.now(timezone.utc).isoformat()
+            self._refreshed_monotonic = time.monotonic()
+            self._stats["refreshes"] += 1
+        except Exception as e:
+            self._stats["failures"] += 1
+            logger.warning(f"⚠️ Refreshing {self.name} failed: {e}")
+
+    async def get(self) -> Dict[str, Any]:
+        """The snapshot; loaded first if missing or stale"""
+        self._stats["reads"] += 1
+        age = self.age()
+        if age is None or age > self.interval_seconds * STALE_AFTER_INTERVALS:
+            async with self._lock:
+                # Another caller may have refreshed it while we waited
+                age = self.age()
+                if age is None or age > self.interval_seconds * STALE_AFTER_INTERVALS:
+                    await self._load()
+        return {
+            "data": self.value or {},
+            "refreshed_at": self.refreshed_at,
+            "age_seconds": self.age(),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "age_seconds": self.age()}
+
+
+collection_counts = Snapshot("collection counts", get_collection_stats, settings.PLATFORM_STATS_REFRESH_SECONDS)
+database_health = Snapshot("database health", check_database_health, settings.HEALTH_CHECK_INTERVAL_SECONDS)
+
+
+def is_healthy(health: Dict[str, Any]) -> bool:
+    return bool(health) and all(
+        h.get("status") in ["healthy", "disabled"] for h in health.values()
+    )
+
+
+async def refresh_counts():
+    await collection_counts.refresh()
+
+
+async def refresh_health():
+    await database_health.refresh()
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "collection_counts": collection_counts.stats(),
+        "database_health": database_health.stats(),
+    }
@@ -0,0 +1,63 @@
+# backend/services/provider_stats_service.py
+"""
+Provider Stats Service
+All-time dashboard totals per seller, kept by the materializer
+
+- provider_stats: one document per seller_id with bookings, booking_revenue,
+  orders, order_revenue and pending_orders
+- Projected from bookings and orders (see utils/change_streams.py), so every
+  status change or delete is reflected without the routes doing anything
+- Reading a seller's totals is a single indexed find_one; only while a
+  change stream keeps the view current (polling misses updates/deletes)
+"""
+
+from typing import Any, Dict, Optional
+import logging
+
+from database import get_db
+from services.catalog_service import parse_price
+from services.rollup_service import order_shares
+from utils.change_streams import materializer, Contribution
+
+logger = logging.getLogger(__name__)
+
+VIEW = "provider_stats"
+FIELDS = ("bookings", "booking_revenue", "orders", "order_revenue", "pending_orders")
+
+
+def _project_booking(booking: Dict[str, Any]) -> Contribution:
+    seller_id = booking.get("seller_id") or booking.get("provider_id")
+    if not seller_id:
+        return {}
+    revenue = 0 if booking.get("status") == "cancelled" else parse_price(booking.get("price", 0))
+    return {seller_id: {"bookings": 1, "booking_revenue": revenue}}
+
+
+def _project_order(order: Dict[str, Any]) -> Contribution:
+    status = order.get("status")
+    return {
+        seller_id: {
+            "orders": 1,
+            "order_revenue": 0 if status == "cancelled" else amount,
+            "pending_orders": 1 if status == "pending" else 0,
+        }
+        for seller_id, amount in order_shares(order).items()
+    }
+
+
+materializer.register(VIEW, "bookings", _project_booking, key_field="seller_id")
+materializer.register(VIEW, "orders", _project_order, key_field="seller_id")
+
+
+async def get_provider_stats(seller_id: str) -> Optional[Dict[str, float]]:
+    """
+    All-time totals for a seller
+
+    Returns None unless the view is kept live by a change stream (disabled,
+    not started yet, or polling on standalone MongoDB)
+    """
+    if not await materializer.is_live():
+        return None
+    db = get_db()
+    doc = await db[VIEW].find_one({"seller_id": seller_id}, {"_id": 0}) or {}
+    return {name: doc.get(name, 0) for name in FIELDS}
@@ -0,0 +1,179 @@
+# backend/services/rating_service.py
+"""
+Rating Service
+- Ratings are maintained incrementally on the rated document: rating_sum,
+  reviews_count and a per-star rating_histogram are bumped in one atomic
+  pipeline update that also derives the rounded average (rating)
+- A periodic reconciliation rebuilds all three from the reviews collection;
+  an item is only overwritten if its reviews_count did not change while its
+  reviews were being aggregated and none of its reviews is recent enough to
+  still be on its way through add_rating (otherwise the next run picks it
+  up); items whose reviews are all gone are reset to zero
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+import logging
+
+from pymongo import UpdateOne
+
+from database import get_db
+
+logger = logging.getLogger(__name__)
+
+# Reviewed item type -> collection holding the rating fields
+RATED_COLLECTIONS = {
+    "listing": "listings",
+    "product": "products",
+    "service": "services",
+}
+
+STARS = (1, 2, 3, 4, 5)
+
+# Reviews younger than this may not have been folded in by add_rating yet
+SETTLE_SECONDS = 300
+
+
+def _collection(item_type: str):
+    if item_type not in RATED_COLLECTIONS:
+        raise ValueError(f"Unknown rated item type: {item_type}")
+    return get_db()[RATED_COLLECTIONS[item_type]]
+
+
+def _star(rating: float) -> int:
+    return min(max(int(round(rating)), STARS[0]), STARS[-1])
+
+
+# ============ INCREMENTAL UPDATES ============
+
+def _increment_pipeline(rating: float) -> List[Dict[str, Any]]:
+    star = str(_star(rating))
+    return [
+        {"$set": {
+            # Documents rated before the running sum existed start from their stored average
+            "rating_sum": {"$add": [
+                {"$ifNull": [
+                    "$rating_sum",
+                    {"$multiply": [{"$ifNull": ["$rating", 0]}, {"$ifNull": ["$reviews_count", 0]}]}
+                ]},
+                rating
+            ]},
+            "reviews_count": {"$add": [{"$ifNull": ["$reviews_count", 0]}, 1]},
+            f"rating_histogram.{star}": {"$add": [{"$ifNull": [f"$rating_histogram.{star}", 0]}, 1]},
+        }},
+        {"$set": {
+            "rating": {"$round": [{"$divide": ["$rating_sum", "$reviews_count"]}, 1]}
+        }},
+    ]
+
+
+async def add_rating(item_type: str, item_id: str, rating: float) -> bool:
+    """
+    Fold one new review into the item's rating aggregates
+
+    Returns:
+        True if the item exists
+    """
+    result = await _collection(item_type).update_one({"id": item_id}, _increment_pipeline(rating))
+    return result.matched_count > 0
+
+
+# ============ RECONCILIATION ============
+
+def _histogram_fields() -> Dict[str, Any]:
+    return {
+        f"star_{star}": {"$sum": {"$cond": [{"$eq": [{"$round": ["$rating", 0]}, star]}, 1, 0]}}
+        for star in STARS
+    }
+
+
+def _rebuild_pipeline(item_field: str, match: Dict[str, Any], item_ids: List[str]) -> List[Dict[str, Any]]:
+    return [
+        {"$match": {**match, item_field: {"$in": item_ids}, "rating": {"$type": "number"}}},
+        {"$group": {
+            "_id": f"${item_field}",
+            "rating_sum": {"$sum": "$rating"},
+            "reviews_count": {"$sum": 1},
+            "latest": {"$max": "$timestamp"},
+            **_histogram_fields(),
+        }},
+    ]
+
+
+async def _rebuild_batch(item_type: str, items: List[Dict[str, Any]]) -> int:
+    """
+    Rebuild a batch of items from their reviews
+
+    The reviews_count read before aggregating is a condition of the write: a
+    review folded in by add_rating meanwhile makes the item skip this run
+    instead of being overwritten with a count that misses it. Items with a
+    review newer than SETTLE_SECONDS are skipped too: the review may be
+    stored but not yet added, and add_rating would count it a second time
+    on top of the rebuilt totals.
+    """
+    db = get_db()
+    settled = (datetime.now(timezone.utc) - timedelta(seconds=SETTLE_SECONDS)).isoformat()
+    seen = {item["id"]: item.get("reviews_count") for item in items}
+    if item_type == "listing":
+        # Marketplace reviews reference listing_id
+        pipeline = _rebuild_pipeline("listing_id", {}, list(seen))
+    else:
+        pipeline = _rebuild_pipeline("item_id", {"item_type": item_type}, list(seen))
+
+    ops = []
+    unreviewed = set(seen)
+    async for row in db.reviews.aggregate(pipeline):
+        unreviewed.discard(row["_id"])
+        if (row.get("latest") or "") >= settled:
+            continue
+        count = row["reviews_count"]
+        ops.append(UpdateOne({"id": row["_id"], "reviews_count": seen[row["_id"]]}, {"$set": {
+            "rating_sum": row["rating_sum"],
+            "reviews_count": count,
+            "rating_histogram": {str(star): row[f"star_{star}"] for star in STARS},
+            "rating": round(row["rating_sum"] / count, 1) if count else 0.0,
+        }}))
+    for item_id in unreviewed:
+        if seen[item_id] == 0:
+            continue
+        # Every review was deleted (or the item predates the aggregates)
+        ops.append(UpdateOne({"id": item_id, "reviews_count": seen[item_id]}, {"$set": {
+            "rating_sum": 0,
+            "reviews_count": 0,
+            "rating_histogram": {str(star): 0 for star in STARS},
+            "rating": 0.0,
+        }}))
+    if not ops:
+        return 0
+    result = await _collection(item_type).bulk_write(ops, ordered=False)
+    skipped = len(ops) - result.matched_count
+    if skipped:
+        logger.info(f"ℹ️ {skipped} {item_type} ratings changed during reconciliation, left for the next run")
+    return result.matched_count
+
+
+async def rebuild_ratings(item_type: str, batch_size: int = 500) -> int:
+    """Recompute rating aggregates for every reviewed item of one type"""
+    collection = _collection(item_type)
+    total = 0
+    items = []
+    async for item in collection.find({"id": {"$exists": True}}, {"_id": 0, "id": 1, "reviews_count": 1}):
+        items.append(item)
+        if len(items) >= batch_size:
+            total += await _rebuild_batch(item_type, items)
+            items = []
+    if items:
+        total += await _rebuild_batch(item_type, items)
+    return total
+
+
+async def reconcile_ratings() -> Dict[str, int]:
+    """Rebuild every catalog's rating aggregates from the reviews collection"""
+    results = {}
+    for item_type in RATED_COLLECTIONS:
+        try:
+            results[item_type] = await rebuild_ratings(item_type)
+        except Exception as e:
+            logger.error(f"❌ Rating reconciliation failed for {item_type}: {e}")
+    logger.info(f"✅ Ratings reconciled: {results}")
+    return results
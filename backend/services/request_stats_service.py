@@ -0,0 +1,152 @@
+# backend/services/request_stats_service.py
+"""
+Service Request Stats Service
+- Proposal counters kept on each service request (proposals_count,
+  pending_proposals_count) and updated atomically with the proposal writes;
+  requests posted through the freelancer routes are keyed by ObjectId
+- Status breakdown from one cached $group over service_requests
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict
+import logging
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from database import get_db
+from config import settings
+from utils.cache import AsyncCache
+
+logger = logging.getLogger(__name__)
+
+stats_cache = AsyncCache("service_request_stats", ttl=settings.SERVICE_REQUEST_STATS_TTL_SECONDS, maxsize=16)
+
+_STATS_KEY = "breakdown"
+
+
+# ============ PROPOSAL COUNTERS ============
+
+def _request_filter(request_id: str) -> Dict[str, Any]:
+    # Freelancer-route requests have no id field, only their ObjectId
+    if ObjectId.is_valid(request_id):
+        return {"$or": [{"id": request_id}, {"_id": ObjectId(request_id)}]}
+    return {"id": request_id}
+
+
+async def proposal_submitted(request_id: str):
+    """Count a new (pending) proposal on its request"""
+    db = get_db()
+    await db.service_requests.update_one(
+        _request_filter(request_id),
+        {"$inc": {"proposals_count": 1, "pending_proposals_count": 1}}
+    )
+    await invalidate_stats()
+
+
+async def proposal_accepted(request_id: str):
+    """Accepting one proposal rejects the rest, so nothing is left pending"""
+    db = get_db()
+    await db.service_requests.update_one(
+        _request_filter(request_id),
+        {"$set": {"pending_proposals_count": 0}}
+    )
+    await invalidate_stats()
+
+
+async def proposal_rejected(request_id: str):
+    """A pending proposal was rejected on its own"""
+    db = get_db()
+    await db.service_requests.update_one(
+        {**_request_filter(request_id), "pending_proposals_count": {"$gt": 0}},
+        {"$inc": {"pending_proposals_count": -1}}
+    )
+    await invalidate_stats()
+
+
+async def backfill_proposal_counts(batch_size: int = 500) -> int:
+    """Set counters on requests created before they existed (one $group over proposals)"""
+    db = get_db()
+    missing = await db.service_requests.count_documents({"proposals_count": {"$exists": False}, "id": {"$exists": True}})
+    if not missing:
+        return 0
+
+    counts: Dict[str, Dict[str, int]] = {}
+    pipeline = [
+        {"$group": {
+            "_id": "$service_request_id",
+            "total": {"$sum": 1},
+            "pending": {"$sum": {"$cond": [{"$eq": ["$status", "pending"]}, 1, 0]}},
+        }}
+    ]
+    async for row in db.proposals.aggregate(pipeline):
+        if row["_id"]:
+            counts[row["_id"]] = row
+
+    ops = []
+    updated = 0
+    cursor = db.service_requests.find(
+        {"proposals_count": {"$exists": False}, "id": {"$exists": True}},
+        {"_id": 0, "id": 1}
+    )
+    async for req in cursor:
+        row = counts.get(req["id"], {})
+        ops.append(UpdateOne(
+            {"id": req["id"], "proposals_count": {"$exists": False}},
+            {"$set": {
+                "proposals_count": row.get("total", 0),
+                "pending_proposals_count": row.get("pending", 0)
+            }}
+        ))
+        if len(ops) >= batch_size:
+            await db.service_requests.bulk_write(ops, ordered=False)
+            updated += len(ops)
+            ops = []
+    if ops:
+        await db.service_requests.bulk_write(ops, ordered=False)
+        updated += len(ops)
+
+    logger.info(f"✅ Backfilled proposal counters on {updated} service requests")
+    return updated
+
+
+# ============ STATUS BREAKDOWN ============
+
+async def invalidate_stats():
+    await stats_cache.delete(_STATS_KEY)
+
+
+async def get_status_stats() -> Dict[str, Any]:
+    """
+    Request counts by status plus proposal totals
+
+    Requests without a status are counted as open, matching what sellers see.
+    """
+    cached = await stats_cache.get(_STATS_KEY)
+    if cached is not None:
+        return cached
+
+    db = get_db()
+    pipeline = [
+        {"$group": {
+            "_id": {"$ifNull": ["$status", "open"]},
+            "count": {"$sum": 1},
+            "proposals": {"$sum": {"$ifNull": ["$proposals_count", 0]}},
+        }}
+    ]
+    by_status: Dict[str, int] = {}
+    total = 0
+    proposals = 0
+    async for row in db.service_requests.aggregate(pipeline):
+        by_status[str(row["_id"])] = row["count"]
+        total += row["count"]
+        proposals += row["proposals"]
+
+    stats = {
+        "total": total,
+        "by_status": by_status,
+        "proposals": proposals,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    await stats_cache.set(_STATS_KEY, stats)
+    return stats
@@ -0,0 +1,259 @@
+# backend/services/rollup_service.py
+"""
+Rollup Service
+Pre-aggregated daily numbers for seller dashboards
+
+- seller_daily_rollups: one document per (seller_id, day)
+- service_daily_rollups: one document per (service_id, day)
+- Each holds orders, bookings, revenue, cancellations and an hourly
+  histogram (hours.HH = orders + bookings created in that UTC hour)
+- Orders and bookings count on the day they were created; a cancellation
+  adds to that day's cancellations and takes the amount back out of its
+  revenue, so every day shows net revenue
+- Kept current with $inc when orders/bookings are created or cancelled;
+  rebuild_rollups() recomputes everything from history
+- A dashboard range reads at most one small document per day
+"""
+
+from datetime import datetime, timezone, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+from pymongo import UpdateOne
+
+from database import get_db
+from services.catalog_service import parse_price
+
+logger = logging.getLogger(__name__)
+
+SELLER_ROLLUPS = "seller_daily_rollups"
+SERVICE_ROLLUPS = "service_daily_rollups"
+COUNTERS = ("orders", "bookings", "revenue", "cancellations")
+
+CANCELLED = "cancelled"
+
+# (collection, owner field, owner id, day) -> {"orders": 1, "revenue": 25.0, "hours.14": 1, ...}
+Increments = Dict[Tuple[str, str, str, str], Dict[str, float]]
+
+
+def _created_at(doc: Dict[str, Any]) -> Optional[datetime]:
+    """Creation time of an order/booking (timestamp, or the older created_at/booked_at)"""
+    for field in ("timestamp", "created_at", "booked_at"):
+        value = doc.get(field)
+        if isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            except ValueError:
+                continue
+        if isinstance(value, datetime):
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=timezone.utc)
+            return value.astimezone(timezone.utc)
+    return None
+
+
+def _add(increments: Increments, collection: str, field: str, owner: Optional[str], day: str, **counts: float):
+    if not owner:
+        return
+    row = increments.setdefault((collection, field, owner, day), {})
+    for name, value in counts.items():
+        if value:
+            row[name] = row.get(name, 0) + value
+
+
+def order_shares(order: Dict[str, Any]) -> Dict[str, float]:
+    """Amount of an order per seller (cart orders can span several sellers)"""
+    shares: Dict[str, float] = {}
+    for product in order.get("products") or []:
+        seller_id = product.get("seller_id") or order.get("seller_id")
+        if seller_id:
+            amount = product.get("subtotal")
+            if amount is None:
+                amount = parse_price(product.get("price", 0)) * product.get("quantity", 1)
+            shares[seller_id] = shares.get(seller_id, 0) + parse_price(amount)
+    if not shares and order.get("seller_id"):
+        shares[order["seller_id"]] = parse_price(order.get("total_amount", 0))
+    return shares
+
+
+def _booking_seller(booking: Dict[str, Any]) -> Optional[str]:
+    return booking.get("seller_id") or booking.get("provider_id")
+
+
+# ============ INCREMENTS ============
+
+def _order_created(increments: Increments, order: Dict[str, Any]):
+    created = _created_at(order)
+    if not created:
+        return
+    day, hour = created.date().isoformat(), f"hours.{created.hour:02d}"
+    for seller_id, amount in order_shares(order).items():
+        _add(increments, SELLER_ROLLUPS, "seller_id", seller_id, day, orders=1, revenue=amount, **{hour: 1})
+
+
+def _order_cancelled(increments: Increments, order: Dict[str, Any], sign: int = 1):
+    created = _created_at(order)
+    if not created:
+        return
+    day = created.date().isoformat()
+    for seller_id, amount in order_shares(order).items():
+        _add(increments, SELLER_ROLLUPS, "seller_id", seller_id, day, cancellations=sign, revenue=-sign * amount)
+
+
+def _booking_created(increments: Increments, booking: Dict[str, Any]):
+    created = _created_at(booking)
+    if not created:
+        return
+    day, hour = created.date().isoformat(), f"hours.{created.hour:02d}"
+    value = parse_price(booking.get("price", 0))
+    _add(increments, SELLER_ROLLUPS, "seller_id", _booking_seller(booking), day, bookings=1, revenue=value, **{hour: 1})
+    _add(increments, SERVICE_ROLLUPS, "service_id", booking.get("service_id"), day, bookings=1, revenue=value, **{hour: 1})
+
+
+def _booking_cancelled(increments: Increments, booking: Dict[str, Any], sign: int = 1):
+    created = _created_at(booking)
+    if not created:
+        return
+    day = created.date().isoformat()
+    value = parse_price(booking.get("price", 0))
+    _add(increments, SELLER_ROLLUPS, "seller_id", _booking_seller(booking), day, cancellations=sign, revenue=-sign * value)
+    _add(increments, SERVICE_ROLLUPS, "service_id", booking.get("service_id"), day, cancellations=sign, revenue=-sign * value)
+
+
+async def _apply(increments: Increments):
+    if not increments:
+        return
+    db = get_db()
+    ops: Dict[str, List[UpdateOne]] = {}
+    for (collection, field, owner, day), inc in increments.items():
+        if inc:
+            ops.setdefault(collection, []).append(
+                UpdateOne({field: owner, "day": day}, {"$inc": inc}, upsert=True)
+            )
+    for collection, batch in ops.items():
+        await db[collection].bulk_write(batch, ordered=False)
+
+
+# ============ STATE TRANSITIONS ============
+
+async def record_order(order: Dict[str, Any]):
+    """An order was placed"""
+    increments: Increments = {}
+    _order_created(increments, order)
+    try:
+        await _apply(increments)
+    except Exception as e:
+        logger.warning(f"⚠️ Rollup update for order {order.get('id')} failed: {e}")
+
+
+async def record_booking(booking: Dict[str, Any]):
+    """A booking was made"""
+    increments: Increments = {}
+    _booking_created(increments, booking)
+    try:
+        await _apply(increments)
+    except Exception as e:
+        logger.warning(f"⚠️ Rollup update for booking {booking.get('id')} failed: {e}")
+
+
+async def record_booking_cancelled(booking: Dict[str, Any], reinstated: bool = False):
+    """A booking was cancelled (or a cancellation was undone)"""
+    increments: Increments = {}
+    _booking_cancelled(increments, booking, -1 if reinstated else 1)
+    try:
+        await _apply(increments)
+    except Exception as e:
+        logger.warning(f"⚠️ Rollup update for booking {booking.get('id')} failed: {e}")
+
+
+# ============ READS ============
+
+def _day_range(days: int) -> List[str]:
+    today = datetime.now(timezone.utc).date()
+    return [(today - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1)]
+
+
+async def _get_daily(collection: str, field: str, owner: str, days: int) -> List[Dict[str, Any]]:
+    db = get_db()
+    day_list = _day_range(days)
+    docs = await db[collection].find(
+        {field: owner, "day": {"$gte": day_list[0]}},
+        {"_id": 0, field: 0}
+    ).to_list(days)
+    by_day = {doc["day"]: doc for doc in docs}
+
+    rows = []
+    for day in day_list:
+        doc = by_day.get(day, {})
+        rows.append({
+            "day": day,
+            **{name: doc.get(name, 0) for name in COUNTERS},
+            "hours": doc.get("hours", {}),
+        })
+    return rows
+
+
+async def get_seller_daily(seller_id: str, days: int = 7) -> List[Dict[str, Any]]:
+    """One row per day (oldest first, missing days as zeros)"""
+    return await _get_daily(SELLER_ROLLUPS, "seller_id", seller_id, days)
+
+
+async def get_service_daily(service_id: str, days: int = 7) -> List[Dict[str, Any]]:
+    """One row per day (oldest first, missing days as zeros)"""
+    return await _get_daily(SERVICE_ROLLUPS, "service_id", service_id, days)
+
+
+# ============ REBUILD ============
+
+async def rebuild_rollups(batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Recompute every rollup from orders and bookings
+
+    Increments recorded while this runs are overwritten, so run it when
+    traffic is low (or right after deploying).
+    """
+    db = get_db()
+    increments: Increments = {}
+
+    async for order in db.orders.find({}, {"_id": 0, "id": 1, "seller_id": 1, "total_amount": 1, "products": 1,
+                                           "status": 1, "timestamp": 1, "created_at": 1}):
+        _order_created(increments, order)
+        if order.get("status") == CANCELLED:
+            _order_cancelled(increments, order)
+
+    # Older checkout bookings were stored without a price: give them the service's price
+    service_prices = {
+        s["id"]: parse_price(s.get("price", 0))
+        async for s in db.services.find({}, {"_id": 0, "id": 1, "price": 1})
+        if s.get("id")
+    }
+    price_fixes: List[UpdateOne] = []
+    async for booking in db.bookings.find({}, {"_id": 0, "id": 1, "seller_id": 1, "provider_id": 1, "service_id": 1,
+                                               "price": 1, "status": 1, "timestamp": 1, "created_at": 1, "booked_at": 1}):
+        if booking.get("price") is None and booking.get("id"):
+            booking["price"] = service_prices.get(booking.get("service_id"), 0)
+            price_fixes.append(UpdateOne({"id": booking["id"]}, {"$set": {"price": booking["price"]}}))
+        _booking_created(increments, booking)
+        if booking.get("status") == CANCELLED:
+            _booking_cancelled(increments, booking)
+    for start in range(0, len(price_fixes), batch_size):
+        await db.bookings.bulk_write(price_fixes[start:start + batch_size], ordered=False)
+
+    docs: Dict[str, List[Dict[str, Any]]] = {SELLER_ROLLUPS: [], SERVICE_ROLLUPS: []}
+    for (collection, field, owner, day), inc in increments.items():
+        doc: Dict[str, Any] = {field: owner, "day": day, **{name: 0 for name in COUNTERS}, "hours": {}}
+        for name, value in inc.items():
+            if name.startswith("hours."):
+                doc["hours"][name.split(".", 1)[1]] = value
+            else:
+                doc[name] = value
+        docs[collection].append(doc)
+
+    for collection, rows in docs.items():
+        await db[collection].delete_many({})
+        for start in range(0, len(rows), batch_size):
+            await db[collection].insert_many(rows[start:start + batch_size], ordered=False)
+
+    counts = {collection: len(rows) for collection, rows in docs.items()}
+    logger.info(f"✅ Rebuilt rollups: {counts[SELLER_ROLLUPS]} seller days, {counts[SERVICE_ROLLUPS]} service days")
+    return counts
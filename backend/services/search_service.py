@@ -0,0 +1,299 @@
+# backend/services/search_service.py
+"""
+Search Service
+- $text queries with relevance scoring (listings, products, services)
+- Edge n-gram autocomplete index kept in the search_autocomplete collection
+- Unified search across all three catalogs
+"""
+
+from datetime import datetime, timezone
+from typing import List, Optional, Dict, Any, Tuple
+import re
+import logging
+
+from database import get_db
+from models import Listing
+
+logger = logging.getLogger(__name__)
+
+# Catalog name -> collection name
+CATALOGS = {
+    "listing": "listings",
+    "product": "products",
+    "service": "services",
+}
+
+# Deepest result reachable by paging (page * limit); totals are counted up to it
+MAX_SEARCH_WINDOW = 1000
+
+MIN_GRAM = 2
+MAX_GRAM = 15
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+# ============ TEXT SEARCH ============
+
+def text_filter(search: str) -> Dict[str, Any]:
+    """Mongo filter for a $text search (uses the collection's text index)"""
+    return {"$text": {"$search": search}}
+
+
+TEXT_SCORE_PROJECTION = {"_id": 0, "score": {"$meta": "textScore"}}
+TEXT_SCORE_SORT = [("score", {"$meta": "textScore"})]
+
+
+def apply_search(query: Dict[str, Any], search: Optional[str]) -> Tuple[Dict[str, Any], Dict[str, Any], Optional[list]]:
+    """
+    Add a text search to a list query
+
+    Returns:
+        (query, projection, sort) - sort is None when there is no search term
+    """
+    if not search or not search.strip():
+        return query, {"_id": 0}, None
+    return {**query, **text_filter(search.strip())}, TEXT_SCORE_PROJECTION, TEXT_SCORE_SORT
+
+
+# ============ AUTOCOMPLETE INDEX ============
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens"""
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def edge_ngrams(text: str) -> List[str]:
+    """Every prefix (MIN_GRAM..MAX_GRAM chars) of every token in text"""
+    grams = set()
+    for token in tokenize(text):
+        for n in range(MIN_GRAM, min(len(token), MAX_GRAM) + 1):
+            grams.add(token[:n])
+    return sorted(grams)
+
+
+def _autocomplete_doc(catalog: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+    extra = doc.get("tags") or doc.get("skills") or []
+    return {
+        "id": f"{catalog}:{doc['id']}",
+        "catalog": catalog,
+        "item_id": doc["id"],
+        "title": doc.get("title", ""),
+        "type": doc.get("type") or catalog,
+        "category": doc.get("category"),
+        "price": doc.get("price"),
+        "grams": edge_ngrams(" ".join([doc.get("title", "")] + list(extra))),
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+async def index_document(catalog: str, doc: Dict[str, Any]):
+    """Add or refresh one catalog item in the autocomplete index"""
+    db = get_db()
+    try:
+        entry = _autocomplete_doc(catalog, doc)
+        await db.search_autocomplete.replace_one({"id": entry["id"]}, entry, upsert=True)
+    except Exception as e:
+        logger.warning(f"⚠️ Autocomplete index update failed for {catalog}:{doc.get('id')}: {e}")
+
+
+async def remove_document(catalog: str, item_id: str):
+    """Remove one catalog item from the autocomplete index"""
+    db = get_db()
+    try:
+        await db.search_autocomplete.delete_one({"id": f"{catalog}:{item_id}"})
+    except Exception as e:
+        logger.warning(f"⚠️ Autocomplete index delete failed for {catalog}:{item_id}: {e}")
+
+
+async def rebuild_autocomplete_index(batch_size: int = 500) -> int:
+    """Rebuild the autocomplete index from all catalogs"""
+    from pymongo import ReplaceOne
+
+    db = get_db()
+    total = 0
+    for catalog, collection in CATALOGS.items():
+        ops = []
+        cursor = db[collection].find(
+            {"id": {"$exists": True}},
+            {"_id": 0, "id": 1, "title": 1, "type": 1, "category": 1, "price": 1, "tags": 1, "skills": 1}
+        )
+        async for doc in cursor:
+            entry = _autocomplete_doc(catalog, doc)
+            ops.append(ReplaceOne({"id": entry["id"]}, entry, upsert=True))
+            if len(ops) >= batch_size:
+                await db.search_autocomplete.bulk_write(ops, ordered=False)
+                total += len(ops)
+                ops = []
+        if ops:
+            await db.search_autocomplete.bulk_write(ops, ordered=False)
+            total += len(ops)
+
+    logger.info(f"✅ Autocomplete index rebuilt ({total} entries)")
+    return total
+
+
+async def ensure_autocomplete_index():
+    """Build the autocomplete index on first start"""
+    db = get_db()
+    if await db.search_autocomplete.estimated_document_count() == 0:
+        await rebuild_autocomplete_index()
+
+
+def _prefix_filter(prefix: str, catalogs: List[str]) -> Optional[Dict[str, Any]]:
+    tokens = [t[:MAX_GRAM] for t in tokenize(prefix)]
+    if not tokens or len(tokens[-1]) < MIN_GRAM:
+        return None
+    query: Dict[str, Any] = {"grams": {"$all": tokens} if len(tokens) > 1 else tokens[0]}
+    if len(catalogs) < len(CATALOGS):
+        query["catalog"] = {"$in": catalogs}
+    return query
+
+
+async def autocomplete(prefix: str, type: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+    """Titles whose words start with the typed prefix(es)"""
+    query = _prefix_filter(prefix, _catalogs_for_type(type))
+    if query is None:
+        return []
+    if type:
+        query["type"] = type
+
+    db = get_db()
+    return await db.search_autocomplete.find(
+        query,
+        {"_id": 0, "item_id": 1, "title": 1, "type": 1, "catalog": 1, "category": 1, "price": 1}
+    ).limit(limit).to_list(limit)
+
+
+# ============ UNIFIED SEARCH ============
+
+def _catalogs_for_type(type: Optional[str]) -> List[str]:
+    # Legacy listings hold both products and services (filtered by their type field)
+    if type == "product":
+        return ["listing", "product"]
+    if type == "service":
+        return ["listing", "service"]
+    return list(CATALOGS)
+
+
+def _to_listing(catalog: str, doc: Dict[str, Any]) -> Listing:
+    """Map a product/service/listing document onto the Listing model"""
+    doc = dict(doc)
+    doc.pop("score", None)
+    if isinstance(doc.get("timestamp"), str):
+        doc["created_at"] = datetime.fromisoformat(doc.pop("timestamp"))
+
+    if catalog == "product":
+        doc["type"] = "product"
+    elif catalog == "service":
+        doc["type"] = "service"
+        doc.setdefault("tags", doc.get("skills", []))
+        doc["stock"] = None
+    return Listing(**doc)
+
+
+def _base_filter(catalog: str, category: Optional[str], min_price: Optional[float],
+                 max_price: Optional[float], type: Optional[str]) -> Dict[str, Any]:
+    query: Dict[str, Any] = {}
+    if category:
+        query["category"] = category
+    if min_price is not None or max_price is not None:
+        query["price"] = {}
+        if min_price is not None:
+            query["price"]["$gte"] = min_price
+        if max_price is not None:
+            query["price"]["$lte"] = max_price
+    if catalog == "listing" and type:
+        query["type"] = type
+    return query
+
+
+async def search_catalogs(
+    query: str,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    type: Optional[str] = None,
+    page: int = 1,
+    limit: int = 50
+) -> Tuple[List[Listing], int]:
+    """
+    Relevance-ranked search across listings, products and services
+
+    Each catalog returns its top page*limit matches by text score; they are
+    merged by score and the requested page is sliced out. When the text
+    search finds nothing, prefix matches from the autocomplete index are used
+    so partially typed words still return results.
+
+    page*limit may not exceed MAX_SEARCH_WINDOW, and each catalog's count
+    stops at MAX_SEARCH_WINDOW, so total is capped rather than exact.
+
+    Returns:
+        (results, total)
+    """
+    window = page * limit
+    if window > MAX_SEARCH_WINDOW:
+        raise ValueError(f"page * limit may not exceed {MAX_SEARCH_WINDOW}")
+    db = get_db()
+    catalogs = _catalogs_for_type(type)
+    skip = (page - 1) * limit
+
+    scored: List[Tuple[float, str, Dict[str, Any]]] = []
+    total = 0
+    for catalog in catalogs:
+        collection = db[CATALOGS[catalog]]
+        filt = {**_base_filter(catalog, category, min_price, max_price, type), **text_filter(query)}
+        try:
+            docs = await collection.find(filt, TEXT_SCORE_PROJECTION).sort(TEXT_SCORE_SORT).limit(window).to_list(window)
+            total += await collection.count_documents(filt, limit=MAX_SEARCH_WINDOW)
+        except Exception as e:
+            logger.warning(f"⚠️ Text search failed on {CATALOGS[catalog]}: {e}")
+            continue
+        scored.extend((d.get("score", 0.0), catalog, d) for d in docs)
+
+    if total == 0:
+        return await _prefix_search(query, catalogs, category, min_price, max_price, type, skip, limit)
+
+    scored.sort(key=lambda item: item[0], reverse=True)
+    results = []
+    for _, catalog, doc in scored[skip:skip + limit]:
+        try:
+            results.append(_to_listing(catalog, doc))
+        except Exception as e:
+            logger.error(f"Error parsing search result {doc.get('id', 'unknown')}: {e}")
+    return results, total
+
+
+async def _prefix_search(query, catalogs, category, min_price, max_price, type, skip, limit):
+    """Fallback for partially typed words, via the autocomplete index"""
+    db = get_db()
+    prefix_query = _prefix_filter(query, catalogs)
+    if prefix_query is None:
+        return [], 0
+
+    base = _base_filter("listing", category, min_price, max_price, type)
+    prefix_query.update(base)
+
+    total = await db.search_autocomplete.count_documents(prefix_query, limit=MAX_SEARCH_WINDOW)
+    entries = await db.search_autocomplete.find(
+        prefix_query, {"_id": 0, "catalog": 1, "item_id": 1}
+    ).sort("title", 1).skip(skip).limit(limit).to_list(limit)
+
+    # One $in fetch per catalog, then restore index order
+    ids_by_catalog: Dict[str, List[str]] = {}
+    for entry in entries:
+        ids_by_catalog.setdefault(entry["catalog"], []).append(entry["item_id"])
+
+    docs: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for catalog, ids in ids_by_catalog.items():
+        found = await db[CATALOGS[catalog]].find({"id": {"$in": ids}}, {"_id": 0}).to_list(len(ids))
+        docs.update({(catalog, d["id"]): d for d in found})
+
+    results = []
+    for entry in entries:
+        doc = docs.get((entry["catalog"], entry["item_id"]))
+        if doc:
+            try:
+                results.append(_to_listing(entry["catalog"], doc))
+            except Exception as e:
+                logger.error(f"Error parsing search result {entry['item_id']}: {e}")
+    return results, total
@@ -0,0 +1,282 @@
+# backend/services/stock_reservation_service.py
+"""
+Stock Reservation Service
+- Guarded decrements: find_one_and_update only matches while stock >= qty,
+  so concurrent buyers can never drive stock negative
+- Multi-item carts reserve line by line and roll back on the first shortfall
+- Reservations live in stock_reservations, expire with the Stripe checkout
+  session, and hand their stock back on cancel or expiry
+"""
+
+from datetime import datetime, timezone, timedelta
+from typing import Any, Dict, List, Optional
+import uuid
+import logging
+
+from pymongo import ReturnDocument, UpdateOne
+
+from database import get_db
+from config import settings
+from services import catalog_service
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = "active"
+COMMITTED = "committed"
+RELEASED = "released"
+
+# Metrics
+_stats = {
+    "reserved": 0,
+    "rejected": 0,
+    "committed": 0,
+    "released": 0,
+    "expired": 0,
+}
+
+
+class InsufficientStock(Exception):
+    """Raised when a product cannot cover the requested quantity"""
+
+    def __init__(self, product_id: str, requested: int, available: int, title: Optional[str] = None):
+        self.product_id = product_id
+        self.requested = requested
+        self.available = available
+        self.title = title
+        super().__init__(f"Insufficient stock for {title or product_id}: requested {requested}, available {available}")
+
+
+# ============ GUARDED STOCK UPDATES ============
+
+async def take_stock(product_id: str, quantity: int) -> Optional[Dict[str, Any]]:
+    """
+    Atomically decrement stock if (and only if) enough is left
+
+    Returns:
+        The updated product (id, title, stock) or None on shortfall
+    """
+    db = get_db()
+    return await db.products.find_one_and_update(
+        {"id": product_id, "stock": {"$gte": quantity}},
+        {"$inc": {"stock": -quantity}},
+        projection={"_id": 0, "id": 1, "title": 1, "stock": 1},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def restore_stock(quantities: Dict[str, int]) -> int:
+    """Give stock back for several products in one bulk_write"""
+    ops = [
+        UpdateOne({"id": product_id}, {"$inc": {"stock": int(quantity)}})
+        for product_id, quantity in quantities.items()
+        if product_id and quantity
+    ]
+    if not ops:
+        return 0
+
+    db = get_db()
+    result = await db.products.bulk_write(ops, ordered=False)
+    return result.modified_count
+
+
+async def take_stock_bulk(quantities: Dict[str, int]) -> None:
+    """
+    Decrement stock for every product in a cart, all or nothing
+
+    Products are taken in id order so two carts sharing products contend in
+    the same order. On the first shortfall everything taken so far is put
+    back and InsufficientStock is raised.
+    """
+    db = get_db()
+    taken: Dict[str, int] = {}
+    for product_id in sorted(quantities):
+        quantity = int(quantities[product_id])
+        if quantity <= 0:
+            continue
+        if await take_stock(product_id, quantity) is None:
+            if taken:
+                await restore_stock(taken)
+            _stats["rejected"] += 1
+            current = await db.products.find_one({"id": product_id}, {"_id": 0, "stock": 1, "title": 1})
+            raise InsufficientStock(
+                product_id,
+                quantity,
+                (current or {}).get("stock", 0),
+                (current or {}).get("title")
+            )
+        taken[product_id] = quantity
+
+
+# ============ RESERVATIONS ============
+
+def reservation_ttl() -> timedelta:
+    return timedelta(minutes=settings.STOCK_RESERVATION_TTL_MINUTES)
+
+
+async def reserve(buyer_id: str, quantities: Dict[str, int], ttl: Optional[timedelta] = None) -> Dict[str, Any]:
+    """
+    Hold stock for a checkout
+
+    Raises:
+        InsufficientStock if any product cannot cover its quantity
+
+    Returns:
+        The reservation document (expires_at is a datetime)
+    """
+    await take_stock_bulk(quantities)
+
+    now = datetime.now(timezone.utc)
+    reservation = {
+        "id": str(uuid.uuid4()),
+        "buyer_id": buyer_id,
+        "session_id": None,
+        "items": [{"product_id": pid, "quantity": int(q)} for pid, q in quantities.items() if q],
+        "status": ACTIVE,
+        "created_at": now,
+        "expires_at": now + (ttl or reservation_ttl()),
+    }
+
+    db = get_db()
+    try:
+        await db.stock_reservations.insert_one(dict(reservation))
+    except Exception:
+        # No record means nobody could release it later - give the stock back now
+        await restore_stock(quantities)
+        raise
+
+    _stats["reserved"] += 1
+    return reservation
+
+
+async def attach_session(reservation_id: str, session_id: str):
+    """Link a reservation to the checkout session it is holding stock for"""
+    db = get_db()
+    await db.stock_reservations.update_one(
+        {"id": reservation_id},
+        {"$set": {"session_id": session_id}}
+    )
+
+
+def _closed_fields(status: str, reason: Optional[str] = None) -> Dict[str, Any]:
+    now = datetime.now(timezone.utc)
+    fields = {
+        "status": status,
+        "closed_at": now,
+        # Picked up by the TTL index once the retention period has passed
+        "purge_at": now + timedelta(days=settings.STOCK_RESERVATION_RETENTION_DAYS),
+    }
+    if reason:
+        fields["release_reason"] = reason
+    return fields
+
+
+def _session_or_id(reservation_id: Optional[str], session_id: Optional[str]) -> Dict[str, Any]:
+    if reservation_id:
+        return {"id": reservation_id}
+    if session_id:
+        return {"session_id": session_id}
+    raise ValueError("reservation_id or session_id is required")
+
+
+async def commit(reservation_id: Optional[str] = None, session_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Turn a held reservation into a sale (stock stays decremented)
+
+    Returns:
+        The reservation, or None if there was no active one to commit
+    """
+    db = get_db()
+    reservation = await db.stock_reservations.find_one_and_update(
+        {**_session_or_id(reservation_id, session_id), "status": ACTIVE},
+        {"$set": _closed_fields(COMMITTED)},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if reservation:
+        _stats["committed"] += 1
+    return reservation
+
+
+async def release(
+    reservation_id: Optional[str] = None,
+    session_id: Optional[str] = None,
+    reason: str = "cancelled",
+    buyer_id: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Cancel a held reservation and return its stock
+
+    The status flip is atomic, so a reservation is released at most once
+    even when the webhook, the cancel redirect and the sweeper race.
+
+    Returns:
+        The released reservation, or None if there was no active one
+    """
+    query = {**_session_or_id(reservation_id, session_id), "status": ACTIVE}
+    if buyer_id:
+        query["buyer_id"] = buyer_id
+
+    db = get_db()
+    reservation = await db.stock_reservations.find_one_and_update(
+        query,
+        {"$set": _closed_fields(RELEASED, reason)},
+        projection={"_id": 0, "id": 1, "session_id": 1, "items": 1}
+    )
+    if not reservation:
+        return None
+
+    quantities: Dict[str, int] = {}
+    for item in reservation.get("items", []):
+        quantities[item["product_id"]] = quantities.get(item["product_id"], 0) + item["quantity"]
+    await restore_stock(quantities)
+
+    _stats["released"] += 1
+    logger.info(f"🔓 Released stock reservation {reservation['id']} ({reason})")
+    return reservation
+
+
+async def settle_paid_session(session_id: str, quantities: Dict[str, int]):
+    """
+    Finalize stock for a paid checkout session
+
+    Normally this just commits the session's reservation. Sessions created
+    before reservations existed, or whose hold was released before the
+    payment landed, have their stock taken here instead - the buyer has
+    already paid, so the decrement is unconditional.
+    """
+    if await commit(session_id=session_id):
+        return
+
+    db = get_db()
+    existing = await db.stock_reservations.find_one({"session_id": session_id}, {"_id": 0, "status": 1})
+    if existing and existing.get("status") == COMMITTED:
+        # Duplicate webhook delivery
+        return
+
+    if existing:
+        logger.warning(f"⚠️ Payment for session {session_id} arrived after its reservation was released")
+    await catalog_service.decrement_stock(quantities)
+
+
+async def release_expired(batch_size: int = 200) -> int:
+    """Release every active reservation past its expiry (plus a grace period for late webhooks)"""
+    db = get_db()
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.STOCK_RESERVATION_GRACE_SECONDS)
+    expired: List[Dict[str, Any]] = await db.stock_reservations.find(
+        {"status": ACTIVE, "expires_at": {"$lt": cutoff}},
+        {"_id": 0, "id": 1}
+    ).limit(batch_size).to_list(batch_size)
+
+    released = 0
+    for reservation in expired:
+        if await release(reservation_id=reservation["id"], reason="expired"):
+            released += 1
+
+    if released:
+        _stats["expired"] += released
+        logger.info(f"⏰ Released {released} expired stock reservations")
+    return released
+
+
+def stats() -> Dict[str, Any]:
+    return dict(_stats)
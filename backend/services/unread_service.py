@@ -0,0 +1,178 @@
+# backend/services/unread_service.py
+"""
+Unread Counter Service
+Per-user unread counts for notifications and chat messages
+
+- unread_counters holds one document per user ({user_id, notifications,
+  messages}); every change is a single atomic pipeline update that clamps at 0
+- The latest counts are cached in Redis (AsyncCache, in-process fallback),
+  so reads never run count_documents
+- Every change is pushed to the user's sockets as
+  {"type": "unread_counts", "notifications": n, "messages": m}
+"""
+
+from typing import Any, Dict, Iterable, Optional
+import logging
+
+from pymongo import ReturnDocument, UpdateOne
+
+from database import get_db
+from config import settings
+from utils.cache import AsyncCache
+from utils.websocket_manager import connection_manager
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATIONS = "notifications"
+MESSAGES = "messages"
+KINDS = (NOTIFICATIONS, MESSAGES)
+
+counter_cache = AsyncCache("unread_counts", ttl=settings.UNREAD_CACHE_TTL_SECONDS, maxsize=10000)
+
+
+def _counts(doc: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    doc = doc or {}
+    return {kind: max(int(doc.get(kind) or 0), 0) for kind in KINDS}
+
+
+def _change_pipeline(deltas: Dict[str, int], reset: Iterable[str] = ()) -> list:
+    stage: Dict[str, Any] = {}
+    for kind in KINDS:
+        if kind in reset:
+            stage[kind] = 0
+        elif deltas.get(kind):
+            stage[kind] = {"$max": [0, {"$add": [{"$ifNull": [f"${kind}", 0]}, deltas[kind]]}]}
+    return [{"$set": stage}]
+
+
+async def _publish(user_id: str, counts: Dict[str, int]):
+    await counter_cache.set(user_id, counts)
+    await connection_manager.send_personal_message(user_id, {"type": "unread_counts", **counts})
+
+
+# ============ CHANGES ============
+
+async def change(user_id: str, notifications: int = 0, messages: int = 0) -> Dict[str, int]:
+    """Add (or with negative values, subtract) unread items for one user"""
+    return await _apply(user_id, _change_pipeline({NOTIFICATIONS: notifications, MESSAGES: messages}))
+
+
+async def reset(user_id: str, kind: str) -> Dict[str, int]:
+    """Set one counter to zero (mark all read)"""
+    return await _apply(user_id, _change_pipeline({}, reset=[kind]))
+
+
+async def _apply(user_id: str, pipeline: list) -> Dict[str, int]:
+    if not user_id or not pipeline[0]["$set"]:
+        return await get_counts(user_id)
+    db = get_db()
+    doc = await db.unread_counters.find_one_and_update(
+        {"user_id": user_id},
+        pipeline,
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    counts = _counts(doc)
+    await _publish(user_id, counts)
+    return counts
+
+
+async def change_many(deltas: Dict[str, Dict[str, int]]):
+    """
+    Apply {user_id: {"notifications": n, "messages": m}} in one bulk write
+
+    Used by the batched writers; pushes the new counts to every user touched.
+    """
+    ops = [
+        UpdateOne({"user_id": user_id}, _change_pipeline(delta), upsert=True)
+        for user_id, delta in deltas.items()
+        if user_id and any(delta.get(kind) for kind in KINDS)
+    ]
+    if not ops:
+        return
+    db = get_db()
+    await db.unread_counters.bulk_write(ops, ordered=False)
+
+    docs = await db.unread_counters.find(
+        {"user_id": {"$in": list(deltas)}}, {"_id": 0}
+    ).to_list(len(deltas))
+    for doc in docs:
+        await _publish(doc["user_id"], _counts(doc))
+
+
+# ============ READS ============
+
+async def get_counts(user_id: str) -> Dict[str, int]:
+    """Current unread counts (cache, then the counter document)"""
+    cached = await counter_cache.get(user_id)
+    if cached is not None:
+        return _counts(cached)
+
+    db = get_db()
+    doc = await db.unread_counters.find_one({"user_id": user_id}, {"_id": 0})
+    counts = _counts(doc)
+    await counter_cache.set(user_id, counts)
+    return counts
+
+
+async def push_counts(user_id: str):
+    """Send the current counts to a user's sockets (e.g. right after they connect)"""
+    counts = await get_counts(user_id)
+    await connection_manager.send_personal_message(user_id, {"type": "unread_counts", **counts})
+
+
+# ============ REBUILD ============
+
+async def rebuild_counters(batch_size: int = 500) -> int:
+    """Recompute every user's counters from notifications and messages"""
+    db = get_db()
+    totals: Dict[str, Dict[str, int]] = {}
+
+    pipeline = [
+        {"$match": {"read": False}},
+        {"$group": {"_id": "$user_id", "n": {"$sum": 1}}},
+    ]
+    async for row in db.notifications.aggregate(pipeline):
+        if row["_id"]:
+            totals.setdefault(row["_id"], {})[NOTIFICATIONS] = row["n"]
+
+    pipeline = [
+        {"$match": {"read": False}},
+        {"$group": {"_id": "$receiver_id", "n": {"$sum": 1}}},
+    ]
+    async for row in db.messages.aggregate(pipeline):
+        if row["_id"]:
+            totals.setdefault(row["_id"], {})[MESSAGES] = row["n"]
+
+    ops = []
+    written = 0
+    for user_id, counts in totals.items():
+        ops.append(UpdateOne(
+            {"user_id": user_id},
+            {"$set": {"user_id": user_id, **_counts(counts)}},
+            upsert=True
+        ))
+        if len(ops) >= batch_size:
+            await db.unread_counters.bulk_write(ops, ordered=False)
+            written += len(ops)
+            ops = []
+    if ops:
+        await db.unread_counters.bulk_write(ops, ordered=False)
+        written += len(ops)
+
+    # Users with nothing unread any more
+    await db.unread_counters.update_many(
+        {"user_id": {"$nin": list(totals)}},
+        {"$set": {NOTIFICATIONS: 0, MESSAGES: 0}}
+    )
+    await counter_cache.set_many({user_id: _counts(counts) for user_id, counts in totals.items()})
+    logger.info(f"✅ Rebuilt unread counters for {written} users")
+    return written
+
+
+async def ensure_counters():
+    """Build the counters on first start"""
+    db = get_db()
+    if await db.unread_counters.estimated_document_count() == 0:
+        await rebuild_counters()
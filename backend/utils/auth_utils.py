@@ -1,38 +1,88 @@
 # backend/utils/auth_utils.py
 """
 Authentication utilities: JWT tokens, password hashing, user validation
+
+Access tokens are short-lived and carry the user's id, email, name and role
+as signed claims, so authenticating a request needs no database lookup.
+Refresh tokens are long-lived and only accepted by /auth/refresh.
 """
 from fastapi import HTTPException, Header
-from passlib.context import CryptContext
 from datetime import datetime, timezone, timedelta
+from typing import Optional, Union
 import jwt
 from config import settings
 from database import get_db
 from models import User
+from utils.cache import TTLCache
+from utils.password_hasher import password_hasher
+
+# Password hashing context (shared with the async worker pool)
+pwd_context = password_hasher.context
+
+# Full user documents for routes that need more than the token claims
+user_cache = TTLCache(
+    maxsize=settings.USER_CACHE_MAX_ENTRIES,
+    ttl=settings.USER_CACHE_TTL_SECONDS
+)
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+ACCESS_TOKEN_TYPE = "access"
+REFRESH_TOKEN_TYPE = "refresh"
 
 def hash_password(password: str) -> str:
-    """Hash a password"""
+    """Hash a password (blocking; prefer password_hasher.hash in async code)"""
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify password against hash"""
+    """Verify password against hash (blocking; prefer password_hasher.verify in async code)"""
     return pwd_context.verify(plain_password, hashed_password)
 
+def normalize_role(role) -> str:
+    """Normalize role to avoid issues from capitalization/whitespace"""
+    if isinstance(role, str) and role.strip():
+        return role.strip().lower()
+    return 'buyer'
+
+# ============ TOKENS ============
+
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
-        expire = datetime.now(timezone.utc) + timedelta(days=settings.JWT_EXPIRATION_DAYS)
-    
-    to_encode.update({"exp": expire})
+        expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+
+    to_encode.update({"exp": expire, "type": ACCESS_TOKEN_TYPE})
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
     return encoded_jwt
 
+def create_refresh_token(user_id: str) -> str:
+    """Create JWT refresh token (user id only, no claims)"""
+    expire = datetime.now(timezone.utc) + timedelta(days=settings.JWT_EXPIRATION_DAYS)
+    to_encode = {"user_id": user_id, "exp": expire, "type": REFRESH_TOKEN_TYPE}
+    return jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+
+def user_claims(user: Union[User, dict]) -> dict:
+    """Claims embedded in access tokens"""
+    if isinstance(user, User):
+        user = user.model_dump()
+    return {
+        "user_id": user['id'],
+        "email": user['email'],
+        "name": user.get('name', ''),
+        "role": normalize_role(user.get('role'))
+    }
+
+def create_token_pair(user: Union[User, dict]) -> dict:
+    """Access + refresh tokens for a user, as returned by the auth routes"""
+    claims = user_claims(user)
+    return {
+        "token": create_access_token(claims),
+        "refresh_token": create_refresh_token(claims["user_id"]),
+        "token_type": "bearer",
+        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }
+
 def decode_token(token: str) -> dict:
     """Decode JWT token"""
     try:
@@ -43,46 +93,100 @@ def decode_token(token: str) -> dict:
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-async def get_current_user(authorization: str = Header(None)) -> User:
-    """
-    Get current authenticated user from JWT token
-    
-    Usage:
-        current_user: User = Depends(get_current_user)
-    """
+def decode_refresh_token(token: str) -> dict:
+    """Decode a refresh token, rejecting access tokens"""
+    payload = decode_token(token)
+    if payload.get("type") != REFRESH_TOKEN_TYPE or not payload.get("user_id"):
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    return payload
+
+def _access_payload(authorization: Optional[str]) -> dict:
+    """Validate the Authorization header and return the access token payload"""
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Not authenticated")
-    
+
     token = authorization.split(" ")[1]
     payload = decode_token(token)
-    
-    user_id = payload.get("user_id")
-    if not user_id:
+
+    if payload.get("type") == REFRESH_TOKEN_TYPE:
+        raise HTTPException(status_code=401, detail="Refresh token cannot be used for API access")
+
+    if not payload.get("user_id"):
         raise HTTPException(status_code=401, detail="Invalid token payload")
-    
+
+    return payload
+
+# ============ USER LOADING ============
+
+async def load_user(user_id: str, use_cache: bool = True) -> Optional[User]:
+    """Load a full user (without password), through the TTL user cache"""
+    if use_cache:
+        cached = user_cache.get(user_id)
+        if cached is not None:
+            return cached
+
     db = get_db()
     user_doc = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
-    
     if not user_doc:
-        raise HTTPException(status_code=404, detail="User not found")
-    
+        return None
+
     # Convert timestamp to created_at if needed
     if isinstance(user_doc.get('timestamp'), str):
         user_doc['created_at'] = datetime.fromisoformat(user_doc.pop('timestamp'))
+    user_doc['role'] = normalize_role(user_doc.get('role'))
 
-    # Normalize role to avoid issues from capitalization/whitespace
-    role = user_doc.get('role', 'buyer')
-    if isinstance(role, str):
-        user_doc['role'] = role.strip().lower()
-    else:
-        user_doc['role'] = 'buyer'
-    
-    return User(**user_doc)
+    user = User(**user_doc)
+    user_cache.set(user_id, user)
+    return user
+
+def invalidate_user_cache(user_id: str):
+    """Drop a cached user (call after any write to the users collection)"""
+    user_cache.delete(user_id)
+
+async def get_current_user(authorization: str = Header(None)) -> User:
+    """
+    Get current authenticated user from JWT token
+
+    Built from the token claims without touching the database. Tokens issued
+    before claims were added fall back to the cached user lookup. Only id,
+    email, name and role are populated; use get_full_user for the rest.
+
+    Usage:
+        current_user: User = Depends(get_current_user)
+    """
+    payload = _access_payload(authorization)
+
+    if payload.get("email") and payload.get("name") and payload.get("role"):
+        return User(
+            id=payload["user_id"],
+            email=payload["email"],
+            name=payload["name"],
+            role=normalize_role(payload["role"])
+        )
+
+    user = await load_user(payload["user_id"])
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+async def get_full_user(authorization: str = Header(None)) -> User:
+    """
+    Get the complete user record for the authenticated user
+
+    Usage:
+        current_user: User = Depends(get_full_user)
+    """
+    payload = _access_payload(authorization)
+
+    user = await load_user(payload["user_id"])
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
 
 def require_role(allowed_roles: list):
     """
     Decorator to require specific user roles
-    
+
     Usage:
         @require_role(["seller"])
         async def seller_only_route(current_user: User = Depends(get_current_user)):
@@ -95,4 +199,4 @@ def require_role(allowed_roles: list):
                 detail=f"Access denied. Required roles: {', '.join(allowed_roles)}"
             )
         return current_user
-    return role_checker
\ No newline at end of file
+    return role_checker
@@ -0,0 +1,187 @@
+# backend/utils/cache.py
+"""
+Caching utilities
+- TTLCache: bounded in-process LRU cache with per-entry expiry
+- AsyncCache: JSON cache on Redis when connected, TTLCache otherwise
+"""
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import json
+import time
+import logging
+
+from database import get_redis
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+# ============ IN-PROCESS LRU CACHE ============
+
+class TTLCache:
+    """LRU cache bounded by entry count, entries expire after ttl seconds"""
+
+    def __init__(self, maxsize: int = 1024, ttl: int = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # Maps key to (value, expiry on the monotonic clock)
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING or entry[1] <= time.monotonic():
+            if entry is not _MISSING:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        self._data[key] = (value, time.monotonic() + (ttl or self.ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str) -> bool:
+        return self._data.pop(key, _MISSING) is not _MISSING
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+# ============ REDIS / IN-PROCESS CACHE ============
+
+class AsyncCache:
+    """
+    Namespaced JSON cache shared through Redis when it is connected
+
+    Falls back to a per-process TTLCache, in which case invalidation only
+    reaches the current worker and other workers see stale data for at most
+    one TTL. Cache errors are logged and treated as misses.
+    """
+
+    def __init__(self, namespace: str, ttl: int = 300, maxsize: int = 1024):
+        self.namespace = namespace
+        self.ttl = ttl
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Counters are kept outside the LRU so eviction can never reset them
+        self._counters: Dict[str, int] = {}
+        # Lookups through this cache, whichever backend served them
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Any:
+        values = await self.get_many([key])
+        return values[0]
+
+    async def get_many(self, keys: List[str]) -> List[Any]:
+        """Values for keys (None for misses), in one round-trip on Redis"""
+        if not keys:
+            return []
+
+        client = get_redis()
+        if client is None:
+            values = [self._memory.get(self._key(k)) for k in keys]
+        else:
+            try:
+                raw = await client.mget([self._key(k) for k in keys])
+                values = [json.loads(v) if v is not None else None for v in raw]
+            except Exception as e:
+                logger.warning(f"⚠️ Cache read failed ({self.namespace}): {e}")
+                values = [None] * len(keys)
+
+        found = sum(1 for v in values if v is not None)
+        self.hits += found
+        self.misses += len(values) - found
+        return values
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        await self.set_many({key: value}, ttl=ttl)
+
+    async def set_many(self, items: Dict[str, Any], ttl: Optional[int] = None):
+        if not items:
+            return
+
+        ttl = ttl or self.ttl
+        client = get_redis()
+        if client is None:
+            for k, v in items.items():
+                self._memory.set(self._key(k), v, ttl=ttl)
+            return
+
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                for k, v in items.items():
+                    pipe.set(self._key(k), json.dumps(v), ex=ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Cache write failed ({self.namespace}): {e}")
+
+    async def delete(self, key: str):
+        client = get_redis()
+        if client is None:
+            self._memory.delete(self._key(key))
+            return
+
+        try:
+            await client.delete(self._key(key))
+        except Exception as e:
+            logger.warning(f"⚠️ Cache delete failed ({self.namespace}): {e}")
+
+    async def get_counter(self, key: str) -> int:
+        client = get_redis()
+        if client is None:
+            return self._counters.get(key, 0)
+
+        try:
+            value = await client.get(self._key(key))
+            return int(value) if value is not None else 0
+        except Exception as e:
+            logger.warning(f"⚠️ Cache counter read failed ({self.namespace}): {e}")
+            return 0
+
+    async def incr(self, key: str) -> int:
+        """Increment a persistent counter (used for generation-based invalidation)"""
+        client = get_redis()
+        if client is None:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+        try:
+            return await client.incr(self._key(key))
+        except Exception as e:
+            logger.warning(f"⚠️ Cache counter increment failed ({self.namespace}): {e}")
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "backend": "memory" if get_redis() is None else "redis",
+            "size": len(self._memory),
+            "maxsize": self._memory.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0
+        }
@@ -0,0 +1,382 @@
+# backend/utils/change_streams.py
+"""
+Change-stream driven materialized views
+
+Services register projectors: a projector maps one source document to its
+contribution to a view ({view key: {field: number}}). The materializer tails
+the source collections and keeps every view equal to the sum of the
+contributions of the current documents.
+
+- Each document's last contribution is stored in mv_contributions; a change
+  applies only the difference (as $inc), so replaying an event is harmless
+- One change stream on the database (filtered to the registered sources);
+  its resume token is saved in materializer_state, so a restart continues
+  where the last run stopped
+- Views are rebuilt from scratch on first start, when the resume token is
+  no longer in the oplog, and every MATERIALIZER_RESYNC_SECONDS
+- Standalone MongoDB has no change streams: the materializer then polls for
+  new documents by _id and relies on the periodic rebuild for updates and
+  deletes
+- Only one worker tails at a time (a lease in materializer_state); the
+  active mode is recorded there too, so any worker can tell whether the
+  views are live (is_live)
+"""
+from datetime import datetime, timezone, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import os
+import socket
+import time
+import uuid
+import logging
+
+from pymongo import UpdateOne, ReplaceOne, DeleteOne
+from pymongo.errors import DuplicateKeyError, OperationFailure, PyMongoError
+
+from config import settings
+from database import get_db
+
+logger = logging.getLogger(__name__)
+
+# Contribution of one document: {view key: {field: number}}
+Contribution = Dict[str, Dict[str, float]]
+Projector = Callable[[Dict[str, Any]], Contribution]
+
+STATE = "materializer_state"
+CONTRIBUTIONS = "mv_contributions"
+
+# Server error codes
+NOT_REPLICA_SET = 40573
+HISTORY_LOST = (136, 280, 286)
+
+LIVE_CHECK_SECONDS = 5
+
+
+class View:
+    """A materialized view and its projector per source collection"""
+
+    def __init__(self, name: str, key_field: str):
+        self.name = name
+        self.key_field = key_field
+        self.projectors: Dict[str, Projector] = {}
+
+
+def _diff(old: Contribution, new: Contribution) -> Contribution:
+    delta: Contribution = {}
+    for key in set(old) | set(new):
+        before, after = old.get(key, {}), new.get(key, {})
+        fields = {f: after.get(f, 0) - before.get(f, 0) for f in set(before) | set(after)}
+        fields = {f: v for f, v in fields.items() if v}
+        if fields:
+            delta[key] = fields
+    return delta
+
+
+def _parts(contribution: Contribution) -> List[Dict[str, Any]]:
+    # Stored as a list: view keys are ids and may not be safe as field names
+    return [{"k": key, "v": fields} for key, fields in contribution.items() if key]
+
+
+class Materializer:
+    """Tails the registered source collections and maintains the views"""
+
+    def __init__(self):
+        self.node_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._views: Dict[str, View] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._leader = False
+        self._polling = settings.MATERIALIZER_MODE == "poll"
+        self.mode: Optional[str] = None
+        self._stats = {
+            "events": 0,
+            "documents": 0,
+            "rebuilds": 0,
+            "errors": 0,
+        }
+        self._last_event_at: Optional[float] = None
+        # (checked at, live) from the last is_live() lookup
+        self._live_checked: Optional[Tuple[float, bool]] = None
+
+    # ============ REGISTRATION ============
+
+    def register(self, view: str, source: str, projector: Projector, key_field: str = "id"):
+        """Add a projector from `source` documents into `view` (a collection of the same name)"""
+        entry = self._views.setdefault(view, View(view, key_field))
+        entry.projectors[source] = projector
+
+    def sources(self) -> List[str]:
+        return sorted({source for view in self._views.values() for source in view.projectors})
+
+    # ============ LIFECYCLE ============
+
+    async def start(self):
+        """Try to become the tailing worker; others retry from heartbeat()"""
+        if not settings.MATERIALIZER_ENABLED or not self._views:
+            return
+        if await self._acquire_lease() and not self._task:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"✅ Materializer started on {self.node_id} ({', '.join(self.sources())})")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._leader:
+            try:
+                await get_db()[STATE].delete_one({"_id": "lease", "owner": self.node_id})
+            except PyMongoError:
+                pass
+            self._leader = False
+
+    async def heartbeat(self):
+        """Renew (or try to take over) the lease; stop tailing if it was lost"""
+        if not settings.MATERIALIZER_ENABLED or not self._views:
+            return
+        if await self._acquire_lease():
+            if not self._task or self._task.done():
+                self._task = asyncio.create_task(self._run())
+                logger.info(f"✅ Materializer took over on {self.node_id}")
+        elif self._task:
+            logger.warning("⚠️ Materializer lease lost, stopping")
+            self._task.cancel()
+            self._task = None
+
+    async def _acquire_lease(self) -> bool:
+        db = get_db()
+        now = datetime.now(timezone.utc)
+        try:
+            await db[STATE].update_one(
+                {"_id": "lease", "$or": [{"owner": self.node_id}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.node_id, "expires_at": now + timedelta(seconds=settings.MATERIALIZER_LEASE_SECONDS)}},
+                upsert=True
+            )
+            self._leader = True
+        except DuplicateKeyError:
+            # Held by another worker
+            self._leader = False
+        return self._leader
+
+    # ============ TAILING ============
+
+    async def _run(self):
+        while True:
+            try:
+                if self._polling:
+                    await self._poll()
+                else:
+                    await self._tail()
+                return
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code == NOT_REPLICA_SET and settings.MATERIALIZER_MODE != "stream":
+                    logger.info("ℹ️ Change streams unavailable (standalone MongoDB), polling instead")
+                    self._polling = True
+                    continue
+                if e.code in HISTORY_LOST:
+                    logger.warning("⚠️ Resume token no longer in the oplog, rebuilding views")
+                    await self._save_state({"token": None})
+                    continue
+                self._stats["errors"] += 1
+                logger.error(f"❌ Materializer failed: {e}")
+            except PyMongoError as e:
+                self._stats["errors"] += 1
+                logger.error(f"❌ Materializer failed: {e}")
+            await asyncio.sleep(5)
+
+    async def _tail(self):
+        self.mode = "stream"
+        db = get_db()
+        state = await self._load_state()
+        await self._save_state({"mode": self.mode})
+        token = state.get("token")
+        pipeline = [{"$match": {"ns.coll": {"$in": self.sources()}}}]
+
+        async with db.watch(pipeline, full_document="updateLookup", resume_after=token, max_await_time_ms=1000) as stream:
+            if token is None:
+                # Events from here on are applied on top of the rebuild (idempotent)
+                await self.rebuild()
+            last_rebuild = last_checkpoint = time.monotonic()
+            while stream.alive:
+                change = await stream.try_next()
+                if change is not None:
+                    await self._apply_change(change)
+
+                now = time.monotonic()
+                if now - last_checkpoint >= settings.MATERIALIZER_CHECKPOINT_SECONDS and stream.resume_token:
+                    await self._save_state({"token": stream.resume_token})
+                    last_checkpoint = now
+                if now - last_rebuild >= settings.MATERIALIZER_RESYNC_SECONDS:
+                    await self.rebuild()
+                    last_rebuild = now
+
+    async def _apply_change(self, change: Dict[str, Any]):
+        self._stats["events"] += 1
+        self._last_event_at = time.time()
+        source = change.get("ns", {}).get("coll")
+        doc_id = (change.get("documentKey") or {}).get("_id")
+        if source is None or doc_id is None:
+            return
+        operation = change.get("operationType")
+        if operation == "delete":
+            await self._apply_document(source, doc_id, None)
+        elif operation in ("insert", "update", "replace"):
+            # fullDocument is None when the document was deleted before the lookup
+            await self._apply_document(source, doc_id, change.get("fullDocument"))
+
+    async def _poll(self):
+        self.mode = "poll"
+        db = get_db()
+        state = await self._load_state()
+        await self._save_state({"mode": self.mode})
+        last_ids: Dict[str, Any] = state.get("last_ids") or {}
+        if not state.get("polled"):
+            await self.rebuild()
+            for source in self.sources():
+                newest = await db[source].find_one({}, {"_id": 1}, sort=[("_id", -1)])
+                last_ids[source] = newest["_id"] if newest else None
+            await self._save_state({"polled": True, "last_ids": last_ids})
+
+        last_rebuild = time.monotonic()
+        while True:
+            for source in self.sources():
+                query = {"_id": {"$gt": last_ids[source]}} if last_ids.get(source) is not None else {}
+                docs = await db[source].find(query).sort("_id", 1).limit(500).to_list(500)
+                for doc in docs:
+                    self._stats["events"] += 1
+                    await self._apply_document(source, doc["_id"], doc)
+                    last_ids[source] = doc["_id"]
+                if docs:
+                    self._last_event_at = time.time()
+                    await self._save_state({"last_ids": last_ids})
+
+            if time.monotonic() - last_rebuild >= settings.MATERIALIZER_RESYNC_SECONDS:
+                await self.rebuild()
+                last_rebuild = time.monotonic()
+            await asyncio.sleep(settings.MATERIALIZER_POLL_SECONDS)
+
+    # ============ APPLYING ============
+
+    async def _apply_document(self, source: str, doc_id: Any, doc: Optional[Dict[str, Any]]):
+        """Bring every view fed by `source` in line with the document's current state"""
+        db = get_db()
+        self._stats["documents"] += 1
+        for view in self._views.values():
+            projector = view.projectors.get(source)
+            if not projector:
+                continue
+            new = projector(doc) if doc else {}
+            contribution_id = f"{view.name}|{source}|{doc_id}"
+            stored = await db[CONTRIBUTIONS].find_one({"_id": contribution_id})
+            old = {p["k"]: p["v"] for p in stored["parts"]} if stored else {}
+
+            delta = _diff(old, new)
+            if delta:
+                await db[view.name].bulk_write([
+                    UpdateOne({view.key_field: key}, {"$inc": fields}, upsert=True)
+                    for key, fields in delta.items()
+                ], ordered=False)
+            if new:
+                await db[CONTRIBUTIONS].replace_one(
+                    {"_id": contribution_id},
+                    {"view": view.name, "parts": _parts(new)},
+                    upsert=True
+                )
+            elif stored:
+                await db[CONTRIBUTIONS].delete_one({"_id": contribution_id})
+
+    async def rebuild(self, batch_size: int = 1000):
+        """Recompute every view (and the stored contributions) from the source collections"""
+        db = get_db()
+        for view in self._views.values():
+            # Only the per-key totals are held in memory; contributions are written as they are read
+            totals: Contribution = {}
+            await db[CONTRIBUTIONS].delete_many({"view": view.name})
+            for source, projector in view.projectors.items():
+                contributions: List[Any] = []
+                async for doc in db[source].find({}):
+                    contribution = projector(doc)
+                    if not contribution:
+                        continue
+                    for key, fields in contribution.items():
+                        row = totals.setdefault(key, {})
+                        for field, value in fields.items():
+                            row[field] = row.get(field, 0) + value
+                    # Upsert: a document moved during the scan can be returned twice
+                    contributions.append(ReplaceOne(
+                        {"_id": f"{view.name}|{source}|{doc['_id']}"},
+                        {"view": view.name, "parts": _parts(contribution)},
+                        upsert=True
+                    ))
+                    if len(contributions) >= batch_size:
+                        await db[CONTRIBUTIONS].bulk_write(contributions, ordered=False)
+                        contributions = []
+                if contributions:
+                    await db[CONTRIBUTIONS].bulk_write(contributions, ordered=False)
+
+            # Reset keys that no longer have any contribution, overwrite the rest
+            existing = await db[view.name].distinct(view.key_field)
+            ops: List[Any] = [DeleteOne({view.key_field: key}) for key in existing if key not in totals]
+            ops += [
+                ReplaceOne({view.key_field: key}, {view.key_field: key, **fields}, upsert=True)
+                for key, fields in totals.items() if key
+            ]
+            for start in range(0, len(ops), batch_size):
+                await db[view.name].bulk_write(ops[start:start + batch_size], ordered=False)
+            logger.info(f"✅ Rebuilt view {view.name}: {len(totals)} rows")
+        self._stats["rebuilds"] += 1
+
+    # ============ STATE ============
+
+    async def _load_state(self) -> Dict[str, Any]:
+        return await get_db()[STATE].find_one({"_id": "cursor"}) or {}
+
+    async def _save_state(self, fields: Dict[str, Any]):
+        await get_db()[STATE].update_one(
+            {"_id": "cursor"},
+            {"$set": {**fields, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+    async def is_live(self) -> bool:
+        """
+        True while some worker holds the lease and tails a change stream
+
+        Polling only sees inserts, so views are not kept current then.
+        Cached for a few seconds.
+        """
+        if not settings.MATERIALIZER_ENABLED:
+            return False
+        now = time.monotonic()
+        if self._live_checked and now - self._live_checked[0] < LIVE_CHECK_SECONDS:
+            return self._live_checked[1]
+
+        docs = await get_db()[STATE].find({"_id": {"$in": ["lease", "cursor"]}}).to_list(2)
+        by_id = {doc["_id"]: doc for doc in docs}
+        expires_at = (by_id.get("lease") or {}).get("expires_at")
+        if expires_at is not None and expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        live = (
+            (by_id.get("cursor") or {}).get("mode") == "stream"
+            and expires_at is not None
+            and expires_at > datetime.now(timezone.utc)
+        )
+        self._live_checked = (now, live)
+        return live
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "leader": self._leader,
+            "mode": self.mode,
+            "views": sorted(self._views),
+            "last_event_age_seconds": round(time.time() - self._last_event_at, 1) if self._last_event_at else None,
+        }
+
+
+# Global materializer instance
+materializer = Materializer()
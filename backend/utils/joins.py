@@ -0,0 +1,90 @@
+# backend/utils/joins.py
+"""
+Batch joins for result pages
+
+Collects the foreign keys referenced by a page of documents and fetches
+each referenced collection once with $in (all collections concurrently),
+instead of one find_one per document. Results come back as dicts keyed by
+the foreign value (as a string) so routes can stitch them in memory:
+
+    users, profiles = await batch_join(
+        proposals,
+        Join(db.users, "freelancer_id", projection={"_id": 0, "password": 0}),
+        Join(db.freelancer_profiles, "freelancer_id", foreign_field="user_id"),
+    )
+    user = users.get(proposal["freelancer_id"])
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import asyncio
+
+
+class Join:
+    """
+    One collection to join against
+
+    Args:
+        collection: Motor collection to fetch from
+        local_field: field on the page documents holding the reference
+        foreign_field: field on the joined collection it refers to
+        projection: projection for the joined documents (defaults to {"_id": 0});
+            it must keep foreign_field
+        convert: maps a local value to the stored foreign value (e.g. str ->
+            ObjectId); return None to skip values that cannot match
+    """
+
+    def __init__(
+        self,
+        collection,
+        local_field: str,
+        foreign_field: str = "id",
+        projection: Optional[Dict[str, Any]] = None,
+        convert: Optional[Callable[[Any], Any]] = None
+    ):
+        self.collection = collection
+        self.local_field = local_field
+        self.foreign_field = foreign_field
+        self.projection = projection if projection is not None else {"_id": 0}
+        self.convert = convert
+
+
+def collect_keys(docs: Iterable[Dict[str, Any]], field: str) -> List[Any]:
+    """Distinct non-empty values of field across docs, in first-seen order"""
+    keys: Dict[Any, None] = {}
+    for doc in docs:
+        value = doc.get(field)
+        if value is not None and value != "":
+            keys.setdefault(value, None)
+    return list(keys)
+
+
+async def fetch_map(join: Join, keys: List[Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch the documents referenced by keys in one query
+
+    Returns:
+        {str(foreign value): document} - the first match wins
+    """
+    values = keys
+    if join.convert is not None:
+        values = [v for v in (join.convert(k) for k in keys) if v is not None]
+    if not values:
+        return {}
+
+    docs = await join.collection.find(
+        {join.foreign_field: {"$in": values}},
+        join.projection
+    ).to_list(None)
+
+    result: Dict[str, Dict[str, Any]] = {}
+    for doc in docs:
+        key = doc.get(join.foreign_field)
+        if key is not None:
+            result.setdefault(str(key), doc)
+    return result
+
+
+async def batch_join(docs: List[Dict[str, Any]], *joins: Join) -> List[Dict[str, Dict[str, Any]]]:
+    """Run every join for a page of documents concurrently, one query per join"""
+    return list(await asyncio.gather(*(
+        fetch_map(join, collect_keys(docs, join.local_field)) for join in joins
+    )))
@@ -0,0 +1,93 @@
+# backend/utils/pagination.py
+"""
+Keyset (cursor) pagination helpers
+
+Pages are ordered by (sort_field, id) and the cursor encodes the last row's
+values, so fetching page N is a single index range scan - no skip().
+Cursors are opaque to clients: URL-safe base64 of a small JSON array.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import base64
+import json
+
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_value: Any, doc_id: str) -> str:
+    """Opaque cursor for the row (sort_value, doc_id)"""
+    raw = json.dumps([sort_value, doc_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    """Inverse of encode_cursor; raises 400 on tampered or malformed cursors"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, doc_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(doc_id, str):
+            raise ValueError("cursor id must be a string")
+        return sort_value, doc_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def cursor_query(
+    query: Dict[str, Any],
+    cursor: Optional[str],
+    sort_field: str = "timestamp",
+    direction: int = -1
+) -> Dict[str, Any]:
+    """Restrict query to rows strictly after the cursor in (sort_field, id) order"""
+    if not cursor:
+        return query
+
+    sort_value, doc_id = decode_cursor(cursor)
+    op = "$lt" if direction < 0 else "$gt"
+    after = {"$or": [
+        {sort_field: {op: sort_value}},
+        {sort_field: sort_value, "id": {op: doc_id}}
+    ]}
+    return {"$and": [query, after]} if query else after
+
+
+def sort_spec(sort_field: str = "timestamp", direction: int = -1) -> List[Tuple[str, int]]:
+    """Sort matching cursor_query; id breaks ties so the order is total"""
+    return [(sort_field, direction), ("id", direction)]
+
+
+async def paginate(
+    collection,
+    query: Dict[str, Any],
+    projection: Optional[Dict[str, Any]] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    sort_field: str = "timestamp",
+    direction: int = -1
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Fetch one page of documents
+
+    Back this with a compound index on (<filter fields>, sort_field, id).
+
+    Returns:
+        (documents, next_cursor) - next_cursor is None on the last page
+    """
+    docs = await collection.find(
+        cursor_query(query, cursor, sort_field, direction),
+        projection if projection is not None else {"_id": 0}
+    ).sort(sort_spec(sort_field, direction)).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last.get("id"))
+    return docs, next_cursor
+
+
+def set_next_cursor_header(response: Response, next_cursor: Optional[str]):
+    """For endpoints that return a bare list, expose the cursor as a header"""
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
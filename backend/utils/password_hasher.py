@@ -0,0 +1,139 @@
+# backend/utils/password_hasher.py
+"""
+Password hashing off the event loop
+- bcrypt runs in a dedicated thread pool (bcrypt releases the GIL)
+- A semaphore caps concurrent hashes; a queue limit sheds load under storms
+- Work factor comes from BCRYPT_ROUNDS; older hashes are upgraded on login
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import time
+import logging
+
+from passlib.context import CryptContext
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when too many hash operations are already waiting"""
+
+
+class PasswordHasher:
+    """Runs passlib bcrypt operations in a bounded worker pool"""
+
+    def __init__(self, rounds: int, workers: int, max_queue: int):
+        self.context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__rounds=rounds
+        )
+        self.rounds = rounds
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        # Metrics
+        self.in_flight = 0
+        self.queued = 0
+        self.peak_queue_depth = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self._total_wait = 0.0
+        self._total_run = 0.0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        return self._semaphore
+
+    async def _run(self, func, *args):
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise PasswordHasherBusy("Password hashing queue is full")
+
+        semaphore = self._get_semaphore()
+        self.queued += 1
+        self.peak_queue_depth = max(self.peak_queue_depth, self.queued)
+        enqueued_at = time.perf_counter()
+        try:
+            await semaphore.acquire()
+        finally:
+            # Leaves the queue whether a worker slot was granted or the wait was cancelled
+            self.queued -= 1
+
+        started_at = time.perf_counter()
+        self._total_wait += started_at - enqueued_at
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._total_run += time.perf_counter() - started_at
+            semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        """Hash a password with the configured work factor"""
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        """Verify a password against a stored hash"""
+        if not hashed:
+            return False
+        try:
+            return await self._run(self.context.verify, password, hashed)
+        except ValueError:
+            # Malformed or unknown hash format
+            return False
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a password and, if the stored hash uses an outdated work
+        factor, return a replacement hash computed in the same worker call
+
+        Returns:
+            (valid, new_hash or None)
+        """
+        if not hashed:
+            return False, None
+        try:
+            valid, new_hash = await self._run(self.context.verify_and_update, password, hashed)
+        except ValueError:
+            return False, None
+        if valid and new_hash:
+            self.rehashed += 1
+        return valid, new_hash
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "rounds": self.rounds,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queued,
+            "peak_queue_depth": self.peak_queue_depth,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "avg_wait_ms": round(self._total_wait / self.completed * 1000, 2) if self.completed else 0.0,
+            "avg_run_ms": round(self._total_run / self.completed * 1000, 2) if self.completed else 0.0
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+# Global password hasher instance
+password_hasher = PasswordHasher(
+    rounds=settings.BCRYPT_ROUNDS,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE
+)
@@ -0,0 +1,76 @@
+# backend/utils/scheduler.py
+"""
+Background job scheduler (APScheduler on the app's event loop)
+
+Jobs are registered at startup with scheduler.add_job(...) and run as
+coroutines alongside request handling. Overlapping runs of the same job are
+skipped rather than queued.
+
+single_worker jobs run on one worker per interval: each run first claims
+the job in the job_locks collection, and the claim only frees up once the
+interval has passed.
+"""
+from datetime import datetime, timezone, timedelta
+import functools
+import logging
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from pymongo.errors import DuplicateKeyError
+
+from database import get_db
+
+logger = logging.getLogger(__name__)
+
+scheduler = AsyncIOScheduler(
+    timezone="UTC",
+    job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": 30}
+)
+
+
+async def _claim(job_id: str, seconds: int) -> bool:
+    """Claim this interval's run of a job; False when another worker has it"""
+    now = datetime.now(timezone.utc)
+    # Slightly shorter than the interval, so the next run can always claim it
+    expires_at = now + timedelta(seconds=seconds * 0.9)
+    try:
+        await get_db().job_locks.update_one(
+            {"_id": job_id, "expires_at": {"$lt": now}},
+            {"$set": {"expires_at": expires_at, "claimed_at": now}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+
+def _single_worker(func, job_id: str, seconds: int):
+    @functools.wraps(func)
+    async def run(*args, **kwargs):
+        try:
+            if not await _claim(job_id, seconds):
+                return None
+        except Exception as e:
+            logger.warning(f"⚠️ Could not claim job {job_id}: {e}")
+            return None
+        return await func(*args, **kwargs)
+    return run
+
+
+def add_interval_job(func, seconds: int, job_id: str, single_worker: bool = False, **kwargs):
+    """Run func every `seconds` (replacing any job with the same id)"""
+    if single_worker:
+        func = _single_worker(func, job_id, seconds)
+    scheduler.add_job(func, "interval", seconds=seconds, id=job_id, replace_existing=True, **kwargs)
+    logger.info(f"⏱️ Scheduled job {job_id} every {seconds}s{' (single worker)' if single_worker else ''}")
+
+
+def start_scheduler():
+    if not scheduler.running:
+        scheduler.start()
+        logger.info("✅ Background scheduler started")
+
+
+def shutdown_scheduler():
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+        logger.info("✅ Background scheduler stopped")
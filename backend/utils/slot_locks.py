@@ -0,0 +1,226 @@
+# backend/utils/slot_locks.py
+"""
+Slot lock manager: short-lived, owner-checked locks on booking slots
+- Redis backend: atomic acquire/extend/release via Lua scripts
+- In-process backend: fallback when Redis is not connected (single worker only)
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Tuple
+import time
+import logging
+
+from config import settings
+from database import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+# Acquire is re-entrant: the current owner re-acquiring just refreshes the TTL
+ACQUIRE_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if not current then
+    redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+    return 1
+end
+if current == ARGV[1] then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+EXTEND_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _ttl_seconds(pttl_ms: int) -> int:
+    """Convert a PTTL reply (milliseconds) to whole seconds, rounding up"""
+    if pttl_ms is None or pttl_ms < 0:
+        return 0
+    return (pttl_ms + 999) // 1000
+
+
+# ============ REDIS BACKEND ============
+
+class RedisLockBackend:
+    """Lock backend using redis.asyncio and server-side Lua scripts"""
+
+    name = "redis"
+
+    def __init__(self, client):
+        self.client = client
+        self._acquire = client.register_script(ACQUIRE_SCRIPT)
+        self._extend = client.register_script(EXTEND_SCRIPT)
+        self._release = client.register_script(RELEASE_SCRIPT)
+
+    async def acquire(self, key: str, owner: str, ttl_ms: int) -> bool:
+        return bool(await self._acquire(keys=[key], args=[owner, ttl_ms]))
+
+    async def extend(self, key: str, owner: str, ttl_ms: int) -> bool:
+        return bool(await self._extend(keys=[key], args=[owner, ttl_ms]))
+
+    async def release(self, key: str, owner: str) -> bool:
+        return bool(await self._release(keys=[key], args=[owner]))
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Tuple[str, int]]]:
+        """Owner and remaining TTL for each key, in one round-trip"""
+        if not keys:
+            return []
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.mget(keys)
+            for key in keys:
+                pipe.pttl(key)
+            replies = await pipe.execute()
+
+        owners, ttls = replies[0], replies[1:]
+        return [
+            (owner, _ttl_seconds(ttl)) if owner else None
+            for owner, ttl in zip(owners, ttls)
+        ]
+
+
+# ============ IN-PROCESS BACKEND ============
+
+class InMemoryLockBackend:
+    """
+    Lock backend kept in process memory
+
+    Operations never await between check and set, so they are atomic with
+    respect to other coroutines on the same event loop. Locks are not shared
+    between workers.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        # Maps key to (owner, expiry on the monotonic clock)
+        self._locks: Dict[str, Tuple[str, float]] = {}
+
+    def _current(self, key: str) -> Optional[Tuple[str, float]]:
+        entry = self._locks.get(key)
+        if entry and entry[1] <= time.monotonic():
+            del self._locks[key]
+            return None
+        return entry
+
+    async def acquire(self, key: str, owner: str, ttl_ms: int) -> bool:
+        entry = self._current(key)
+        if entry and entry[0] != owner:
+            return False
+        self._locks[key] = (owner, time.monotonic() + ttl_ms / 1000)
+        return True
+
+    async def extend(self, key: str, owner: str, ttl_ms: int) -> bool:
+        entry = self._current(key)
+        if not entry or entry[0] != owner:
+            return False
+        self._locks[key] = (owner, time.monotonic() + ttl_ms / 1000)
+        return True
+
+    async def release(self, key: str, owner: str) -> bool:
+        entry = self._current(key)
+        if not entry or entry[0] != owner:
+            return False
+        del self._locks[key]
+        return True
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Tuple[str, int]]]:
+        now = time.monotonic()
+        result = []
+        for key in keys:
+            entry = self._current(key)
+            if entry:
+                result.append((entry[0], max(0, int(entry[1] - now + 0.999))))
+            else:
+                result.append(None)
+        return result
+
+
+# ============ LOCK MANAGER ============
+
+class SlotLockManager:
+    """Routes slot lock operations to Redis, or to the in-process fallback"""
+
+    def __init__(self):
+        self._memory_backend = InMemoryLockBackend()
+        self._redis_backend: Optional[RedisLockBackend] = None
+
+    @property
+    def backend(self):
+        """Backend for the current Redis connection state"""
+        client = get_redis()
+        if client is None:
+            return self._memory_backend
+        if self._redis_backend is None or self._redis_backend.client is not client:
+            self._redis_backend = RedisLockBackend(client)
+        return self._redis_backend
+
+    @staticmethod
+    def slot_key(service_id: str, start_time: datetime) -> str:
+        return f"slot_lock:{service_id}:{start_time.isoformat()}"
+
+    async def acquire(self, service_id: str, start_time: datetime, owner: str, ttl: Optional[int] = None) -> bool:
+        """Acquire (or refresh, if already held by owner) a slot lock"""
+        ttl_ms = (ttl or settings.SLOT_LOCK_TTL_SECONDS) * 1000
+        key = self.slot_key(service_id, start_time)
+        try:
+            return await self.backend.acquire(key, owner, ttl_ms)
+        except Exception as e:
+            # Fail closed: an unverifiable lock must not let two users book one slot
+            logger.error(f"❌ Slot lock acquire failed for {key}: {e}")
+            return False
+
+    async def extend(self, service_id: str, start_time: datetime, owner: str, ttl: Optional[int] = None) -> bool:
+        """Extend a lock only if it is still held by owner"""
+        ttl_ms = (ttl or settings.SLOT_LOCK_TTL_SECONDS) * 1000
+        key = self.slot_key(service_id, start_time)
+        try:
+            return await self.backend.extend(key, owner, ttl_ms)
+        except Exception as e:
+            logger.error(f"❌ Slot lock extend failed for {key}: {e}")
+            return False
+
+    async def release(self, service_id: str, start_time: datetime, owner: str) -> bool:
+        """Release a lock only if it is held by owner"""
+        key = self.slot_key(service_id, start_time)
+        try:
+            return await self.backend.release(key, owner)
+        except Exception as e:
+            logger.error(f"❌ Slot lock release failed for {key}: {e}")
+            return False
+
+    async def get_info(self, service_id: str, start_time: datetime) -> Optional[Dict[str, Any]]:
+        """Lock holder and remaining seconds, or None if the slot is free"""
+        infos = await self.get_many_info(service_id, [start_time])
+        return infos.get(start_time)
+
+    async def get_many_info(self, service_id: str, start_times: List[datetime]) -> Dict[datetime, Dict[str, Any]]:
+        """Lock info for many slots of one service (locked slots only)"""
+        keys = [self.slot_key(service_id, t) for t in start_times]
+        try:
+            entries = await self.backend.get_many(keys)
+        except Exception as e:
+            logger.error(f"❌ Slot lock lookup failed for service {service_id}: {e}")
+            return {}
+
+        return {
+            start_time: {"locked": True, "user_id": entry[0], "expires_in": entry[1]}
+            for start_time, entry in zip(start_times, entries)
+            if entry
+        }
+
+
+# Global slot lock manager instance
+slot_lock_manager = SlotLockManager()
@@ -0,0 +1,284 @@
+# backend/utils/websocket_backplane.py
+"""
+WebSocket backplane: routes messages and presence between worker processes
+- Redis backend: pub/sub channel per online user, one broadcast channel and
+  one channel for presence changes; presence as a sorted set refreshed by
+  heartbeats
+- In-process backend: fallback when Redis is not connected (single worker only)
+
+Every worker (node) subscribes to the channels of the users connected to
+it, so a personal message is delivered only to the nodes holding that
+user's sockets. Payloads are published already JSON-encoded and handed to
+the local sockets as-is.
+"""
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Called with (user_id, payload) for personal messages and (None, payload) for broadcasts
+DeliverHandler = Callable[[Optional[str], str], Awaitable[None]]
+# Called with the payload of a batch of presence changes
+PresenceHandler = Callable[[str], Awaitable[None]]
+
+USER_CHANNEL_PREFIX = "ws:user:"
+BROADCAST_CHANNEL = "ws:broadcast"
+PRESENCE_CHANNEL = "ws:presence_changes"
+PRESENCE_KEY = "ws:presence"
+NODES_KEY = "ws:nodes"
+
+
+def _member(node_id: str, user_id: str) -> str:
+    return f"{node_id}|{user_id}"
+
+
+def _user_of(member: str) -> str:
+    return member.split("|", 1)[1]
+
+
+# ============ REDIS BACKEND ============
+
+class RedisBackplane:
+    """Backplane using Redis pub/sub for routing and a sorted set for presence"""
+
+    name = "redis"
+
+    def __init__(self, client, node_id: str, presence_ttl: int):
+        self.client = client
+        self.node_id = node_id
+        self.presence_ttl = presence_ttl
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        self._handler: Optional[DeliverHandler] = None
+        self._presence_handler: Optional[PresenceHandler] = None
+        self.published = 0
+        self.received = 0
+
+    async def start(self, handler: DeliverHandler, presence_handler: PresenceHandler):
+        self._handler = handler
+        self._presence_handler = presence_handler
+        self._pubsub = self.client.pubsub()
+        await self._pubsub.subscribe(BROADCAST_CHANNEL, PRESENCE_CHANNEL)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._pubsub:
+            try:
+                await self._pubsub.unsubscribe()
+                await self._pubsub.aclose()
+            except Exception as e:
+                logger.warning(f"⚠️ Backplane pub/sub close failed: {e}")
+            self._pubsub = None
+        # Drop this node's presence now rather than waiting for it to expire
+        try:
+            members = [m async for m, _ in self.client.zscan_iter(PRESENCE_KEY, match=f"{self.node_id}|*")]
+            async with self.client.pipeline(transaction=False) as pipe:
+                if members:
+                    pipe.zrem(PRESENCE_KEY, *members)
+                pipe.zrem(NODES_KEY, self.node_id)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Backplane presence cleanup failed: {e}")
+
+    async def _listen(self):
+        """Read published messages and hand them to the local sockets"""
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if not message or message.get("type") != "message":
+                    continue
+                self.received += 1
+                channel = message["channel"]
+                if channel == PRESENCE_CHANNEL:
+                    await self._presence_handler(message["data"])
+                    continue
+                user_id = None if channel == BROADCAST_CHANNEL else channel[len(USER_CHANNEL_PREFIX):]
+                await self._handler(user_id, message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Backplane listener error: {e}")
+                await asyncio.sleep(1)
+
+    # ---- routing ----
+
+    async def subscribe_user(self, user_id: str):
+        await self._pubsub.subscribe(f"{USER_CHANNEL_PREFIX}{user_id}")
+
+    async def unsubscribe_user(self, user_id: str):
+        await self._pubsub.unsubscribe(f"{USER_CHANNEL_PREFIX}{user_id}")
+
+    async def publish_user(self, user_id: str, payload: str) -> int:
+        """Publish to one user; returns the number of nodes that received it"""
+        self.published += 1
+        return await self.client.publish(f"{USER_CHANNEL_PREFIX}{user_id}", payload)
+
+    async def publish_broadcast(self, payload: str) -> int:
+        self.published += 1
+        return await self.client.publish(BROADCAST_CHANNEL, payload)
+
+    async def publish_presence(self, payload: str) -> int:
+        self.published += 1
+        return await self.client.publish(PRESENCE_CHANNEL, payload)
+
+    # ---- presence ----
+
+    async def presence_add(self, user_ids: Iterable[str]) -> List[str]:
+        """
+        Mark users online on this node (also the periodic heartbeat)
+
+        Returns:
+            users whose presence expired (a node stopped refreshing it) and
+            was pruned by this call - nobody else announces they left
+        """
+        now = time.time()
+        expires = now + self.presence_ttl
+        mapping = {_member(self.node_id, u): expires for u in user_ids}
+        # MULTI: the expired members read here are exactly the ones removed,
+        # so only one node reports each of them
+        async with self.client.pipeline(transaction=True) as pipe:
+            if mapping:
+                pipe.zadd(PRESENCE_KEY, mapping)
+            pipe.zadd(NODES_KEY, {self.node_id: expires})
+            pipe.zrangebyscore(PRESENCE_KEY, "-inf", now)
+            pipe.zremrangebyscore(PRESENCE_KEY, "-inf", now)
+            pipe.zremrangebyscore(NODES_KEY, "-inf", now)
+            replies = await pipe.execute()
+        expired = replies[-3]
+        return list(dict.fromkeys(_user_of(m) for m in expired))
+
+    async def presence_remove(self, user_id: str):
+        await self.client.zrem(PRESENCE_KEY, _member(self.node_id, user_id))
+
+    async def online_users(self) -> List[str]:
+        members = await self.client.zrangebyscore(PRESENCE_KEY, time.time(), "+inf")
+        return list(dict.fromkeys(_user_of(m) for m in members))
+
+    async def filter_online(self, user_ids: Iterable[str]) -> Set[str]:
+        """The subset of user_ids online on any node (one round-trip per call)"""
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return set()
+        now = time.time()
+        nodes = await self.client.zrangebyscore(NODES_KEY, now, "+inf")
+        if not nodes:
+            return set()
+        members = [_member(node_id, user_id) for user_id in user_ids for node_id in nodes]
+        scores = await self.client.zmscore(PRESENCE_KEY, members)
+        return {
+            _user_of(member)
+            for member, score in zip(members, scores)
+            if score is not None and score > now
+        }
+
+    async def is_online(self, user_id: str) -> bool:
+        return user_id in await self.filter_online([user_id])
+
+    async def node_count(self) -> int:
+        return await self.client.zcount(NODES_KEY, time.time(), "+inf")
+
+
+# ============ IN-PROCESS BACKEND ============
+
+class InMemoryBackplane:
+    """
+    Backplane kept in process memory
+
+    Publishing calls the handler directly, so it only reaches sockets on this
+    worker. Useful for tests and single-worker deployments.
+    """
+
+    name = "memory"
+
+    def __init__(self, node_id: str, presence_ttl: int):
+        self.node_id = node_id
+        self.presence_ttl = presence_ttl
+        self._handler: Optional[DeliverHandler] = None
+        self._presence_handler: Optional[PresenceHandler] = None
+        self._subscribed: Set[str] = set()
+        # Maps (node_id, user_id) to expiry on the wall clock
+        self._presence: Dict[Tuple[str, str], float] = {}
+        self.published = 0
+        self.received = 0
+
+    async def start(self, handler: DeliverHandler, presence_handler: PresenceHandler):
+        self._handler = handler
+        self._presence_handler = presence_handler
+
+    async def stop(self):
+        self._handler = None
+        self._presence_handler = None
+        self._subscribed.clear()
+        self._presence.clear()
+
+    # ---- routing ----
+
+    async def subscribe_user(self, user_id: str):
+        self._subscribed.add(user_id)
+
+    async def unsubscribe_user(self, user_id: str):
+        self._subscribed.discard(user_id)
+
+    async def publish_user(self, user_id: str, payload: str) -> int:
+        self.published += 1
+        if user_id not in self._subscribed or not self._handler:
+            return 0
+        self.received += 1
+        await self._handler(user_id, payload)
+        return 1
+
+    async def publish_broadcast(self, payload: str) -> int:
+        self.published += 1
+        if not self._handler:
+            return 0
+        self.received += 1
+        await self._handler(None, payload)
+        return 1
+
+    async def publish_presence(self, payload: str) -> int:
+        self.published += 1
+        if not self._presence_handler:
+            return 0
+        self.received += 1
+        await self._presence_handler(payload)
+        return 1
+
+    # ---- presence ----
+
+    async def presence_add(self, user_ids: Iterable[str]) -> List[str]:
+        now = time.time()
+        for user_id in user_ids:
+            self._presence[(self.node_id, user_id)] = now + self.presence_ttl
+        expired = [k for k, expires in self._presence.items() if expires <= now]
+        for key in expired:
+            del self._presence[key]
+        return list(dict.fromkeys(user_id for _, user_id in expired))
+
+    async def presence_remove(self, user_id: str):
+        self._presence.pop((self.node_id, user_id), None)
+
+    async def online_users(self) -> List[str]:
+        now = time.time()
+        return list(dict.fromkeys(u for (_, u), expires in self._presence.items() if expires > now))
+
+    async def filter_online(self, user_ids: Iterable[str]) -> Set[str]:
+        now = time.time()
+        return {
+            user_id for user_id in user_ids
+            if self._presence.get((self.node_id, user_id), 0) > now
+        }
+
+    async def is_online(self, user_id: str) -> bool:
+        return user_id in await self.filter_online([user_id])
+
+    async def node_count(self) -> int:
+        return 1
@@ -1,99 +1,421 @@
 # backend/utils/websocket_manager.py
 """
 WebSocket connection manager for real-time chat and notifications
+
+Sockets are held by the worker that accepted them; delivery to users on
+other workers goes through the backplane (Redis pub/sub when connected,
+in-process otherwise). Presence is shared through the backplane and kept
+alive by heartbeats.
+
+Presence is pushed as deltas: joins and leaves are collected for
+WS_PRESENCE_BATCH_MS, published once as a batch, and each worker forwards a
+change only to the sockets that subscribed to that user
+({"type": "presence_subscribe", "users": [...]}).
+
+Every socket has a bounded outbox drained by its own writer task, so a slow
+client never delays delivery to others. Payloads are encoded once and the
+same string is queued for every target. When an outbox is full new
+messages for that socket are dropped; a socket whose oldest queued message
+is older than WS_MAX_SEND_LAG_SECONDS is disconnected.
 """
 from fastapi import WebSocket
-from typing import Dict, List
+from typing import Any, Dict, Iterable, List, Optional, Set
+import asyncio
 import json
+import os
+import socket
+import time
+import uuid
 import logging
 
+from config import settings
+from database import get_redis
+from utils.websocket_backplane import RedisBackplane, InMemoryBackplane
+
 logger = logging.getLogger(__name__)
 
+
+class SlowConsumer(Exception):
+    """A socket fell further behind than WS_MAX_SEND_LAG_SECONDS"""
+
+
+class Outbox:
+    """Bounded send queue of one socket and the task writing it out"""
+
+    def __init__(self, maxsize: int):
+        # Items are (enqueued_at on the monotonic clock, payload)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.task: Optional[asyncio.Task] = None
+        self.dropped = 0
+
+    def lag(self) -> float:
+        """Age of the oldest queued message in seconds"""
+        if self.queue.empty():
+            return 0.0
+        return time.monotonic() - self.queue._queue[0][0]
+
+
 class ConnectionManager:
     """Manages WebSocket connections for real-time communication"""
-    
+
     def __init__(self):
-        # Maps user_id to list of WebSocket connections
+        # Maps user_id to list of WebSocket connections on this worker
         self.active_connections: Dict[str, List[WebSocket]] = {}
-    
+        # Owner and last frame received (monotonic clock) of each socket
+        self._owners: Dict[WebSocket, str] = {}
+        self._last_seen: Dict[WebSocket, float] = {}
+        self._outboxes: Dict[WebSocket, Outbox] = {}
+        # Send path counters
+        self.messages_queued = 0
+        self.messages_sent = 0
+        self.messages_dropped = 0
+        self.slow_disconnects = 0
+        self.send_errors = 0
+        # Presence subscriptions: watched user -> sockets, and socket -> watched users
+        self._watchers: Dict[str, Set[WebSocket]] = {}
+        self._watching: Dict[WebSocket, Set[str]] = {}
+        # Presence changes waiting for the next batch (user_id -> online)
+        self._pending_presence: Dict[str, bool] = {}
+        self._presence_flush: Optional[asyncio.Task] = None
+        self.node_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.backplane = InMemoryBackplane(self.node_id, settings.WS_PRESENCE_TTL_SECONDS)
+        self._started = False
+
+    # ============ LIFECYCLE ============
+
+    async def start(self):
+        """Pick the backplane (Redis when available) and start listening"""
+        if self._started:
+            return
+
+        redis = get_redis()
+        mode = settings.WS_BACKPLANE
+        if mode == "redis" or (mode == "auto" and redis is not None):
+            if redis is None:
+                logger.warning("⚠️ WS_BACKPLANE=redis but Redis is not connected; using in-process backplane")
+            else:
+                self.backplane = RedisBackplane(redis, self.node_id, settings.WS_PRESENCE_TTL_SECONDS)
+
+        await self.backplane.start(self._deliver_local, self._deliver_presence)
+        self._started = True
+        logger.info(f"✅ WebSocket backplane: {self.backplane.name} (node {self.node_id})")
+
+    async def stop(self):
+        """Close local sockets and leave the backplane"""
+        for outbox in self._outboxes.values():
+            if outbox.task:
+                outbox.task.cancel()
+        self._outboxes.clear()
+        for user_id, connections in list(self.active_connections.items()):
+            for connection in list(connections):
+                try:
+                    await connection.close(code=1001)
+                except Exception:
+                    pass
+        self.active_connections.clear()
+        self._owners.clear()
+        self._last_seen.clear()
+        self._watchers.clear()
+        self._watching.clear()
+        self._pending_presence.clear()
+        if self._presence_flush:
+            self._presence_flush.cancel()
+            self._presence_flush = None
+        if self._started:
+            await self.backplane.stop()
+            self._started = False
+
+    async def heartbeat(self):
+        """Refresh this worker's presence and drop sockets that went silent"""
+        if not self._started:
+            return
+
+        cutoff = time.monotonic() - settings.WS_CLIENT_TIMEOUT_SECONDS
+        stale = [
+            (user_id, connection)
+            for user_id, connections in list(self.active_connections.items())
+            for connection in connections
+            if self._last_seen.get(connection, 0) < cutoff
+        ]
+        for user_id, connection in stale:
+            logger.info(f"⏱️ Closing idle WebSocket for {user_id}")
+            try:
+                await connection.close(code=1001)
+            except Exception:
+                pass
+            await self.disconnect(connection, user_id)
+
+        try:
+            expired = await self.backplane.presence_add(list(self.active_connections.keys()))
+        except Exception as e:
+            logger.warning(f"⚠️ Presence heartbeat failed: {e}")
+            return
+
+        # Users of a worker that stopped heartbeating: announce they left
+        # (flush_presence skips any still connected elsewhere)
+        for user_id in expired:
+            if user_id not in self.active_connections:
+                self._queue_presence(user_id, False)
+
+    # ============ CONNECTIONS ============
+
     async def connect(self, websocket: WebSocket, user_id: str):
         """Accept and store a new WebSocket connection"""
+        await self.start()
         await websocket.accept()
-        
-        if user_id not in self.active_connections:
+
+        first = user_id not in self.active_connections
+        if first:
             self.active_connections[user_id] = []
-        
+
         self.active_connections[user_id].append(websocket)
+        self._owners[websocket] = user_id
+        self._last_seen[websocket] = time.monotonic()
+        outbox = Outbox(settings.WS_SEND_QUEUE_SIZE)
+        outbox.task = asyncio.create_task(self._writer(websocket, user_id, outbox))
+        self._outboxes[websocket] = outbox
         logger.info(f"✅ User connected: {user_id} (Total: {len(self.active_connections[user_id])} connections)")
-        
-        # Broadcast updated online users
-        await self.broadcast_online_users()
-    
+
+        if first:
+            await self.backplane.subscribe_user(user_id)
+            await self.backplane.presence_add([user_id])
+            self._queue_presence(user_id, True)
+
     async def disconnect(self, websocket: WebSocket, user_id: str):
         """Remove a WebSocket connection"""
-        if user_id in self.active_connections:
-            try:
-                self.active_connections[user_id].remove(websocket)
-            except ValueError:
-                pass
-            
-            if not self.active_connections[user_id]:
-                del self.active_connections[user_id]
-        
+        connections = self.active_connections.get(user_id)
+        if not connections or websocket not in connections:
+            return
+
+        connections.remove(websocket)
+        self._owners.pop(websocket, None)
+        self._last_seen.pop(websocket, None)
+        self._unwatch(websocket)
+        outbox = self._outboxes.pop(websocket, None)
+        if outbox and outbox.task and outbox.task is not asyncio.current_task():
+            outbox.task.cancel()
         logger.info(f"❌ User disconnected: {user_id}")
-        
-        # Broadcast updated online users
-        await self.broadcast_online_users()
-    
+
+        if not connections:
+            del self.active_connections[user_id]
+            try:
+                await self.backplane.unsubscribe_user(user_id)
+                await self.backplane.presence_remove(user_id)
+                # The user may have reconnected here while we were unsubscribing
+                if user_id in self.active_connections:
+                    await self.backplane.subscribe_user(user_id)
+                    await self.backplane.presence_add([user_id])
+            except Exception as e:
+                logger.warning(f"⚠️ Backplane cleanup failed for {user_id}: {e}")
+
+            self._queue_presence(user_id, False)
+
+    def touch(self, websocket: WebSocket):
+        """Record activity on a socket (any received frame, including pings)"""
+        self._last_seen[websocket] = time.monotonic()
+
+    # ============ DELIVERY ============
+
     async def send_personal_message(self, receiver_id: str, message: dict):
-        """Send message to a specific user if online"""
-        if receiver_id in self.active_connections:
-            disconnected = []
-            
-            for connection in self.active_connections[receiver_id]:
-                try:
-                    await connection.send_text(json.dumps(message))
-                except Exception as e:
-                    logger.warning(f"Failed to send to {receiver_id}: {e}")
-                    disconnected.append(connection)
-            
-            # Clean up disconnected connections
-            for conn in disconnected:
-                await self.disconnect(conn, receiver_id)
-    
+        """Send message to a specific user, on whichever worker they are connected"""
+        if not receiver_id:
+            return
+        try:
+            await self.backplane.publish_user(receiver_id, json.dumps(message))
+        except Exception as e:
+            logger.warning(f"Failed to publish to {receiver_id}: {e}")
+
     async def broadcast(self, message: dict):
-        """Send message to all connected users"""
-        disconnected = []
-        
-        for user_id, connections in list(self.active_connections.items()):
-            for connection in connections:
+        """Send message to all connected users on every worker"""
+        try:
+            await self.backplane.publish_broadcast(json.dumps(message))
+        except Exception as e:
+            logger.warning(f"Broadcast publish failed: {e}")
+
+    async def _deliver_local(self, user_id: Optional[str], payload: str):
+        """Write a published payload to this worker's sockets (user_id None = everyone)"""
+        if user_id is None:
+            targets = [(uid, conn) for uid, conns in list(self.active_connections.items()) for conn in conns]
+        else:
+            targets = [(user_id, conn) for conn in list(self.active_connections.get(user_id, []))]
+
+        self._send_all(targets, payload)
+
+    def send_to_socket(self, websocket: WebSocket, message: dict):
+        """Queue a message for one local socket (replies, echoes)"""
+        self._enqueue(websocket, json.dumps(message))
+
+    def _send_all(self, targets, payload: str):
+        """Queue one already-encoded payload for (user_id, socket) targets"""
+        for _, connection in targets:
+            self._enqueue(connection, payload)
+
+    def _enqueue(self, websocket: WebSocket, payload: str):
+        outbox = self._outboxes.get(websocket)
+        if outbox is None:
+            return
+        try:
+            outbox.queue.put_nowait((time.monotonic(), payload))
+            self.messages_queued += 1
+        except asyncio.QueueFull:
+            outbox.dropped += 1
+            self.messages_dropped += 1
+
+    async def _writer(self, websocket: WebSocket, user_id: str, outbox: Outbox):
+        """Drain one socket's outbox; disconnect it when it errors or lags too far"""
+        max_lag = settings.WS_MAX_SEND_LAG_SECONDS
+        try:
+            while True:
+                enqueued_at, payload = await outbox.queue.get()
+                if time.monotonic() - enqueued_at > max_lag:
+                    raise SlowConsumer(f"{outbox.queue.qsize() + 1} messages behind")
                 try:
-                    await connection.send_text(json.dumps(message))
-                except Exception as e:
-                    logger.warning(f"Broadcast failed for {user_id}: {e}")
-                    disconnected.append((user_id, connection))
-        
-        # Clean up disconnected connections
-        for user_id, conn in disconnected:
-            await self.disconnect(conn, user_id)
-    
-    async def broadcast_online_users(self):
-        """Broadcast list of currently online users to everyone"""
-        online_users = list(self.active_connections.keys())
-        message = {
-            "type": "online_users",
-            "users": online_users
+                    await asyncio.wait_for(websocket.send_text(payload), timeout=max_lag)
+                except asyncio.TimeoutError:
+                    raise SlowConsumer(f"send blocked for {max_lag}s")
+                self.messages_sent += 1
+        except asyncio.CancelledError:
+            raise
+        except SlowConsumer as e:
+            self.slow_disconnects += 1
+            logger.warning(f"🐢 Disconnecting slow WebSocket consumer {user_id}: {e}")
+            try:
+                await websocket.close(code=1013)
+            except Exception:
+                pass
+        except Exception as e:
+            self.send_errors += 1
+            logger.warning(f"Failed to send to {user_id}: {e}")
+        await self.disconnect(websocket, user_id)
+
+    # ============ PRESENCE ============
+
+    async def subscribe_presence(self, websocket: WebSocket, user_ids: Iterable[str]) -> Dict[str, Any]:
+        """
+        Replace the set of users a socket receives presence changes for
+
+        Only the first WS_PRESENCE_MAX_WATCH distinct ids are kept, in the
+        order the client sent them (most important first).
+
+        Returns:
+            {"online": subscribed users online right now, "watching": how many
+            are subscribed, "dropped": ids beyond the limit, "limit": the limit}
+        """
+        requested = list(dict.fromkeys(u for u in user_ids if isinstance(u, str) and u))
+        limit = settings.WS_PRESENCE_MAX_WATCH
+        watched = set(requested[:limit])
+
+        self._unwatch(websocket)
+        self._watching[websocket] = watched
+        for user_id in watched:
+            self._watchers.setdefault(user_id, set()).add(websocket)
+
+        try:
+            online = await self.backplane.filter_online(watched)
+        except Exception as e:
+            logger.warning(f"⚠️ Presence snapshot failed: {e}")
+            online = {u for u in watched if u in self.active_connections}
+        return {
+            "online": sorted(online),
+            "watching": len(watched),
+            "dropped": max(0, len(requested) - limit),
+            "limit": limit,
+        }
+
+    def _unwatch(self, websocket: WebSocket):
+        for user_id in self._watching.pop(websocket, ()):
+            sockets = self._watchers.get(user_id)
+            if sockets is not None:
+                sockets.discard(websocket)
+                if not sockets:
+                    del self._watchers[user_id]
+
+    def _queue_presence(self, user_id: str, online: bool):
+        """Record a join/leave for the next batch; a join and leave in one window cancel out"""
+        previous = self._pending_presence.get(user_id)
+        if previous is not None and previous != online:
+            del self._pending_presence[user_id]
+        else:
+            self._pending_presence[user_id] = online
+
+        if self._presence_flush is None or self._presence_flush.done():
+            self._presence_flush = asyncio.create_task(self._flush_presence_later())
+
+    async def _flush_presence_later(self):
+        await asyncio.sleep(settings.WS_PRESENCE_BATCH_MS / 1000)
+        try:
+            await self.flush_presence()
+        except Exception as e:
+            logger.warning(f"⚠️ Presence flush failed: {e}")
+
+    async def flush_presence(self):
+        """Publish the pending presence changes as one batch"""
+        changes, self._pending_presence = self._pending_presence, {}
+        if not changes:
+            return
+
+        joined = [u for u, online in changes.items() if online]
+        left = [u for u, online in changes.items() if not online]
+        if left:
+            # Users who left this worker may still be connected to another one
+            still_online = await self.backplane.filter_online(left)
+            left = [u for u in left if u not in still_online]
+        if not joined and not left:
+            return
+
+        await self.backplane.publish_presence(json.dumps({"online": joined, "offline": left}))
+        logger.debug(f"🟢 Presence batch: +{len(joined)} -{len(left)}")
+
+    async def _deliver_presence(self, payload: str):
+        """Forward a presence batch to the local sockets watching those users"""
+        batch = json.loads(payload)
+        changes = [(u, True) for u in batch.get("online", [])] + [(u, False) for u in batch.get("offline", [])]
+        for user_id, online in changes:
+            sockets = self._watchers.get(user_id)
+            if not sockets:
+                continue
+            message = json.dumps({"type": "presence", "user_id": user_id, "online": online})
+            targets = [(self._owners.get(ws), ws) for ws in list(sockets)]
+            self._send_all(targets, message)
+
+    async def get_online_users(self) -> List[str]:
+        """Get list of currently online user IDs across all workers"""
+        try:
+            return await self.backplane.online_users()
+        except Exception as e:
+            logger.warning(f"⚠️ Presence lookup failed: {e}")
+            return list(self.active_connections.keys())
+
+    async def is_user_online(self, user_id: str) -> bool:
+        """Check if a user is online on any worker"""
+        if user_id in self.active_connections:
+            return True
+        try:
+            return await self.backplane.is_online(user_id)
+        except Exception:
+            return False
+
+    def stats(self) -> dict:
+        """Connection, backplane and send queue counters for this worker"""
+        depths = [outbox.queue.qsize() for outbox in self._outboxes.values()]
+        return {
+            "node_id": self.node_id,
+            "backplane": self.backplane.name,
+            "local_users": len(self.active_connections),
+            "local_connections": sum(len(c) for c in self.active_connections.values()),
+            "published": self.backplane.published,
+            "received": self.backplane.received,
+            "send_queues": {
+                "queued": self.messages_queued,
+                "sent": self.messages_sent,
+                "dropped": self.messages_dropped,
+                "slow_disconnects": self.slow_disconnects,
+                "send_errors": self.send_errors,
+                "depth_total": sum(depths),
+                "depth_max": max(depths, default=0),
+                "max_lag_seconds": round(max((o.lag() for o in self._outboxes.values()), default=0.0), 3)
+            }
         }
-        logger.debug(f"🟢 Online users: {online_users}")
-        await self.broadcast(message)
-    
-    def get_online_users(self) -> List[str]:
-        """Get list of currently online user IDs"""
-        return list(self.active_connections.keys())
-    
-    def is_user_online(self, user_id: str) -> bool:
-        """Check if a user is online"""
-        return user_id in self.active_connections
 
 # Global connection manager instance
-connection_manager = ConnectionManager()
\ No newline at end of file
+connection_manager = ConnectionManager()
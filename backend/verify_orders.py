@@ -75,6 +75,18 @@ async def verify_orders():
                 if date_str in last7_days:
                     amount = booking.get('price', booking.get('amount', 0))
                     print(f"  ✅ {date_str}: ${amount:.2f} - Status: {booking.get('status')}")
+        
+        # What the dashboard reads: one rollup document per day
+        rollups = await db.seller_daily_rollups.find(
+            {"seller_id": seller_id, "day": {"$gte": last7_days[6]}},
+            {"_id": 0}
+        ).sort("day", 1).to_list(7)
+        
+        print(f"\nDaily rollups (last 7 days):")
+        for rollup in rollups:
+            print(f"  📊 {rollup['day']}: ${rollup.get('revenue', 0):.2f} - "
+                  f"{rollup.get('orders', 0)} orders, {rollup.get('bookings', 0)} bookings, "
+                  f"{rollup.get('cancellations', 0)} cancelled")
                     
     except Exception as e:
         print(f"Error: {e}")
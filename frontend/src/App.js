@@ -3,6 +3,7 @@ import React, { useState, useEffect } from "react";
 import { BrowserRouter, Routes, Route, Navigate } from "react-router-dom";
 import { Toaster } from "sonner";
 import "./App.css";
+import { startTokenRefreshTimer } from "./utils/api";
 
 // Utils
 const getToken = () => localStorage.getItem("token");
@@ -55,6 +56,7 @@ function App() {
     if (token) {
       const userData = getUser();
       setUser(userData);
+      startTokenRefreshTimer();
     }
     setLoading(false);
   }, []);
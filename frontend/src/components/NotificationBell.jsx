@@ -1,33 +1,108 @@
 // frontend/src/components/NotificationBell.jsx - COMPLETE
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import { Bell, Check, X } from "lucide-react";
 import api from "../utils/api";
 import { toast } from "sonner";
 import { useNavigate } from "react-router-dom";
 import { getUser } from "../utils/auth";
 
+const SOCKET_URL = "ws://localhost:8000/ws/chat";
+const HEARTBEAT_INTERVAL_MS = 25000;
+const RECONNECT_DELAY_MS = 5000;
+const FALLBACK_POLL_MS = 30000;
+
 const NotificationBell = () => {
   const [notifications, setNotifications] = useState([]);
   const [unreadCount, setUnreadCount] = useState(0);
   const [showDropdown, setShowDropdown] = useState(false);
   const [loading, setLoading] = useState(false);
+  const [isConnected, setIsConnected] = useState(false);
   const navigate = useNavigate();
+  const currentUser = getUser();
+  const wsRef = useRef(null);
+  const heartbeatIntervalRef = useRef(null);
+  const reconnectTimeoutRef = useRef(null);
 
-  // Load notifications on mount and every 30 seconds
+  // Load notifications once; after that the server pushes new ones and the unread count
   useEffect(() => {
     loadNotifications();
-    const interval = setInterval(loadNotifications, 30000); // 30s
-    return () => clearInterval(interval);
   }, []);
 
+  // Poll only while the socket is down
+  useEffect(() => {
+    if (isConnected) return;
+    const interval = setInterval(loadNotifications, FALLBACK_POLL_MS);
+    return () => clearInterval(interval);
+  }, [isConnected]);
+
+  useEffect(() => {
+    if (!currentUser?.id) return;
+    let closed = false;
+
+    const connect = () => {
+      const socket = new WebSocket(`${SOCKET_URL}/${currentUser.id}`);
+
+      socket.onopen = () => {
+        setIsConnected(true);
+        clearInterval(heartbeatIntervalRef.current);
+        heartbeatIntervalRef.current = setInterval(() => {
+          if (socket.readyState === WebSocket.OPEN) {
+            socket.send(JSON.stringify({ type: "ping" }));
+          }
+        }, HEARTBEAT_INTERVAL_MS);
+      };
+
+      socket.onmessage = (event) => {
+        try {
+          const data = JSON.parse(event.data);
+
+          if (data.type === "unread_counts") {
+            setUnreadCount(data.notifications || 0);
+            return;
+          }
+
+          if (data.type === "notification" && data.data) {
+            const incoming = data.data;
+            setNotifications((prev) =>
+              [incoming, ...prev.filter((n) => n.id !== incoming.id)].slice(0, 10)
+            );
+          }
+        } catch (error) {
+          console.error("Error parsing notification message:", error);
+        }
+      };
+
+      socket.onclose = () => {
+        setIsConnected(false);
+        wsRef.current = null;
+        clearInterval(heartbeatIntervalRef.current);
+        heartbeatIntervalRef.current = null;
+        if (!closed) {
+          reconnectTimeoutRef.current = setTimeout(connect, RECONNECT_DELAY_MS);
+        }
+      };
+
+      wsRef.current = socket;
+    };
+
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(reconnectTimeoutRef.current);
+      clearInterval(heartbeatIntervalRef.current);
+      wsRef.current?.close();
+    };
+  }, [currentUser?.id]);
+
   const loadNotifications = async () => {
     try {
-      const response = await api.get("/notifications", { params: { limit: 10 } });
-      setNotifications(response.data.notifications || []);
-
-      const unread =
-        response.data.notifications?.filter((n) => !n.read).length || 0;
-      setUnreadCount(unread);
+      const [listResponse, countResponse] = await Promise.all([
+        api.get("/notifications", { params: { limit: 10 } }),
+        api.get("/notifications/unread-count"),
+      ]);
+      setNotifications(listResponse.data.notifications || []);
+      setUnreadCount(countResponse.data.unread_count || 0);
     } catch (error) {
       console.error("Error loading notifications:", error);
       // Set empty arrays on error to prevent UI issues
@@ -48,7 +123,7 @@ const NotificationBell = () => {
           (n.id === notificationId || n._id === notificationId) ? { ...n, read: true } : n
         )
       );
-      setUnreadCount(Math.max(0, unreadCount - 1));
+      setUnreadCount((count) => Math.max(0, count - 1));
     } catch (error) {
       console.error("Error marking as read:", error);
       toast.error(error.response?.data?.detail || "Failed to mark as read");
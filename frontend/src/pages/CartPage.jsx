@@ -1,6 +1,6 @@
 // frontend/src/pages/CartPage.jsx - COMPLETE WORKING VERSION
 import React, { useState, useEffect } from "react";
-import { useNavigate } from "react-router-dom";
+import { useNavigate, useSearchParams } from "react-router-dom";
 import { toast } from "sonner";
 import {
   Card,
@@ -19,10 +19,11 @@ import {
   ArrowRight,
   Banknote,
 } from "lucide-react";
-import api from "../utils/api";
+import api, { checkoutAPI } from "../utils/api";
 
 const CartPage = ({ user }) => {
   const navigate = useNavigate();
+  const [searchParams, setSearchParams] = useSearchParams();
   const [cart, setCart] = useState([]);
   const [loading, setLoading] = useState(true);
   const [processing, setProcessing] = useState(false);
@@ -37,6 +38,19 @@ const CartPage = ({ user }) => {
     loadCart();
   }, [user, navigate]);
 
+  // Returning from a cancelled Stripe checkout: release the stock it was holding
+  useEffect(() => {
+    const reservationId = searchParams.get("reservation");
+    if (!reservationId || !user) return;
+    checkoutAPI
+      .cancel(reservationId)
+      .catch((error) => console.error("Error releasing reservation:", error))
+      .finally(() => {
+        searchParams.delete("reservation");
+        setSearchParams(searchParams, { replace: true });
+      });
+  }, [searchParams, setSearchParams, user]);
+
   const loadCart = async () => {
     setLoading(true);
     try {
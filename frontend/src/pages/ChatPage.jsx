@@ -24,6 +24,12 @@ import { getToken, getUser } from "@/utils/auth";
 import { toast } from "sonner";
 
 const SOCKET_URL = "ws://localhost:8000/ws/chat";
+// Keeps the socket and our online status alive (server drops sockets silent for 90s)
+const HEARTBEAT_INTERVAL_MS = 25000;
+// Most recent conversations whose partners we show online status for
+const PRESENCE_CONTACTS = 200;
+// Contacts fetched per page of the user list
+const USERS_PAGE_SIZE = 100;
 const API_URL = "http://localhost:8000/api";
 
 const ChatPage = () => {
@@ -31,6 +37,11 @@ const ChatPage = () => {
 
   const [ws, setWs] = useState(null);
   const [users, setUsers] = useState([]);
+  // X-Next-Cursor of the user list; null once every page is loaded
+  const [usersCursor, setUsersCursor] = useState(null);
+  const [loadingUsers, setLoadingUsers] = useState(false);
+  // Conversation partners, most recent first: the contacts we watch presence for
+  const [partnerIds, setPartnerIds] = useState([]);
   const [searchTerm, setSearchTerm] = useState("");
   const [selectedUser, setSelectedUser] = useState(null);
   const [messages, setMessages] = useState([]);
@@ -47,29 +58,59 @@ const ChatPage = () => {
   const fileInputRef = useRef(null);
   const wsRef = useRef(null);
   const reconnectTimeoutRef = useRef(null);
+  const heartbeatIntervalRef = useRef(null);
   const typingTimeoutRef = useRef(null);
+  const linkedUserRef = useRef(null);
 
-  // Fetch all users
+  // Fetch one page of users (older pages load on demand)
+  const fetchUsers = async (cursor = null) => {
+    setLoadingUsers(true);
+    try {
+      const token = getToken();
+      const res = await axios.get(`${API_URL}/users`, {
+        headers: { Authorization: `Bearer ${token}` },
+        params: cursor
+          ? { limit: USERS_PAGE_SIZE, cursor }
+          : { limit: USERS_PAGE_SIZE },
+      });
+
+      const page = res.data
+        .filter((u) => u.id !== currentUser.id)
+        .map((u) => ({ ...u, _id: u.id, isOnline: false }));
+      setUsers((prevUsers) => {
+        if (!cursor) return page;
+        const known = new Set(prevUsers.map((u) => u._id));
+        return [...prevUsers, ...page.filter((u) => !known.has(u._id))];
+      });
+      setUsersCursor(res.headers?.["x-next-cursor"] || null);
+    } catch (error) {
+      console.error("Failed to fetch users:", error);
+      toast.error("Failed to load users");
+    } finally {
+      setLoadingUsers(false);
+    }
+  };
+
+  useEffect(() => {
+    if (currentUser?.id) fetchUsers();
+  }, [currentUser?.id]);
+
+  // Fetch conversation partners (presence is only tracked for them)
   useEffect(() => {
-    const fetchUsers = async () => {
+    const fetchPartners = async () => {
       try {
         const token = getToken();
-        const res = await axios.get(`${API_URL}/users`, {
+        const res = await axios.get(`${API_URL}/conversations`, {
           headers: { Authorization: `Bearer ${token}` },
+          params: { limit: PRESENCE_CONTACTS },
         });
-
-        setUsers(
-          res.data
-            .filter((u) => u.id !== currentUser.id)
-            .map((u) => ({ ...u, _id: u.id, isOnline: false }))
-        );
+        setPartnerIds(res.data.map((c) => c.other_user_id));
       } catch (error) {
-        console.error("Failed to fetch users:", error);
-        toast.error("Failed to load users");
+        console.error("Failed to fetch conversations:", error);
       }
     };
 
-    if (currentUser?.id) fetchUsers();
+    if (currentUser?.id) fetchPartners();
   }, [currentUser?.id]);
 
   // Establish WebSocket connection with auto-reconnect
@@ -90,18 +131,37 @@ const ChatPage = () => {
           clearTimeout(reconnectTimeoutRef.current);
           reconnectTimeoutRef.current = null;
         }
+        clearInterval(heartbeatIntervalRef.current);
+        heartbeatIntervalRef.current = setInterval(() => {
+          if (socket.readyState === WebSocket.OPEN) {
+            socket.send(JSON.stringify({ type: "ping" }));
+          }
+        }, HEARTBEAT_INTERVAL_MS);
       };
 
       socket.onmessage = (event) => {
         try {
           const data = JSON.parse(event.data);
 
-          if (data.type === "online_users") {
+          if (data.type === "pong") return;
+
+          // Snapshot after subscribing, then one event per join/leave
+          if (data.type === "presence_state") {
+            if (data.dropped > 0) {
+              console.warn(`Presence limited to ${data.limit} contacts; ${data.dropped} not tracked`);
+            }
+            const online = new Set(data.online);
+            setUsers((prevUsers) =>
+              prevUsers.map((u) => ({ ...u, isOnline: online.has(u._id) }))
+            );
+            return;
+          }
+
+          if (data.type === "presence") {
             setUsers((prevUsers) =>
-              prevUsers.map((u) => ({
-                ...u,
-                isOnline: data.users.includes(u._id),
-              }))
+              prevUsers.map((u) =>
+                u._id === data.user_id ? { ...u, isOnline: data.online } : u
+              )
             );
             return;
           }
@@ -128,6 +188,8 @@ const ChatPage = () => {
         console.log("🔌 WebSocket disconnected");
         setIsConnected(false);
         wsRef.current = null;
+        clearInterval(heartbeatIntervalRef.current);
+        heartbeatIntervalRef.current = null;
 
         if (!reconnectTimeoutRef.current) {
           setReconnecting(true);
@@ -149,12 +211,24 @@ const ChatPage = () => {
       if (reconnectTimeoutRef.current) {
         clearTimeout(reconnectTimeoutRef.current);
       }
+      clearInterval(heartbeatIntervalRef.current);
       if (wsRef.current?.readyState === WebSocket.OPEN) {
         wsRef.current.close();
       }
     };
   }, [currentUser?.id]);
 
+  // Subscribe to presence for the open chat and recent conversation partners,
+  // most important first (again after each reconnect)
+  const contactIds = [...new Set([selectedUser?._id, ...partnerIds].filter(Boolean))].join(",");
+  useEffect(() => {
+    const socket = wsRef.current;
+    if (!isConnected || !contactIds || socket?.readyState !== WebSocket.OPEN) return;
+    socket.send(
+      JSON.stringify({ type: "presence_subscribe", users: contactIds.split(",") })
+    );
+  }, [isConnected, contactIds]);
+
   // Load messages when user is selected
   useEffect(() => {
     if (!selectedUser) return;
@@ -182,6 +256,20 @@ const ChatPage = () => {
       const user = users.find((u) => u._id === userId);
       if (user) {
         setSelectedUser(user);
+      } else if (linkedUserRef.current !== userId) {
+        // Not on a loaded page: fetch just that user
+        linkedUserRef.current = userId;
+        const token = getToken();
+        axios
+          .get(`${API_URL}/users`, {
+            headers: { Authorization: `Bearer ${token}` },
+            params: { ids: userId, limit: 1 },
+          })
+          .then((res) => {
+            const linked = res.data.map((u) => ({ ...u, _id: u.id, isOnline: false }));
+            if (linked.length > 0) setUsers((prevUsers) => [...linked, ...prevUsers]);
+          })
+          .catch((error) => console.error("Failed to fetch user:", error));
       }
     }
   }, [searchParams, users]);
@@ -519,6 +607,16 @@ const ChatPage = () => {
               </Card>
             ))
           )}
+          {usersCursor && (
+            <Button
+              variant="ghost"
+              className="w-full text-muted-foreground"
+              disabled={loadingUsers}
+              onClick={() => fetchUsers(usersCursor)}
+            >
+              {loadingUsers ? "Loading..." : "Load more"}
+            </Button>
+          )}
         </div>
       </div>
 
@@ -4,8 +4,8 @@ import { Button } from '../components/ui/button';
 import { Input } from '../components/ui/input';
 import { Label } from '../components/ui/label';
 import { Card, CardHeader, CardContent, CardFooter } from '../components/ui/card';
-import api from '../utils/api';
-import { setToken, setUser as saveUser } from '../utils/auth';
+import api, { startTokenRefreshTimer } from '../utils/api';
+import { setToken, setRefreshToken, setUser as saveUser } from '../utils/auth';
 import { toast } from 'sonner';
 import { LogIn } from 'lucide-react';
 
@@ -21,7 +21,9 @@ const Login = ({ setUser }) => {
     try {
       const response = await api.post('/auth/login', formData);
       setToken(response.data.token);
+      setRefreshToken(response.data.refresh_token);
       saveUser(response.data.user);
+      startTokenRefreshTimer();
       setUser(response.data.user);
       toast.success('Login successful!');
       navigate('/');
@@ -5,8 +5,8 @@ import { Input } from '../components/ui/input';
 import { Label } from '../components/ui/label';
 import { RadioGroup, RadioGroupItem } from '../components/ui/radio-group';
 import { Card, CardHeader, CardContent, CardFooter } from '../components/ui/card';
-import api from '../utils/api';
-import { setToken, setUser as saveUser } from '../utils/auth';
+import api, { startTokenRefreshTimer } from '../utils/api';
+import { setToken, setRefreshToken, setUser as saveUser } from '../utils/auth';
 import { toast } from 'sonner';
 import { UserPlus } from 'lucide-react';
 
@@ -28,7 +28,9 @@ const Register = ({ setUser }) => {
     try {
       const response = await api.post('/auth/register', formData);
       setToken(response.data.token);
+      setRefreshToken(response.data.refresh_token);
       saveUser(response.data.user);
+      startTokenRefreshTimer();
       setUser(response.data.user);
       toast.success('Registration successful!');
       navigate('/');
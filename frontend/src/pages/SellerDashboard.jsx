@@ -219,7 +219,7 @@ import {
 } from "../components/ui/select";
 import ListingCard from "../components/ListingCard";
 import AvailabilitySettings from "../components/AvailabilitySettings";
-import api, { serviceRequestAPI } from "../utils/api";
+import api, { getAllPages, serviceRequestAPI } from "../utils/api";
 import { toast } from "sonner";
 import {
   Plus,
@@ -283,7 +283,7 @@ const SellerDashboard = ({ user }) => {
       
       const [listingsRes, ordersRes, bookingsRes, productsRes, servicesRes, serviceBookingsRes, requestsRes] = await Promise.all([
         api.get("/listings", { params: { _t: timestamp } }).catch(() => ({ data: [] })),
-        api.get("/orders", { params: { _t: timestamp } }).catch(() => ({ data: [] })),
+        getAllPages("/orders", { params: { _t: timestamp } }).catch(() => ({ data: [] })),
         api.get("/bookings/my-bookings", { params: { _t: timestamp } }).catch(() => ({ data: { bookings: [] } })),
         api.get("/products", { params: { _t: timestamp } }).catch((e) => {
           console.error("Error fetching products:", e);
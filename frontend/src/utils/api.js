@@ -29,26 +29,114 @@ api.interceptors.request.use(
   }
 );
 
+const clearSession = () => {
+  localStorage.removeItem("token");
+  localStorage.removeItem("refresh_token");
+  localStorage.removeItem("user");
+};
+
+// Exchange the refresh token for a new token pair.
+// Concurrent callers share one in-flight request.
+let refreshPromise = null;
+export const refreshAccessToken = () => {
+  if (!refreshPromise) {
+    const refreshToken = localStorage.getItem("refresh_token");
+    refreshPromise = (
+      refreshToken
+        ? axios
+            .post(`${API_URL}/auth/refresh`, { refresh_token: refreshToken })
+            .then(({ data }) => {
+              localStorage.setItem("token", data.token);
+              localStorage.setItem("refresh_token", data.refresh_token);
+              localStorage.setItem("user", JSON.stringify(data.user));
+              return data.token;
+            })
+        : Promise.reject(new Error("No refresh token"))
+    ).finally(() => {
+      refreshPromise = null;
+    });
+  }
+  return refreshPromise;
+};
+
+// Refresh shortly before the access token expires, so pages that call
+// fetch() directly with the stored token keep working
+let refreshTimer = null;
+export const startTokenRefreshTimer = () => {
+  clearTimeout(refreshTimer);
+  const token = localStorage.getItem("token");
+  if (!token || !localStorage.getItem("refresh_token")) return;
+
+  let expiresAt;
+  try {
+    expiresAt = JSON.parse(atob(token.split(".")[1])).exp * 1000;
+  } catch (e) {
+    return;
+  }
+
+  const delay = Math.max(expiresAt - Date.now() - 60000, 0);
+  refreshTimer = setTimeout(() => {
+    refreshAccessToken()
+      .then(startTokenRefreshTimer)
+      .catch(() => {});
+  }, delay);
+};
+
 // Response interceptor for error handling
 api.interceptors.response.use(
   (response) => response,
   (error) => {
-    if (error.response?.status === 401) {
-      // Token expired or invalid
-      localStorage.removeItem("token");
-      localStorage.removeItem("user");
+    const original = error.config;
+    const isAuthCall = original?.url?.startsWith("/auth/");
+
+    if (error.response?.status === 401 && original && !original._retry && !isAuthCall) {
+      // Access token expired: refresh once and replay the request
+      original._retry = true;
+      return refreshAccessToken().then(
+        (token) => {
+          original.headers.Authorization = `Bearer ${token}`;
+          startTokenRefreshTimer();
+          return api(original);
+        },
+        () => {
+          clearSession();
+          window.location.href = "/login";
+          return Promise.reject(error);
+        }
+      );
+    }
+
+    if (error.response?.status === 401 && !isAuthCall) {
+      // Token invalid and refresh failed
+      clearSession();
       window.location.href = "/login";
     }
     return Promise.reject(error);
   }
 );
 
+// GET every page of a cursor-paginated list (follows X-Next-Cursor).
+// Resolves to { data: [...all items] } like a single response would.
+export const getAllPages = async (url, config = {}, client = api, maxPages = 100) => {
+  const items = [];
+  let cursor = null;
+  for (let page = 0; page < maxPages; page++) {
+    const params = cursor ? { ...config.params, cursor } : config.params;
+    const res = await client.get(url, { ...config, params });
+    items.push(...(Array.isArray(res.data) ? res.data : []));
+    cursor = res.headers?.["x-next-cursor"];
+    if (!cursor) break;
+  }
+  return { data: items };
+};
+
 // Auth APIs
 export const authAPI = {
   register: (data) => api.post("/auth/register", data),
   login: (data) => api.post("/auth/login", data),
   getProfile: () => api.get("/auth/profile"),
   updateProfile: (data) => api.put("/auth/profile", data),
+  refresh: (refreshToken) => api.post("/auth/refresh", { refresh_token: refreshToken }),
   changePassword: (data) => api.post("/auth/change-password", data),
 };
 
@@ -110,6 +198,7 @@ export const serviceAPI = {
 // Unified Checkout API
 export const checkoutAPI = {
   createSession: (data) => api.post("/checkout/create-session", data),
+  cancel: (reservationId) => api.post("/checkout/cancel", { reservation_id: reservationId }),
 };
 
 // Review APIs
@@ -147,6 +236,12 @@ export const orderAPI = {
   cancel: (id) => api.delete(`/orders/${id}`),
 };
 
+// Chat APIs (older pages: pass the X-Next-Cursor header value as cursor)
+export const chatAPI = {
+  getConversations: (params) => api.get("/conversations", { params }),
+  getMessages: (otherUserId, params) => api.get(`/messages/${otherUserId}`, { params }),
+};
+
 // Notification APIs
 export const notificationAPI = {
   getAll: (params) => api.get("/notifications", { params }),
@@ -2,6 +2,10 @@ export const getToken = () => localStorage.getItem('token');
 export const setToken = (token) => localStorage.setItem('token', token);
 export const removeToken = () => localStorage.removeItem('token');
 
+export const getRefreshToken = () => localStorage.getItem('refresh_token');
+export const setRefreshToken = (token) => localStorage.setItem('refresh_token', token);
+export const removeRefreshToken = () => localStorage.removeItem('refresh_token');
+
 export const getUser = () => {
   const user = localStorage.getItem('user');
   return user ? JSON.parse(user) : null;
@@ -12,6 +16,7 @@ export const removeUser = () => localStorage.removeItem('user');
 
 export const logout = () => {
   removeToken();
+  removeRefreshToken();
   removeUser();
   window.location.href = '/';
 };
\ No newline at end of file
@@ -0,0 +1,13 @@
+# tests/conftest.py
+"""
+Shared test setup
+
+The backend modules import each other as top-level packages (config,
+database, services, utils), so backend/ goes on sys.path.
+"""
+from pathlib import Path
+import sys
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
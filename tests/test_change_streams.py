@@ -0,0 +1,37 @@
+# tests/test_change_streams.py
+"""Contribution diffs applied by the materializer"""
+from utils.change_streams import _diff, _parts
+
+
+def test_new_document_adds_its_whole_contribution():
+    assert _diff({}, {"s1": {"bookings": 1, "booking_revenue": 50}}) == {
+        "s1": {"bookings": 1, "booking_revenue": 50}
+    }
+
+
+def test_deleted_document_takes_it_back():
+    assert _diff({"s1": {"bookings": 1, "booking_revenue": 50}}, {}) == {
+        "s1": {"bookings": -1, "booking_revenue": -50}
+    }
+
+
+def test_only_changed_fields_are_applied():
+    old = {"s1": {"orders": 1, "pending_orders": 1, "order_revenue": 20}}
+    new = {"s1": {"orders": 1, "pending_orders": 0, "order_revenue": 20}}
+    assert _diff(old, new) == {"s1": {"pending_orders": -1}}
+
+
+def test_replayed_event_is_a_no_op():
+    contribution = {"s1": {"orders": 1}, "s2": {"orders": 1}}
+    assert _diff(contribution, contribution) == {}
+
+
+def test_moving_between_keys():
+    assert _diff({"s1": {"bookings": 1}}, {"s2": {"bookings": 1}}) == {
+        "s1": {"bookings": -1},
+        "s2": {"bookings": 1},
+    }
+
+
+def test_parts_drop_empty_keys():
+    assert _parts({"s1": {"orders": 1}, "": {"orders": 1}}) == [{"k": "s1", "v": {"orders": 1}}]
@@ -0,0 +1,108 @@
+# tests/test_chat_service.py
+"""MessageWriter: draining on stop, idempotent retries and coalesced notifications"""
+import asyncio
+
+import pytest
+
+from config import settings
+from services import chat_service, conversation_service, notification_service
+from services.chat_service import MessageWriter
+
+
+class FakeMessages:
+    """insert_many into a dict by id; fail_next stores part of a batch, then raises"""
+
+    def __init__(self):
+        self.docs = {}
+        self.inserts = []
+        self.fail_next = 0
+
+    async def insert_many(self, docs, ordered=True):
+        self.inserts.append([doc["id"] for doc in docs])
+        if self.fail_next:
+            stored, self.fail_next = docs[:self.fail_next], 0
+            for doc in stored:
+                self._insert(doc)
+            raise RuntimeError("connection reset")
+        for doc in docs:
+            self._insert(doc)
+
+    def _insert(self, doc):
+        assert doc["id"] not in self.docs, f"duplicate {doc['id']}"
+        doc.setdefault("_id", f"oid-{doc['id']}")
+        self.docs[doc["id"]] = doc
+
+    async def distinct(self, field, query):
+        return [i for i in query["id"]["$in"] if i in self.docs]
+
+
+class FakeDB:
+    def __init__(self):
+        self.messages = FakeMessages()
+
+
+@pytest.fixture
+def writer_env(monkeypatch):
+    db = FakeDB()
+    summarized, notified = [], []
+
+    async def record_messages(docs):
+        summarized.extend(doc["id"] for doc in docs)
+
+    async def create_notifications_bulk(notifications):
+        notified.extend(notifications)
+        return len(notifications)
+
+    monkeypatch.setattr(chat_service, "get_db", lambda: db)
+    monkeypatch.setattr(conversation_service, "record_messages", record_messages)
+    monkeypatch.setattr(notification_service, "create_notifications_bulk", create_notifications_bulk)
+    monkeypatch.setattr(settings, "CHAT_WRITE_FLUSH_MS", 5)
+    monkeypatch.setattr(settings, "CHAT_NOTIFY_WINDOW_SECONDS", 60)
+    return db, summarized, notified
+
+
+def message(n, sender="alice", receiver="bob"):
+    return {"id": f"m{n}", "sender_id": sender, "receiver_id": receiver, "message": f"hi {n}"}
+
+
+def test_stop_writes_everything_queued(writer_env):
+    db, summarized, notified = writer_env
+
+    async def scenario():
+        writer = MessageWriter()
+        for n in range(7):
+            await writer.enqueue(message(n), sender_name="Alice")
+        await writer.enqueue(message(7, sender="carol"), sender_name="Carol")
+        await writer.stop()
+        return writer
+
+    writer = asyncio.run(scenario())
+    assert sorted(db.messages.docs) == [f"m{n}" for n in range(8)]
+    assert sorted(summarized) == sorted(db.messages.docs)
+    assert writer.stats()["written"] == 8
+
+    # One notification per sender, flushed by stop()
+    by_sender = {n["data"]["sender_id"]: n for n in notified}
+    assert set(by_sender) == {"alice", "carol"}
+    assert by_sender["alice"]["data"]["count"] == 7
+    assert by_sender["alice"]["title"].startswith("7 new messages from Alice")
+    assert by_sender["alice"]["message"] == "hi 6"
+
+
+def test_retry_skips_messages_already_stored(writer_env):
+    db, summarized, _ = writer_env
+    db.messages.fail_next = 2
+
+    async def scenario():
+        writer = MessageWriter()
+        for n in range(4):
+            await writer.enqueue(message(n))
+        await writer.stop()
+        return writer
+
+    writer = asyncio.run(scenario())
+    assert db.messages.inserts == [["m0", "m1", "m2", "m3"], ["m2", "m3"]]
+    assert sorted(db.messages.docs) == ["m0", "m1", "m2", "m3"]
+    assert sorted(summarized) == ["m0", "m1", "m2", "m3"]
+    assert writer.stats()["written"] == 4
+    assert writer.stats()["failed"] == 0
@@ -0,0 +1,105 @@
+# tests/test_conversation_service.py
+"""Conversation ids, summary upserts per stored batch, and read receipts"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from services import conversation_service, unread_service
+from services.conversation_service import conversation_id
+
+
+class FakeConversations:
+    def __init__(self, summaries=None):
+        self.summaries = summaries or {}
+        self.writes = []
+        self.updates = []
+
+    async def bulk_write(self, ops, ordered=True):
+        self.writes.append(ops)
+
+    async def find_one(self, query, projection=None):
+        return self.summaries.get(query["id"])
+
+    async def update_one(self, query, update):
+        self.updates.append((query, update))
+
+
+class FakeMessages:
+    def __init__(self, unread):
+        self.unread = unread
+        self.calls = 0
+
+    async def update_many(self, query, update):
+        self.calls += 1
+        return SimpleNamespace(modified_count=self.unread)
+
+
+@pytest.fixture
+def chat_db(monkeypatch):
+    changes = []
+
+    async def change_many(deltas):
+        changes.append(deltas)
+
+    async def change(user_id, notifications=0, messages=0):
+        changes.append({user_id: {"messages": messages}})
+
+    def install(summaries=None, unread=0):
+        db = SimpleNamespace(conversations=FakeConversations(summaries), messages=FakeMessages(unread))
+        monkeypatch.setattr(conversation_service, "get_db", lambda: db)
+        return db
+    monkeypatch.setattr(unread_service, "change_many", change_many)
+    monkeypatch.setattr(unread_service, "change", change)
+    return install, changes
+
+
+def message(n, sender, receiver, ts):
+    return {
+        "id": f"m{n}", "sender_id": sender, "receiver_id": receiver,
+        "conversation_id": conversation_id(sender, receiver),
+        "message": f"hi {n}", "timestamp": ts, "read": False,
+    }
+
+
+def test_conversation_id_is_order_independent():
+    assert conversation_id("bob", "alice") == conversation_id("alice", "bob") == "alice:bob"
+    assert conversation_id("alice", None) is None
+
+
+def test_one_summary_upsert_per_conversation(chat_db):
+    install, changes = chat_db
+    db = install()
+    asyncio.run(conversation_service.record_messages([
+        message(1, "alice", "bob", "2026-01-01T10:00:02"),
+        message(2, "bob", "alice", "2026-01-01T10:00:01"),
+        message(3, "alice", "bob", "2026-01-01T10:00:03"),
+        message(4, "carol", "bob", "2026-01-01T10:00:00"),
+    ]))
+
+    (ops,) = db.conversations.writes
+    by_id = {op._filter["id"]: op._doc[0]["$set"] for op in ops}
+    assert set(by_id) == {"alice:bob", "bob:carol"}
+
+    summary = by_id["alice:bob"]
+    assert summary["last_message"]["$cond"][1] == {"$literal": {
+        "id": "m3", "sender_id": "alice", "receiver_id": "bob", "message": "hi 3",
+        "file_type": None, "file_name": None, "timestamp": "2026-01-01T10:00:03",
+    }}
+    assert summary["unread.bob"] == {"$add": [{"$ifNull": ["$unread.bob", 0]}, 2]}
+    assert summary["unread.alice"] == {"$add": [{"$ifNull": ["$unread.alice", 0]}, 1]}
+
+    # Unread counters move once for the whole batch
+    assert changes == [{"bob": {"messages": 3}, "alice": {"messages": 1}}]
+
+
+def test_mark_read_skips_messages_when_nothing_is_unread(chat_db):
+    install, changes = chat_db
+    db = install(summaries={"alice:bob": {"unread": {"bob": 0, "alice": 2}}}, unread=2)
+
+    assert asyncio.run(conversation_service.mark_read("alice:bob", "bob")) == 0
+    assert db.messages.calls == 0
+
+    assert asyncio.run(conversation_service.mark_read("alice:bob", "alice")) == 2
+    assert db.conversations.updates == [({"id": "alice:bob"}, {"$set": {"unread.alice": 0}})]
+    assert changes == [{"alice": {"messages": -2}}]
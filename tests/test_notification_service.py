@@ -0,0 +1,124 @@
+# tests/test_notification_service.py
+"""NotificationWriter: coalescing duplicates, retries and flushing on stop"""
+import asyncio
+
+import pytest
+
+from config import settings
+from services import notification_service, unread_service
+from services.notification_service import NotificationWriter, _build_notification
+
+
+class FakeNotifications:
+    """insert_many by id; each failure stores the first store_on_failure docs, then raises"""
+
+    def __init__(self):
+        self.docs = {}
+        self.failures = 0
+        self.store_on_failure = 0
+
+    async def insert_many(self, docs, ordered=True):
+        if self.failures:
+            self.failures -= 1
+            for doc in docs[:self.store_on_failure]:
+                self.docs[doc["id"]] = doc
+            raise RuntimeError("write concern timeout")
+        for doc in docs:
+            assert doc["id"] not in self.docs, f"duplicate {doc['id']}"
+            self.docs[doc["id"]] = doc
+
+    async def distinct(self, field, query):
+        return [i for i in query["id"]["$in"] if i in self.docs]
+
+
+class FakeDB:
+    def __init__(self):
+        self.notifications = FakeNotifications()
+
+
+@pytest.fixture
+def writer_env(monkeypatch):
+    db = FakeDB()
+    unread, pushed = [], []
+
+    async def change_many(deltas):
+        unread.append(deltas)
+
+    async def send_personal_message(user_id, message):
+        pushed.append(user_id)
+
+    monkeypatch.setattr(notification_service, "get_db", lambda: db)
+    monkeypatch.setattr(unread_service, "change_many", change_many)
+    monkeypatch.setattr(notification_service.connection_manager, "send_personal_message", send_personal_message)
+    monkeypatch.setattr(settings, "NOTIFICATION_FLUSH_MS", 60000)
+    return db, unread, pushed
+
+
+def booking(user_id, booking_id, title="Booking confirmed"):
+    return _build_notification(user_id, "booking_confirmed", title, "See details", "/bookings",
+                               {"booking_id": booking_id})
+
+
+def test_only_duplicates_are_coalesced(writer_env):
+    db, unread, pushed = writer_env
+
+    async def scenario():
+        writer = NotificationWriter()
+        first = writer.enqueue(booking("alice", "b1"))
+        again = writer.enqueue(booking("alice", "b1", title="Booking updated"))
+        other = writer.enqueue(booking("alice", "b2"))
+        separate = writer.enqueue(booking("alice", "b1"), coalesce=False)
+        await writer.stop()
+        return writer, first, again, other, separate
+
+    writer, first, again, other, separate = asyncio.run(scenario())
+    # The coalesced notification keeps the id already handed out
+    assert again is first
+    assert len({first["id"], other["id"], separate["id"]}) == 3
+    assert sorted(db.notifications.docs) == sorted([first["id"], other["id"], separate["id"]])
+
+    stored = db.notifications.docs[first["id"]]
+    assert (stored["title"], stored["data"]) == ("Booking updated", {"booking_id": "b1", "count": 2})
+    assert writer.stats()["coalesced"] == 1
+    assert unread == [{"alice": {"notifications": 3}}]
+    assert pushed == ["alice"] * 3
+
+
+def test_retry_stores_only_the_rest_of_a_partial_batch(writer_env):
+    db, unread, _ = writer_env
+    db.notifications.failures = 1
+    db.notifications.store_on_failure = 1
+
+    async def scenario():
+        writer = NotificationWriter()
+        for n in range(3):
+            writer.enqueue(booking(f"user{n}", f"b{n}"))
+        stored = await writer.flush()
+        await writer.stop()
+        return writer, stored
+
+    writer, stored = asyncio.run(scenario())
+    assert stored == 3
+    assert len(db.notifications.docs) == 3
+    assert writer.stats()["failed"] == 0
+
+
+def test_unstored_notifications_wait_for_the_next_flush(writer_env):
+    db, unread, pushed = writer_env
+    db.notifications.failures = 2
+
+    async def scenario():
+        writer = NotificationWriter()
+        writer.enqueue(booking("alice", "b1"))
+        writer.enqueue(booking("bob", "b2"))
+        assert await writer.flush() == 0
+        held = writer.stats()["pending"]
+        # Storage is back: stop() stores what was held
+        await writer.stop()
+        return writer, held
+
+    writer, held = asyncio.run(scenario())
+    assert held == 2
+    assert writer.stats()["pending"] == 0
+    assert len(db.notifications.docs) == 2
+    assert sorted(pushed) == ["alice", "bob"]
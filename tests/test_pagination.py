@@ -0,0 +1,41 @@
+# tests/test_pagination.py
+"""Opaque keyset cursors"""
+import base64
+
+import pytest
+from fastapi import HTTPException
+
+from utils.pagination import cursor_query, decode_cursor, encode_cursor
+
+
+@pytest.mark.parametrize("sort_value", ["2024-05-01T10:00:00+00:00", 42, 3.5, None])
+def test_round_trip(sort_value):
+    cursor = encode_cursor(sort_value, "doc-1")
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (sort_value, "doc-1")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"{not json").decode(),
+    base64.urlsafe_b64encode(b'["2024", 7]').decode(),
+    base64.urlsafe_b64encode(b'["2024"]').decode(),
+    encode_cursor("2024", "doc-1")[:-3],
+])
+def test_tampered_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as err:
+        decode_cursor(cursor)
+    assert err.value.status_code == 400
+
+
+def test_cursor_query_continues_after_the_cursor():
+    cursor = encode_cursor("2024-05-01", "b")
+    assert cursor_query({"user_id": "u"}, None) == {"user_id": "u"}
+    assert cursor_query({"user_id": "u"}, cursor) == {"$and": [
+        {"user_id": "u"},
+        {"$or": [
+            {"timestamp": {"$lt": "2024-05-01"}},
+            {"timestamp": "2024-05-01", "id": {"$lt": "b"}},
+        ]},
+    ]}
+    assert cursor_query({}, cursor, direction=1)["$or"][0] == {"timestamp": {"$gt": "2024-05-01"}}
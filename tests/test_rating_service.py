@@ -0,0 +1,110 @@
+# tests/test_rating_service.py
+"""rebuild_ratings: reconciliation against concurrent and deleted reviews"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from services import rating_service
+
+
+def _ago(seconds):
+    return (datetime.now(timezone.utc) - timedelta(seconds=seconds)).isoformat()
+
+
+def _row(item_id, ratings, latest):
+    row = {
+        "_id": item_id,
+        "rating_sum": sum(ratings),
+        "reviews_count": len(ratings),
+        "latest": latest,
+    }
+    for star in rating_service.STARS:
+        row[f"star_{star}"] = sum(1 for r in ratings if r == star)
+    return row
+
+
+class FakeReviews:
+    """Returns canned aggregate rows, one per reviewed item"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def aggregate(self, pipeline):
+        for row in self.rows:
+            yield row
+
+
+class FakeProducts:
+    """find / bulk_write over plain dicts; a missing field matches None"""
+
+    def __init__(self, docs):
+        self.docs = {doc["id"]: doc for doc in docs}
+
+    async def find(self, query, projection=None):
+        for doc in list(self.docs.values()):
+            yield {"id": doc["id"], "reviews_count": doc.get("reviews_count")}
+
+    async def bulk_write(self, ops, ordered=True):
+        matched = 0
+        for op in ops:
+            doc = self.docs.get(op._filter["id"])
+            if doc is None or doc.get("reviews_count") != op._filter["reviews_count"]:
+                continue
+            doc.update(op._doc["$set"])
+            matched += 1
+        return SimpleNamespace(matched_count=matched)
+
+
+class FakeDB:
+    def __init__(self, products, reviews):
+        self.products = products
+        self.reviews = reviews
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    def install(docs, rows):
+        products = FakeProducts(docs)
+        monkeypatch.setattr(rating_service, "get_db", lambda: FakeDB(products, FakeReviews(rows)))
+        return products
+    return install
+
+
+def test_drifted_totals_are_rebuilt(catalog):
+    products = catalog(
+        [{"id": "p1", "reviews_count": 3, "rating_sum": 14, "rating": 4.7}],
+        [_row("p1", [5, 4], _ago(3600))],
+    )
+    assert asyncio.run(rating_service.rebuild_ratings("product")) == 1
+    doc = products.docs["p1"]
+    assert (doc["reviews_count"], doc["rating_sum"], doc["rating"]) == (2, 9, 4.5)
+    assert doc["rating_histogram"] == {"1": 0, "2": 0, "3": 0, "4": 1, "5": 1}
+
+
+def test_recent_review_is_left_for_add_rating(catalog):
+    # Stored but not yet added: rebuilding would count it, then add_rating again
+    products = catalog(
+        [{"id": "p1", "reviews_count": 1, "rating_sum": 5, "rating": 5.0}],
+        [_row("p1", [5, 1], _ago(5))],
+    )
+    assert asyncio.run(rating_service.rebuild_ratings("product")) == 0
+    assert products.docs["p1"]["reviews_count"] == 1
+
+
+def test_items_without_reviews_are_reset(catalog):
+    products = catalog(
+        [
+            {"id": "gone", "reviews_count": 2, "rating_sum": 8, "rating": 4.0},
+            {"id": "never", "reviews_count": 0, "rating_sum": 0, "rating": 0.0},
+        ],
+        [],
+    )
+    assert asyncio.run(rating_service.rebuild_ratings("product")) == 1
+    doc = products.docs["gone"]
+    assert (doc["reviews_count"], doc["rating_sum"], doc["rating"]) == (0, 0, 0.0)
+    assert set(doc["rating_histogram"].values()) == {0}
@@ -0,0 +1,29 @@
+# tests/test_rollup_service.py
+"""Splitting orders between sellers"""
+from services.rollup_service import order_shares
+
+
+def test_cart_order_is_split_by_product_seller():
+    order = {
+        "seller_id": "fallback",
+        "total_amount": 70,
+        "products": [
+            {"seller_id": "s1", "subtotal": 30},
+            {"seller_id": "s2", "price": "$10", "quantity": 2},
+            {"seller_id": "s1", "subtotal": "20.00"},
+        ],
+    }
+    assert order_shares(order) == {"s1": 50.0, "s2": 20.0}
+
+
+def test_products_without_seller_fall_back_to_the_order_seller():
+    order = {"seller_id": "s1", "products": [{"subtotal": 15}, {"price": 5}]}
+    assert order_shares(order) == {"s1": 20.0}
+
+
+def test_single_listing_order_uses_total_amount():
+    assert order_shares({"seller_id": "s1", "total_amount": "$99"}) == {"s1": 99.0}
+
+
+def test_order_without_any_seller_has_no_shares():
+    assert order_shares({"total_amount": 10, "products": [{"subtotal": 10}]}) == {}
@@ -0,0 +1,22 @@
+# tests/test_search_service.py
+"""Autocomplete edge n-grams"""
+from services.search_service import MAX_GRAM, MIN_GRAM, edge_ngrams, tokenize
+
+
+def test_tokenize_lowercases_and_splits():
+    assert tokenize("Logo-Design, 3D!") == ["logo", "design", "3d"]
+    assert tokenize(None) == []
+
+
+def test_edge_ngrams_are_prefixes_of_each_token():
+    assert edge_ngrams("Web App") == ["ap", "app", "we", "web"]
+
+
+def test_edge_ngrams_skip_short_tokens_and_dedupe():
+    assert edge_ngrams("a go go") == ["go"]
+    assert edge_ngrams("") == []
+
+
+def test_edge_ngrams_stop_at_max_gram():
+    word = "internationalization"
+    assert edge_ngrams(word) == sorted(word[:n] for n in range(MIN_GRAM, MAX_GRAM + 1))
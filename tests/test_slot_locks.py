@@ -0,0 +1,74 @@
+# tests/test_slot_locks.py
+"""InMemoryLockBackend: owner-checked acquire / extend / release with expiry"""
+import asyncio
+
+import pytest
+
+from utils import slot_locks
+from utils.slot_locks import InMemoryLockBackend
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable monotonic clock for the backend"""
+    now = [1000.0]
+    monkeypatch.setattr(slot_locks.time, "monotonic", lambda: now[0])
+    return now
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_acquire_is_exclusive_and_reentrant(clock):
+    locks = InMemoryLockBackend()
+    assert run(locks.acquire("slot", "alice", 5000))
+    assert not run(locks.acquire("slot", "bob", 5000))
+    # The owner re-acquiring refreshes the TTL
+    clock[0] += 4
+    assert run(locks.acquire("slot", "alice", 5000))
+    clock[0] += 4
+    assert not run(locks.acquire("slot", "bob", 5000))
+
+
+def test_expired_lock_can_be_taken(clock):
+    locks = InMemoryLockBackend()
+    assert run(locks.acquire("slot", "alice", 1000))
+    clock[0] += 1.001
+    assert run(locks.acquire("slot", "bob", 1000))
+    assert run(locks.get_many(["slot"])) == [("bob", 1)]
+
+
+def test_extend_only_by_owner_and_only_while_held(clock):
+    locks = InMemoryLockBackend()
+    run(locks.acquire("slot", "alice", 1000))
+    assert not run(locks.extend("slot", "bob", 5000))
+    assert run(locks.extend("slot", "alice", 5000))
+    clock[0] += 4
+    assert run(locks.get_many(["slot"])) == [("alice", 1)]
+    clock[0] += 2
+    assert not run(locks.extend("slot", "alice", 5000))
+
+
+def test_release_only_by_owner(clock):
+    locks = InMemoryLockBackend()
+    run(locks.acquire("slot", "alice", 5000))
+    assert not run(locks.release("slot", "bob"))
+    assert run(locks.release("slot", "alice"))
+    assert not run(locks.release("slot", "alice"))
+    assert run(locks.acquire("slot", "bob", 5000))
+
+
+def test_get_many_reports_owner_and_ttl(clock):
+    locks = InMemoryLockBackend()
+    run(locks.acquire("a", "alice", 2500))
+    assert run(locks.get_many(["a", "b"])) == [("alice", 3), None]
+    assert run(locks.get_many([])) == []
+
+
+def test_ttl_seconds_rounds_up():
+    assert slot_locks._ttl_seconds(1) == 1
+    assert slot_locks._ttl_seconds(1000) == 1
+    assert slot_locks._ttl_seconds(1001) == 2
+    assert slot_locks._ttl_seconds(-2) == 0
+    assert slot_locks._ttl_seconds(None) == 0
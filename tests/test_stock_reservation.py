@@ -0,0 +1,84 @@
+# tests/test_stock_reservation.py
+"""take_stock_bulk: all-or-nothing stock decrements"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from services import stock_reservation_service
+from services.stock_reservation_service import InsufficientStock, take_stock_bulk
+
+
+class FakeProducts:
+    """The products collection calls take_stock / restore_stock make"""
+
+    def __init__(self, stock):
+        self.docs = {pid: {"id": pid, "title": pid.title(), "stock": qty} for pid, qty in stock.items()}
+        self.taken = []
+
+    async def find_one_and_update(self, query, update, projection=None, return_document=None):
+        doc = self.docs.get(query["id"])
+        if doc is None or doc["stock"] < query["stock"]["$gte"]:
+            return None
+        doc["stock"] += update["$inc"]["stock"]
+        self.taken.append(query["id"])
+        return dict(doc)
+
+    async def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            self.docs[op._filter["id"]]["stock"] += op._doc["$inc"]["stock"]
+        return SimpleNamespace(modified_count=len(ops))
+
+    async def find_one(self, query, projection=None):
+        doc = self.docs.get(query["id"])
+        return dict(doc) if doc else None
+
+    def stock(self):
+        return {pid: doc["stock"] for pid, doc in self.docs.items()}
+
+
+class FakeDB:
+    def __init__(self, products):
+        self.products = products
+
+
+@pytest.fixture
+def products(monkeypatch):
+    def install(stock):
+        collection = FakeProducts(stock)
+        monkeypatch.setattr(stock_reservation_service, "get_db", lambda: FakeDB(collection))
+        return collection
+    return install
+
+
+def test_takes_every_product(products):
+    coll = products({"a": 5, "b": 2})
+    asyncio.run(take_stock_bulk({"a": 3, "b": 2}))
+    assert coll.stock() == {"a": 2, "b": 0}
+
+
+def test_shortfall_rolls_back_what_was_taken(products):
+    coll = products({"a": 5, "b": 1, "c": 9})
+    with pytest.raises(InsufficientStock) as err:
+        asyncio.run(take_stock_bulk({"c": 4, "a": 2, "b": 3}))
+
+    assert coll.stock() == {"a": 5, "b": 1, "c": 9}
+    # Taken in id order: a, then the shortfall on b; c never touched
+    assert coll.taken == ["a"]
+    assert (err.value.product_id, err.value.requested, err.value.available) == ("b", 3, 1)
+    assert err.value.title == "B"
+
+
+def test_unknown_product_is_a_shortfall(products):
+    coll = products({"a": 5})
+    with pytest.raises(InsufficientStock) as err:
+        asyncio.run(take_stock_bulk({"a": 1, "zzz": 1}))
+    assert coll.stock() == {"a": 5}
+    assert err.value.available == 0
+
+
+def test_non_positive_quantities_are_skipped(products):
+    coll = products({"a": 5})
+    asyncio.run(take_stock_bulk({"a": 0, "b": -1}))
+    assert coll.stock() == {"a": 5}
+    assert coll.taken == []
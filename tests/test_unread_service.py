@@ -0,0 +1,117 @@
+# tests/test_unread_service.py
+"""Unread counters: clamped atomic changes, bulk changes, cached reads and pushes"""
+import asyncio
+
+import pytest
+
+from services import unread_service
+from utils.cache import AsyncCache
+
+
+def _eval(expr, doc):
+    """The subset of aggregation expressions _change_pipeline uses"""
+    if isinstance(expr, str) and expr.startswith("$"):
+        return doc.get(expr[1:])
+    if isinstance(expr, dict):
+        (op, args), = expr.items()
+        values = [_eval(a, doc) for a in args]
+        if op == "$ifNull":
+            return values[0] if values[0] is not None else values[1]
+        if op == "$add":
+            return sum(values)
+        if op == "$max":
+            return max(values)
+        raise AssertionError(f"unexpected operator {op}")
+    return expr
+
+
+class FakeCounters:
+    """unread_counters keyed by user_id, applying pipeline updates"""
+
+    def __init__(self, docs=None):
+        self.docs = {d["user_id"]: d for d in docs or []}
+        self.reads = 0
+
+    def _apply(self, user_id, pipeline):
+        doc = self.docs.setdefault(user_id, {"user_id": user_id})
+        for stage in pipeline:
+            doc.update({k: _eval(v, doc) for k, v in stage["$set"].items()})
+        return doc
+
+    async def find_one_and_update(self, query, pipeline, **kwargs):
+        return dict(self._apply(query["user_id"], pipeline))
+
+    async def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            self._apply(op._filter["user_id"], op._doc)
+
+    def find(self, query, projection=None):
+        docs = [dict(self.docs[u]) for u in query["user_id"]["$in"] if u in self.docs]
+
+        class Cursor:
+            async def to_list(self, length):
+                return docs
+        return Cursor()
+
+    async def find_one(self, query, projection=None):
+        self.reads += 1
+        doc = self.docs.get(query["user_id"])
+        return dict(doc) if doc else None
+
+
+class FakeDB:
+    def __init__(self, counters):
+        self.unread_counters = counters
+
+
+@pytest.fixture
+def counters(monkeypatch):
+    pushed = []
+
+    async def send_personal_message(user_id, message):
+        pushed.append((user_id, message))
+
+    def install(docs=None):
+        coll = FakeCounters(docs)
+        monkeypatch.setattr(unread_service, "get_db", lambda: FakeDB(coll))
+        monkeypatch.setattr(unread_service, "counter_cache", AsyncCache("unread_counts_test"))
+        monkeypatch.setattr(unread_service.connection_manager, "send_personal_message", send_personal_message)
+        return coll
+    return install, pushed
+
+
+def test_changes_are_clamped_at_zero_and_pushed(counters):
+    install, pushed = counters
+    install()
+
+    assert asyncio.run(unread_service.change("alice", notifications=2, messages=1)) == {"notifications": 2, "messages": 1}
+    assert asyncio.run(unread_service.change("alice", notifications=-5)) == {"notifications": 0, "messages": 1}
+    assert asyncio.run(unread_service.reset("alice", unread_service.MESSAGES)) == {"notifications": 0, "messages": 0}
+    assert pushed[-1] == ("alice", {"type": "unread_counts", "notifications": 0, "messages": 0})
+    assert len(pushed) == 3
+
+
+def test_change_many_updates_every_user_once(counters):
+    install, pushed = counters
+    coll = install([{"user_id": "bob", "notifications": 4, "messages": 0}])
+
+    asyncio.run(unread_service.change_many({
+        "alice": {"notifications": 1},
+        "bob": {"notifications": 2, "messages": 3},
+        "carol": {"notifications": 0},
+    }))
+
+    assert unread_service._counts(coll.docs["bob"]) == {"notifications": 6, "messages": 3}
+    assert unread_service._counts(coll.docs["alice"]) == {"notifications": 1, "messages": 0}
+    # Nothing to change for carol: no write, no push
+    assert "carol" not in coll.docs
+    assert sorted(u for u, _ in pushed) == ["alice", "bob"]
+
+
+def test_reads_come_from_the_cache(counters):
+    install, _ = counters
+    coll = install([{"user_id": "alice", "notifications": 3, "messages": 1}])
+
+    for _ in range(3):
+        assert asyncio.run(unread_service.get_counts("alice")) == {"notifications": 3, "messages": 1}
+    assert coll.reads == 1
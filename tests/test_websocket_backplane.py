@@ -0,0 +1,76 @@
+# tests/test_websocket_backplane.py
+"""InMemoryBackplane: routing to subscribed users, broadcasts and presence expiry"""
+import asyncio
+
+import pytest
+
+from utils import websocket_backplane
+from utils.websocket_backplane import InMemoryBackplane
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable wall clock for presence expiry"""
+    now = [1000.0]
+    monkeypatch.setattr(websocket_backplane.time, "time", lambda: now[0])
+    return now
+
+
+def started(node_id="node-a", ttl=60):
+    delivered, presence = [], []
+
+    async def deliver(user_id, payload):
+        delivered.append((user_id, payload))
+
+    async def on_presence(payload):
+        presence.append(payload)
+
+    backplane = InMemoryBackplane(node_id, ttl)
+    asyncio.run(backplane.start(deliver, on_presence))
+    return backplane, delivered, presence
+
+
+def test_personal_messages_reach_subscribed_users_only():
+    backplane, delivered, _ = started()
+    asyncio.run(backplane.subscribe_user("alice"))
+
+    assert asyncio.run(backplane.publish_user("alice", '{"n": 1}')) == 1
+    assert asyncio.run(backplane.publish_user("bob", '{"n": 2}')) == 0
+    asyncio.run(backplane.unsubscribe_user("alice"))
+    assert asyncio.run(backplane.publish_user("alice", '{"n": 3}')) == 0
+
+    # Payloads are handed on as published, not re-encoded
+    assert delivered == [("alice", '{"n": 1}')]
+    assert (backplane.published, backplane.received) == (3, 1)
+
+
+def test_broadcast_and_presence_batches_reach_the_handlers():
+    backplane, delivered, presence = started()
+    asyncio.run(backplane.publish_broadcast("hello"))
+    asyncio.run(backplane.publish_presence('{"online": ["alice"], "offline": []}'))
+
+    assert delivered == [(None, "hello")]
+    assert presence == ['{"online": ["alice"], "offline": []}']
+
+
+def test_nothing_is_delivered_after_stop():
+    backplane, delivered, _ = started()
+    asyncio.run(backplane.subscribe_user("alice"))
+    asyncio.run(backplane.stop())
+
+    assert asyncio.run(backplane.publish_user("alice", "x")) == 0
+    assert asyncio.run(backplane.publish_broadcast("y")) == 0
+    assert delivered == []
+
+
+def test_presence_lasts_until_the_ttl_runs_out(clock):
+    backplane, _, _ = started(ttl=60)
+    asyncio.run(backplane.presence_add(["alice", "bob"]))
+
+    clock[0] += 59
+    assert asyncio.run(backplane.filter_online(["alice", "bob", "carol"])) == {"alice", "bob"}
+    asyncio.run(backplane.presence_remove("bob"))
+    assert not asyncio.run(backplane.is_online("bob"))
+
+    clock[0] += 1
+    assert asyncio.run(backplane.online_users()) == []
@@ -0,0 +1,99 @@
+# tests/test_websocket_outbox.py
+"""ConnectionManager send path: per-socket outboxes, drops when full, slow consumers"""
+import asyncio
+
+import pytest
+
+from config import settings
+from utils.websocket_manager import ConnectionManager
+
+
+class FakeSocket:
+    """Records frames; send_text waits while the gate is closed"""
+
+    def __init__(self):
+        self.sent = []
+        self.closed_with = None
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, payload):
+        await self.gate.wait()
+        self.sent.append(payload)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    def apply(queue_size=256, max_lag=10.0):
+        monkeypatch.setattr(settings, "WS_BACKPLANE", "memory")
+        monkeypatch.setattr(settings, "WS_SEND_QUEUE_SIZE", queue_size)
+        monkeypatch.setattr(settings, "WS_MAX_SEND_LAG_SECONDS", max_lag)
+    return apply
+
+
+def test_messages_are_written_in_order(limits):
+    limits()
+
+    async def scenario():
+        manager = ConnectionManager()
+        ws = FakeSocket()
+        await manager.connect(ws, "alice")
+        for n in range(3):
+            await manager.send_personal_message("alice", {"n": n})
+        await manager.send_personal_message("bob", {"n": 99})
+        await asyncio.sleep(0.01)
+        await manager.stop()
+        return ws, manager
+
+    ws, manager = asyncio.run(scenario())
+    assert ws.sent == ['{"n": 0}', '{"n": 1}', '{"n": 2}']
+    assert manager.messages_sent == 3
+
+
+def test_full_outbox_drops_new_messages(limits):
+    limits(queue_size=2)
+
+    async def scenario():
+        manager = ConnectionManager()
+        slow, fast = FakeSocket(), FakeSocket()
+        slow.gate.clear()
+        await manager.connect(slow, "alice")
+        await manager.connect(fast, "bob")
+        for n in range(5):
+            await manager.broadcast({"n": n})
+        dropped = manager.messages_dropped
+        slow.gate.set()
+        await asyncio.sleep(0.01)
+        await manager.stop()
+        return slow, fast, dropped
+
+    slow, fast, dropped = asyncio.run(scenario())
+    # Each outbox holds two; the rest are dropped instead of waiting on the socket
+    assert dropped == 6
+    assert slow.sent == fast.sent == ['{"n": 0}', '{"n": 1}']
+
+
+def test_slow_consumer_is_disconnected(limits):
+    limits(max_lag=0.05)
+
+    async def scenario():
+        manager = ConnectionManager()
+        stuck = FakeSocket()
+        stuck.gate.clear()
+        await manager.connect(stuck, "alice")
+        await manager.send_personal_message("alice", {"n": 1})
+        await asyncio.sleep(0.2)
+        connected = "alice" in manager.active_connections
+        await manager.stop()
+        return stuck, manager, connected
+
+    stuck, manager, connected = asyncio.run(scenario())
+    assert stuck.closed_with == 1013
+    assert not connected
+    assert manager.slow_disconnects == 1